@@ -0,0 +1,376 @@
+"""Variante ASGI de la API (Quart + aiobotocore).
+
+Mismas rutas y mismos códigos de error que main.py, pero cada worker atiende
+muchas peticiones concurrentes sin un hilo por petición:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8080
+"""
+import asyncio
+import os
+
+from quart import Quart, Response, g, request, jsonify
+from quart_cors import cors
+from pydantic import ValidationError
+from botocore.exceptions import ClientError
+from models.book import Book
+from db.async_dynamodb_db import AsyncDynamoDBDatabase
+from db.changes import SinceExpiredError
+from db.db import ConflictError, OutOfStockError, UnprocessedError
+from db.ratings import parse_rating
+import metrics
+import resilience
+from rating_rollup import RatingRollup
+from codec import dump_book, dump_changes, dump_page, dump_partial, dump_partial_page
+from http_cache import book_etag, cache_headers, catalog_etag, etag_matches, if_match_version, page_etag
+from http_utils import (
+    batch_get_results, batch_write_results, json_object, new_book, parse_batch_books, parse_batch_ids,
+    parse_changes_query, parse_fields, parse_list_query, parse_search_query,
+)
+
+
+app = Quart(__name__)
+app = cors(app, allow_origin="*")
+
+db = AsyncDynamoDBDatabase()
+
+# Igual que readiness.py en la app Flask: la tabla se comprueba en segundo plano,
+# /health responde desde el arranque y /ready cuando la BD está lista
+READY_TIMEOUT = float(os.getenv('READY_TIMEOUT', '5'))
+PROBE_ENDPOINTS = {'health', 'ready', 'metrics_endpoint'}
+startup_status = {'ready': False, 'attempts': 0, 'error': None}
+db_ready = None
+_init_task = None
+
+# Roll-up de las valoraciones, como en la app Flask pero en una tarea del bucle de eventos
+RATING_ROLLUP_INTERVAL = float(os.getenv('RATING_ROLLUP_INTERVAL', '5'))
+rating_rollup = RatingRollup(RATING_ROLLUP_INTERVAL, on_rollup=metrics.observe_rating_rollup)
+_rollup_task = None
+
+
+async def initialize_in_background(delay: float = 1.0, max_delay: float = 30.0):
+    while True:
+        startup_status['attempts'] += 1
+        try:
+            await db.initialize()
+        except Exception as e:
+            startup_status['error'] = f"{type(e).__name__}: {e}"
+            print(f"Inicialización de la BD fallida (intento {startup_status['attempts']}), reintento en {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+            continue
+        startup_status.update(ready=True, error=None)
+        db_ready.set()
+        return
+
+
+async def rollup_ratings():
+    for book_id in rating_rollup.take():
+        try:
+            updated = await db.rollup_ratings(book_id)
+        except Exception as e:
+            print(f"Roll-up de valoraciones de {book_id} fallido: {type(e).__name__}: {e}")
+            rating_rollup.mark(book_id)
+            rating_rollup.report('error')
+            continue
+        rating_rollup.report('updated' if updated is not None else 'unchanged')
+
+
+async def rollup_ratings_periodically():
+    while True:
+        await asyncio.sleep(rating_rollup.interval)
+        await rollup_ratings()
+
+
+@app.before_serving
+async def startup():
+    global db_ready, _init_task, _rollup_task
+    await db.connect()
+    metrics.instrument_dynamodb(db.client)
+    resilience.install_dynamodb(db.client)
+    # Los items meta#catalog no pasan por el circuit breaker: su throttling no corta el resto
+    metrics.instrument_dynamodb(db.meta_client)
+    db.on_catalog_version_error = metrics.observe_catalog_version_error
+    db_ready = asyncio.Event()
+    _init_task = asyncio.create_task(initialize_in_background())
+    _rollup_task = asyncio.create_task(rollup_ratings_periodically())
+
+
+@app.after_serving
+async def shutdown():
+    if _init_task is not None:
+        _init_task.cancel()
+    if _rollup_task is not None:
+        _rollup_task.cancel()
+    # Las medias pendientes están en memoria: se escriben antes de cerrar el cliente
+    await rollup_ratings()
+    await db.close()
+
+
+@app.before_request
+async def start_metrics():
+    g.metrics_start = metrics.start_request()
+
+
+@app.before_request
+async def wait_until_ready():
+    if request.endpoint in PROBE_ENDPOINTS or db_ready.is_set():
+        return None
+    try:
+        await asyncio.wait_for(db_ready.wait(), READY_TIMEOUT)
+    except asyncio.TimeoutError:
+        return jsonify({'error': 'Servicio inicializándose, reintente', **startup_status}), 503, {'Retry-After': '1'}
+    return None
+
+
+@app.after_request
+async def finish_metrics(response):
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.finish_request(start, request.method, route, response.status_code)
+    return response
+
+
+async def stream_json_array(first, rest, dump=dump_book):
+    yield b'['
+    if first is not None:
+        yield dump(first)
+        async for book in rest:
+            yield b',' + dump(book)
+    yield b']'
+
+
+async def anext_or_none(iterator):
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+@app.errorhandler(resilience.OverloadedError)
+async def overloaded(e):
+    return jsonify(resilience.overloaded_body(e)), 503, {'Retry-After': e.retry_after_header()}
+
+
+def dynamodb_error(e: ClientError):
+    return jsonify({'error': 'DynamoDB error', 'details': e.response['Error']['Message']}), 500
+
+
+@app.route('/books', methods=['POST'])
+async def create_item():
+    try:
+        data = await request.get_json()
+        book = new_book(data)
+        created = await db.create_book(book)
+        return Response(dump_book(created), mimetype='application/json'), 201
+    except ValidationError as e:
+        return jsonify({'error': 'Validation error', 'details': e.errors()}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except UnprocessedError as e:
+        return jsonify({'error': str(e)}), 503
+    except ClientError as e:
+        return dynamodb_error(e)
+
+
+@app.route('/books/<book_id>', methods=['GET'])
+async def get_book(book_id):
+    try:
+        fields = parse_fields(request.args.get('fields'))
+        book = await db.get_book(book_id, fields)
+        if book:
+            etag = book_etag(book, fields)
+            if etag_matches(request.headers.get('If-None-Match'), etag):
+                return Response('', status=304, headers=cache_headers(etag))
+            body = dump_partial(book, fields) if fields else dump_book(book)
+            return Response(body, mimetype='application/json', headers=cache_headers(etag)), 200
+        return jsonify({'error': 'Item no encontrado'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ClientError as e:
+        return dynamodb_error(e)
+
+
+@app.route('/books', methods=['GET'])
+async def get_all_books():
+    try:
+        mode, params = parse_list_query(request.args)
+        if mode == 'genre':
+            books, next_cursor = await db.get_books_by_genre(**params)
+        elif mode == 'rating':
+            books, next_cursor = await db.get_books_by_rating(**params)
+        elif mode == 'page':
+            books, next_cursor = await db.get_books_page(**params)
+        else:
+            fields = params['fields']
+            etag = catalog_etag(await db.get_catalog_version(), fields)
+            if etag_matches(request.headers.get('If-None-Match'), etag):
+                return Response('', status=304, headers=cache_headers(etag))
+            books = db.iter_books(**params)
+            first = await anext_or_none(books)
+            dump = (lambda record: dump_partial(record, fields)) if fields else dump_book
+            return Response(stream_json_array(first, books, dump), mimetype='application/json',
+                            headers=cache_headers(etag)), 200
+        fields = params['fields']
+        etag = page_etag(books, next_cursor, fields)
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response('', status=304, headers=cache_headers(etag))
+        body = dump_partial_page(books, next_cursor, fields) if fields else dump_page(books, next_cursor)
+        return Response(body, mimetype='application/json', headers=cache_headers(etag)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ClientError as e:
+        return dynamodb_error(e)
+
+
+@app.route('/books/search', methods=['GET'])
+async def search_books():
+    try:
+        params = parse_search_query(request.args)
+        books = await db.search_books(**params)
+        fields = params['fields']
+        etag = page_etag(books, None, fields)
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response('', status=304, headers=cache_headers(etag))
+        body = dump_partial_page(books, None, fields) if fields else dump_page(books, None)
+        return Response(body, mimetype='application/json', headers=cache_headers(etag)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ClientError as e:
+        return dynamodb_error(e)
+
+
+@app.route('/books/stats', methods=['GET'])
+async def get_stats():
+    try:
+        return jsonify(await db.get_stats()), 200
+    except ClientError as e:
+        return dynamodb_error(e)
+
+
+@app.route('/books/changes', methods=['GET'])
+async def get_changes():
+    try:
+        changes = await db.get_changes(**parse_changes_query(request.args))
+        return Response(dump_changes(changes), mimetype='application/json'), 200
+    except SinceExpiredError as e:
+        return jsonify({'error': str(e)}), 410
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ClientError as e:
+        return dynamodb_error(e)
+
+
+@app.route('/books/<book_id>', methods=['PUT'])
+async def update_book(book_id):
+    try:
+        expected_version = if_match_version(request.headers.get('If-Match'))
+        data = json_object(await request.get_json())
+        data.pop('book_id', None)
+        data.pop('created_at', None)
+        book = Book(**data)
+        updated = await db.update_book(book_id, book, expected_version)
+        if updated:
+            return Response(dump_book(updated), mimetype='application/json',
+                            headers=cache_headers(book_etag(updated))), 200
+        return jsonify({'error': 'Item no encontrado'}), 404
+    except ValidationError as e:
+        return jsonify({'error': 'Validation error', 'details': e.errors()}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ConflictError as e:
+        return jsonify({'error': 'Version conflict', 'details': str(e)}), 409
+    except ClientError as e:
+        return dynamodb_error(e)
+
+
+async def change_stock(change, book_id):
+    try:
+        updated = await change(book_id)
+        if updated:
+            return Response(dump_book(updated), mimetype='application/json',
+                            headers=cache_headers(book_etag(updated))), 200
+        return jsonify({'error': 'Item no encontrado'}), 404
+    except OutOfStockError as e:
+        return jsonify({'error': 'Sin stock', 'details': str(e)}), 409
+    except UnprocessedError as e:
+        return jsonify({'error': str(e)}), 503
+    except ClientError as e:
+        return dynamodb_error(e)
+
+
+@app.route('/books/<book_id>/borrow', methods=['POST'])
+async def borrow_book(book_id):
+    return await change_stock(db.borrow_book, book_id)
+
+
+@app.route('/books/<book_id>/return', methods=['POST'])
+async def return_book(book_id):
+    return await change_stock(db.return_book, book_id)
+
+
+@app.route('/books/<book_id>/ratings', methods=['POST'])
+async def rate_book(book_id):
+    try:
+        rating = parse_rating(await request.get_json(silent=True))
+        await db.add_rating(book_id, rating)
+        metrics.RATINGS_RECEIVED.inc()
+        rating_rollup.mark(book_id)
+        return jsonify({'book_id': book_id, 'rating': float(rating)}), 202
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ClientError as e:
+        return dynamodb_error(e)
+
+
+@app.route('/books/<book_id>', methods=['DELETE'])
+async def delete_book(book_id):
+    try:
+        if await db.delete_book(book_id):
+            return '', 204
+        return jsonify({'error': 'book no encontrado'}), 404
+    except ClientError as e:
+        return dynamodb_error(e)
+
+
+@app.route('/books:batchGet', methods=['POST'])
+async def batch_get_books():
+    try:
+        ids = parse_batch_ids(await request.get_json(silent=True))
+        results = batch_get_results(ids, await db.get_books(ids))
+        return jsonify({'results': results}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ClientError as e:
+        return dynamodb_error(e)
+
+
+@app.route('/books:batchWrite', methods=['POST'])
+async def batch_write_books():
+    try:
+        results, valid = parse_batch_books(await request.get_json(silent=True))
+        errors = await db.create_books([book for _, book in valid]) if valid else []
+        return jsonify({'results': batch_write_results(results, valid, errors)}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ClientError as e:
+        return dynamodb_error(e)
+
+
+@app.route('/health', methods=['GET'])
+async def health():
+    return jsonify({'status': 'healthy'}), 200
+
+
+@app.route('/ready', methods=['GET'])
+async def ready():
+    return jsonify(startup_status), 200 if startup_status['ready'] else 503
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4'), 200
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=8080)
@@ -0,0 +1,414 @@
+"""Importación y exportación masiva del catálogo en formato NDJSON.
+
+Uso:
+    python bulk.py export --out books.ndjson [--segments 8]
+    python bulk.py import --in books.ndjson [--workers 4] [--checkpoint books.ckpt]
+    python bulk.py rebuild-stats [--segments 8]
+    python bulk.py reindex [--segments 8]
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from decimal import Decimal
+from itertools import islice
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from pydantic import ValidationError
+
+from db.changes import change_bucket
+from db.dynamodb_db import (
+    BOOK_FILTER, ENTITY_ATTRIBUTE, add_index_attributes, catalog_partition, catalog_version_keys, catalog_version_update,
+    index_items, is_book_item,
+)
+from db.stats import STAT_PREFIX, book_counters, merge
+from models.book import Book
+
+REGION = 'us-east-1'
+BOTO_CONFIG = Config(retries={'max_attempts': 10, 'mode': 'adaptive'})
+
+_local = threading.local()
+
+
+def get_table(table_name):
+    # Los recursos de boto3 no son thread-safe: uno por hilo
+    if getattr(_local, 'table', None) is None:
+        session = boto3.session.Session()
+        dynamodb = session.resource('dynamodb', region_name=REGION, config=BOTO_CONFIG)
+        _local.table = dynamodb.Table(table_name)
+    return _local.table
+
+
+def decimal_default(obj):
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+
+class Progress:
+    """Contador compartido entre hilos que informa del rendimiento por stderr."""
+
+    def __init__(self, label, every=5.0):
+        self.label = label
+        self.every = every
+        self.count = 0
+        self.start = time.monotonic()
+        self._last_report = self.start
+        self._lock = threading.Lock()
+
+    def add(self, n):
+        with self._lock:
+            self.count += n
+            now = time.monotonic()
+            if now - self._last_report >= self.every:
+                self._last_report = now
+                self.report()
+
+    def report(self, final=False):
+        elapsed = max(time.monotonic() - self.start, 1e-9)
+        prefix = 'Total' if final else 'Progreso'
+        print(f"{prefix} {self.label}: {self.count} libros en {elapsed:.1f}s "
+              f"({self.count / elapsed:.0f} libros/s)", file=sys.stderr)
+
+
+# ---------------------------------------------------------------------------
+# EXPORT
+# ---------------------------------------------------------------------------
+
+def scan_segment(table_name, segment, total_segments, out_queue, progress):
+    table = get_table(table_name)
+    scan_kwargs = {'Segment': segment, 'TotalSegments': total_segments, 'FilterExpression': BOOK_FILTER}
+    while True:
+        response = table.scan(**scan_kwargs)
+        items = response.get('Items', [])
+        if items:
+            # Se serializa en el hilo del segmento; el escritor solo concatena líneas
+            out_queue.put(''.join(json.dumps(item, default=decimal_default) + '\n' for item in items))
+            progress.add(len(items))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return
+        scan_kwargs['ExclusiveStartKey'] = last_key
+
+
+def export_books(table_name, out, segments):
+    # Cola acotada: si el disco va más lento que DynamoDB los escáneres esperan
+    out_queue = queue.Queue(maxsize=segments * 4)
+    progress = Progress('exportados')
+    done = object()
+
+    def writer():
+        while True:
+            chunk = out_queue.get()
+            if chunk is done:
+                return
+            out.write(chunk)
+
+    writer_thread = threading.Thread(target=writer, daemon=True)
+    writer_thread.start()
+    try:
+        with ThreadPoolExecutor(max_workers=segments) as pool:
+            futures = [
+                pool.submit(scan_segment, table_name, segment, segments, out_queue, progress)
+                for segment in range(segments)
+            ]
+            for future in futures:
+                future.result()
+    finally:
+        out_queue.put(done)
+        writer_thread.join()
+        out.flush()
+    progress.report(final=True)
+    return progress.count
+
+
+# ---------------------------------------------------------------------------
+# IMPORT
+# ---------------------------------------------------------------------------
+
+def read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return int(json.load(f)['line'])
+
+
+def write_checkpoint(path, line):
+    if not path:
+        return
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'line': line}, f)
+    os.replace(tmp_path, path)
+
+
+def parse_chunk(lines, first_line):
+    items, rejected = [], 0
+    for offset, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            book = Book(**json.loads(line))
+        except (TypeError, ValueError, ValidationError) as e:
+            # json.JSONDecodeError es subclase de ValueError; TypeError, una línea JSON que no es un objeto
+            rejected += 1
+            print(f"Línea {first_line + offset + 1} rechazada: {e}", file=sys.stderr)
+            continue
+        items.append(add_index_attributes(book.model_dump()))
+        items.extend(index_items(book))
+    return items, rejected
+
+
+def write_chunk(table_name, items):
+    table = get_table(table_name)
+    # batch_writer agrupa en BatchWriteItem de 25 y reenvía los UnprocessedItems;
+    # los throttles los reintenta botocore con backoff (modo adaptive)
+    with table.batch_writer(overwrite_by_pkeys=['book_id']) as batch:
+        for item in items:
+            batch.put_item(Item=item)
+    # Invalida los ETag del listado completo que tengan en caché los clientes
+    table.update_item(**catalog_version_update())
+    return sum(1 for item in items if is_book_item(item))
+
+
+def import_books(table_name, src, workers, chunk_size, checkpoint):
+    start_line = read_checkpoint(checkpoint)
+    if start_line:
+        print(f"Reanudando desde la línea {start_line + 1}", file=sys.stderr)
+    lines = islice(src, start_line, None)
+    progress = Progress('importados')
+    rejected = 0
+
+    # Solo se avanza el checkpoint hasta el último bloque contiguo terminado
+    next_line = start_line
+    committed_line = start_line
+    finished = {}
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            while len(pending) < workers * 2:
+                block = list(islice(lines, chunk_size))
+                if not block:
+                    break
+                items, bad = parse_chunk(block, next_line)
+                rejected += bad
+                future = pool.submit(write_chunk, table_name, items)
+                pending[future] = (next_line, next_line + len(block))
+                next_line += len(block)
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                first, last = pending.pop(future)
+                progress.add(future.result())
+                finished[first] = last
+            while committed_line in finished:
+                committed_line = finished.pop(committed_line)
+            write_checkpoint(checkpoint, committed_line)
+
+    progress.report(final=True)
+    if rejected:
+        print(f"{rejected} líneas rechazadas por validación", file=sys.stderr)
+    # La importación sobrescribe sin leer el libro anterior: los contadores no se pueden sumar por lotes
+    print("Recalcule las estadísticas con: python bulk.py rebuild-stats", file=sys.stderr)
+    return progress.count, rejected
+
+
+# ---------------------------------------------------------------------------
+# REBUILD-STATS
+# ---------------------------------------------------------------------------
+
+def count_segment(table_name, segment, total_segments, progress):
+    table = get_table(table_name)
+    scan_kwargs = {
+        'Segment': segment, 'TotalSegments': total_segments, 'FilterExpression': BOOK_FILTER,
+        'ProjectionExpression': '#stock, average_rating, #status, genre',
+        'ExpressionAttributeNames': {'#stock': 'stock', '#status': 'status'},
+    }
+    counters = {}
+    while True:
+        response = table.scan(**scan_kwargs)
+        items = response.get('Items', [])
+        counters = merge([counters, *(book_counters(item) for item in items)])
+        progress.add(len(items))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return counters
+        scan_kwargs['ExclusiveStartKey'] = last_key
+
+
+def overwrite_stats(table, key, counters):
+    """Deja en el item key exactamente los contadores stat:* de counters (la versión no se toca)."""
+    current = table.get_item(Key=key, ConsistentRead=True).get('Item', {})
+    stale = [name for name in current if name.startswith(STAT_PREFIX) and name[len(STAT_PREFIX):] not in counters]
+    if not counters and not stale:
+        return
+    names = {f'#s{i}': STAT_PREFIX + name for i, name in enumerate(counters)}
+    values = {f':s{i}': value for i, value in enumerate(counters.values())}
+    names.update({f'#r{i}': name for i, name in enumerate(stale)})
+    expression = 'SET ' + ', '.join(['#entity = :meta', *(f'#s{i} = :s{i}' for i in range(len(counters)))])
+    if stale:
+        expression += ' REMOVE ' + ', '.join(f'#r{i}' for i in range(len(stale)))
+    table.update_item(
+        Key=key,
+        UpdateExpression=expression,
+        ExpressionAttributeNames={'#entity': ENTITY_ATTRIBUTE, **names},
+        ExpressionAttributeValues={':meta': 'meta', **values},
+    )
+
+
+def rebuild_stats(table_name, segments):
+    """Recalcula con un scan los contadores stat:* de meta#catalog (db/stats.py) y los sobrescribe.
+
+    El total queda en el primer shard y los demás se vacían. Las escrituras que lleguen
+    mientras dura el scan pueden quedar fuera: mejor lanzarlo sin tráfico.
+    """
+    progress = Progress('contados')
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        counters = merge(pool.map(lambda segment: count_segment(table_name, segment, segments, progress),
+                                  range(segments)))
+    progress.report(final=True)
+
+    table = get_table(table_name)
+    for shard, key in enumerate(catalog_version_keys()):
+        overwrite_stats(table, key, counters if shard == 0 else {})
+    return counters
+
+
+# ---------------------------------------------------------------------------
+# REINDEX
+# ---------------------------------------------------------------------------
+
+def index_fixes(item):
+    """Atributos de índice que le faltan o tiene mal un libro (vacío si está al día)."""
+    fixes = {}
+    if item.get('catalog') != catalog_partition(item['book_id']):
+        fixes['catalog'] = catalog_partition(item['book_id'])
+    if 'updated_at' in item and item.get('change_bucket') != change_bucket(item['updated_at']):
+        fixes['change_bucket'] = change_bucket(item['updated_at'])
+    if 'average_rating' not in item:
+        # Sin sort key el libro no entraría en rating-index; el modelo Book la toma como 0
+        fixes['average_rating'] = Decimal('0')
+    return fixes
+
+
+def reindex_segment(table_name, segment, total_segments, progress):
+    table = get_table(table_name)
+    scan_kwargs = {
+        'Segment': segment, 'TotalSegments': total_segments, 'FilterExpression': BOOK_FILTER,
+        'ProjectionExpression': 'book_id, #catalog, change_bucket, updated_at, average_rating',
+        'ExpressionAttributeNames': {'#catalog': 'catalog'},
+    }
+    updated = 0
+    while True:
+        response = table.scan(**scan_kwargs)
+        items = response.get('Items', [])
+        for item in items:
+            fixes = index_fixes(item)
+            if not fixes:
+                continue
+            names = {f'#a{i}': name for i, name in enumerate(fixes)}
+            values = {f':a{i}': value for i, value in enumerate(fixes.values())}
+            try:
+                table.update_item(
+                    Key={'book_id': item['book_id']},
+                    UpdateExpression='SET ' + ', '.join(f'#a{i} = :a{i}' for i in range(len(fixes))),
+                    # Un libro borrado durante el scan no se vuelve a crear
+                    ConditionExpression='attribute_exists(book_id) AND attribute_not_exists(#entity)',
+                    ExpressionAttributeNames={'#entity': ENTITY_ATTRIBUTE, **names},
+                    ExpressionAttributeValues=values,
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                continue
+            updated += 1
+        progress.add(len(items))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return updated
+        scan_kwargs['ExclusiveStartKey'] = last_key
+
+
+def reindex_books(table_name, segments):
+    """Rellena catalog, change_bucket y average_rating en los libros escritos antes de los índices.
+
+    También reparte entre las particiones actuales de rating-index los libros de la
+    partición única antigua o de otro CATALOG_SHARDS. Se puede relanzar sin riesgo:
+    solo escribe los libros que no están al día.
+    """
+    progress = Progress('revisados')
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        updated = sum(pool.map(lambda segment: reindex_segment(table_name, segment, segments, progress),
+                               range(segments)))
+    progress.report(final=True)
+    return updated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importación/exportación masiva de libros (NDJSON)")
+    parser.add_argument('--table', default=os.getenv('DB_DYNAMONAME'), help="Tabla DynamoDB (por defecto DB_DYNAMONAME)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = sub.add_parser('export', help="Exporta la tabla con un scan paralelo por segmentos")
+    export_parser.add_argument('--out', default='-', help="Fichero NDJSON de salida ('-' para stdout)")
+    export_parser.add_argument('--segments', type=int, default=8, help="Número de segmentos/hilos del scan")
+
+    import_parser = sub.add_parser('import', help="Importa un NDJSON con escrituras por lotes")
+    import_parser.add_argument('--in', dest='src', default='-', help="Fichero NDJSON de entrada ('-' para stdin)")
+    import_parser.add_argument('--workers', type=int, default=4, help="Hilos de escritura")
+    import_parser.add_argument('--chunk-size', type=int, default=500, help="Líneas por bloque de escritura")
+    import_parser.add_argument('--checkpoint', help="Fichero de checkpoint para reanudar la importación")
+
+    stats_parser = sub.add_parser('rebuild-stats', help="Recalcula las estadísticas del catálogo con un scan")
+    stats_parser.add_argument('--segments', type=int, default=8, help="Número de segmentos/hilos del scan")
+
+    reindex_parser = sub.add_parser('reindex', help="Rellena los atributos de los índices secundarios con un scan")
+    reindex_parser.add_argument('--segments', type=int, default=8, help="Número de segmentos/hilos del scan")
+
+    args = parser.parse_args(argv)
+    if not args.table:
+        parser.error("Hay que indicar --table o definir DB_DYNAMONAME")
+
+    if args.command == 'export':
+        if args.segments < 1:
+            parser.error("--segments debe ser mayor que 0")
+        out = sys.stdout if args.out == '-' else open(args.out, 'w', encoding='utf-8')
+        try:
+            export_books(args.table, out, args.segments)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    elif args.command == 'rebuild-stats':
+        if args.segments < 1:
+            parser.error("--segments debe ser mayor que 0")
+        counters = rebuild_stats(args.table, args.segments)
+        print(f"Estadísticas recalculadas: {int(counters.get('books', 0))} libros", file=sys.stderr)
+    elif args.command == 'reindex':
+        if args.segments < 1:
+            parser.error("--segments debe ser mayor que 0")
+        updated = reindex_books(args.table, args.segments)
+        print(f"Índices actualizados en {updated} libros", file=sys.stderr)
+    else:
+        if args.workers < 1 or args.chunk_size < 1:
+            parser.error("--workers y --chunk-size deben ser mayores que 0")
+        src = sys.stdin if args.src == '-' else open(args.src, encoding='utf-8')
+        try:
+            _, rejected = import_books(args.table, src, args.workers, args.chunk_size, args.checkpoint)
+        finally:
+            if src is not sys.stdin:
+                src.close()
+        return 1 if rejected else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
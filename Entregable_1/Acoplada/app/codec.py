@@ -0,0 +1,66 @@
+"""Serialización de libros directamente a bytes JSON con pydantic-core.
+
+Evita el paso intermedio model_dump() -> dict -> jsonify en las respuestas con
+libros. El formato es el mismo que daba jsonify (Decimal como cadena, fechas ISO).
+
+Las lecturas parciales (fields=...) llegan como dicts sin validar y se vuelcan con
+json, con el mismo formato para los campos que sí se devuelven.
+"""
+import json
+from decimal import Decimal
+from typing import List, Optional, Sequence
+
+from pydantic import TypeAdapter
+
+from db.changes import Changes
+from models.book import Book
+
+_BOOK = TypeAdapter(Book)
+_BOOKS = TypeAdapter(List[Book])
+
+# DynamoDB devuelve todos los números como Decimal: los enteros del modelo se convierten
+_INT_FIELDS = frozenset(name for name, field in Book.model_fields.items() if field.annotation is int)
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)  # Igual que pydantic con los Decimal del modelo
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+_encoder = json.JSONEncoder(default=_default, separators=(',', ':'), ensure_ascii=False)
+
+
+def dump_book(book: Book) -> bytes:
+    return _BOOK.dump_json(book)
+
+
+def dump_books(books: List[Book]) -> bytes:
+    return _BOOKS.dump_json(books)
+
+
+def dump_page(books: List[Book], next_cursor: Optional[str]) -> bytes:
+    return b'{"books":' + _BOOKS.dump_json(books) + b',"next_cursor":' + json.dumps(next_cursor).encode() + b'}'
+
+
+def dump_changes(changes: Changes) -> bytes:
+    return (b'{"books":' + _BOOKS.dump_json(changes.books) + b',"deleted":' + _encoder.encode(changes.deleted).encode()
+            + b',"next_cursor":' + json.dumps(changes.next_cursor).encode()
+            + b',"next_since":' + json.dumps(changes.next_since).encode() + b'}')
+
+
+def project(record: dict, fields: Sequence[str]) -> dict:
+    """book_id y los campos pedidos, en ese orden; los que falten en el item salen como null."""
+    projected = {'book_id': record['book_id']}
+    for field in fields:
+        value = record.get(field)
+        projected[field] = int(value) if field in _INT_FIELDS and value is not None else value
+    return projected
+
+
+def dump_partial(record: dict, fields: Sequence[str]) -> bytes:
+    return _encoder.encode(project(record, fields)).encode()
+
+
+def dump_partial_page(records: List[dict], next_cursor: Optional[str], fields: Sequence[str]) -> bytes:
+    return _encoder.encode({'books': [project(record, fields) for record in records], 'next_cursor': next_cursor}).encode()
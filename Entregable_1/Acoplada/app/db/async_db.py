@@ -0,0 +1,99 @@
+from abc import ABC, abstractmethod
+from decimal import Decimal
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from models.book import Book
+from .changes import Changes
+from .db import Fields, Record
+
+
+class AsyncDatabase(ABC):
+    """Versión asíncrona de Database: mismos métodos y semántica, pero con corrutinas."""
+
+    @abstractmethod
+    async def initialize(self):
+        pass
+
+    @abstractmethod
+    async def close(self):
+        """Libera las conexiones del backend."""
+        pass
+
+    @abstractmethod
+    async def create_book(self, book: Book) -> Book:
+        pass
+
+    @abstractmethod
+    async def create_books(self, books: List[Book]) -> List[Optional[Exception]]:
+        pass
+
+    @abstractmethod
+    async def get_book(self, book_id: str, fields: Fields = None) -> Optional[Record]:
+        pass
+
+    @abstractmethod
+    async def get_books(self, book_ids: List[str]) -> Dict[str, Optional[Book]]:
+        pass
+
+    @abstractmethod
+    async def get_all_books(self) -> List[Book]:
+        pass
+
+    @abstractmethod
+    async def get_books_page(self, limit: int, cursor: Optional[str] = None,
+                             fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        pass
+
+    @abstractmethod
+    async def get_books_by_rating(self, limit: int, cursor: Optional[str] = None, descending: bool = True,
+                                  fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        pass
+
+    @abstractmethod
+    async def get_books_by_genre(self, genre: str, limit: int, cursor: Optional[str] = None,
+                                 fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        pass
+
+    @abstractmethod
+    def iter_books(self, fields: Fields = None) -> AsyncIterator[Record]:
+        """Generador asíncrono que recorre todo el catálogo página a página."""
+        pass
+
+    @abstractmethod
+    async def search_books(self, terms: List[str], limit: int, fields: Fields = None) -> List[Record]:
+        pass
+
+    @abstractmethod
+    async def get_changes(self, since: Optional[str], limit: int, cursor: Optional[str] = None) -> Changes:
+        pass
+
+    @abstractmethod
+    async def get_catalog_version(self) -> int:
+        pass
+
+    @abstractmethod
+    async def get_stats(self) -> dict:
+        pass
+
+    @abstractmethod
+    async def update_book(self, book_id: str, book: Book, expected_version: Optional[int] = None) -> Optional[Book]:
+        pass
+
+    @abstractmethod
+    async def borrow_book(self, book_id: str) -> Optional[Book]:
+        pass
+
+    @abstractmethod
+    async def return_book(self, book_id: str) -> Optional[Book]:
+        pass
+
+    @abstractmethod
+    async def add_rating(self, book_id: str, rating: Decimal) -> bool:
+        pass
+
+    @abstractmethod
+    async def rollup_ratings(self, book_id: str) -> Optional[Book]:
+        pass
+
+    @abstractmethod
+    async def delete_book(self, book_id: str) -> bool:
+        pass
@@ -0,0 +1,607 @@
+import asyncio
+import os
+import random
+from datetime import datetime
+from decimal import Decimal
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from aiobotocore.config import AioConfig
+from aiobotocore.session import get_session
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .async_db import AsyncDatabase
+from .changes import TTL_ATTRIBUTE, Changes, change_bucket, changes_state, next_bucket, starting_point
+from .db import Fields, Record, UnprocessedError, out_of_stock, version_conflict
+from .dynamodb_db import (
+    ATTRIBUTE_DEFINITIONS, BATCH_BACKOFF_BASE, BATCH_BACKOFF_CAP, BATCH_GET_LIMIT, BATCH_WRITE_LIMIT, BORROW_STEPS,
+    ENTITY_ATTRIBUTE, GENRE_INDEX, GLOBAL_SECONDARY_INDEXES, MAX_BATCH_RETRIES, RATING_INDEX, RETRY_CONFIG,
+    STOCK_ATTEMPTS, TERM_INDEX, book_to_item, book_updates, catalog_cursor, catalog_cursor_state, catalog_partitions,
+    catalog_totals, catalog_version_keys, catalog_version_update, changes_query, chunks, collect_changes,
+    conditional_update, decode_cursor, encode_cursor, index_requests, is_book_item, merge_rating_pages,
+    projection, rated_retry, rating_cursor_state, rating_shard_requests, rating_totals, rating_update, record_genres,
+    record_text, request_key, rollup_update, stock_changes, stock_update, to_record, tombstone_put, updated_book,
+)
+from .ratings import rating_shard_keys, random_shard, rolled_up_average
+from .search import matches, rank
+from .stats import merge, stats_delta, stats_response
+from models.book import Book
+
+# El cliente de bajo nivel no entiende Attr/Key: mismas condiciones en forma de texto
+BOOK_FILTER = 'attribute_not_exists(#entity)'
+BOOK_FILTER_NAMES = {'#entity': ENTITY_ATTRIBUTE}
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def _dump(item: dict) -> dict:
+    return {k: _serializer.serialize(v) for k, v in item.items()}
+
+
+def _load(item: dict) -> dict:
+    return {k: _deserializer.deserialize(v) for k, v in item.items()}
+
+
+def _with_projection(names: dict, fields: Fields, *extra: str) -> dict:
+    # El cliente de bajo nivel no fusiona nombres: los de la condición y los de la proyección van juntos
+    if not fields:
+        return {'ExpressionAttributeNames': names}
+    request = projection(fields, *extra)
+    return {**request, 'ExpressionAttributeNames': {**names, **request['ExpressionAttributeNames']}}
+
+
+def _dump_request(request: dict) -> dict:
+    if 'PutRequest' in request:
+        return {'PutRequest': {'Item': _dump(request['PutRequest']['Item'])}}
+    return {'DeleteRequest': {'Key': _dump(request['DeleteRequest']['Key'])}}
+
+
+class AsyncDynamoDBDatabase(AsyncDatabase):
+    """Backend DynamoDB sobre aiobotocore: un solo proceso mantiene cientos de llamadas en vuelo."""
+
+    def __init__(self):
+        self.table_name = os.getenv('DB_DYNAMONAME')
+        self._session = get_session()
+        self._client_context = None
+        self._meta_client_context = None
+        self.client = None
+        # Cliente aparte para los items meta#catalog, sin circuit breaker (ver dynamodb_db.py)
+        self.meta_client = None
+        self.on_catalog_version_error: Optional[Callable[[Exception], None]] = None
+
+    def _create_client(self):
+        config = AioConfig(max_pool_connections=int(os.getenv('DDB_MAX_POOL_CONNECTIONS', '200')),
+                           retries=RETRY_CONFIG)
+        return self._session.create_client(
+            'dynamodb',
+            region_name='us-east-1',
+            endpoint_url=os.getenv('DYNAMODB_ENDPOINT_URL') or None,
+            config=config
+        )
+
+    async def connect(self):
+        """Crea los clientes; no hace llamadas de red, así que puede ir antes de initialize()."""
+        if self.client is None:
+            self._client_context = self._create_client()
+            self.client = await self._client_context.__aenter__()
+            self._meta_client_context = self._create_client()
+            self.meta_client = await self._meta_client_context.__aenter__()
+
+    async def close(self):
+        if self._client_context is not None:
+            await self._client_context.__aexit__(None, None, None)
+            await self._meta_client_context.__aexit__(None, None, None)
+            self._client_context = self._meta_client_context = None
+            self.client = self.meta_client = None
+
+    async def initialize(self):
+        await self.connect()
+        try:
+            description = await self.client.describe_table(TableName=self.table_name)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                raise
+            print(f"Creando tabla DynamoDB '{self.table_name}'...")
+            await self.client.create_table(
+                TableName=self.table_name,
+                KeySchema=[{'AttributeName': 'book_id', 'KeyType': 'HASH'}],
+                AttributeDefinitions=ATTRIBUTE_DEFINITIONS,
+                GlobalSecondaryIndexes=GLOBAL_SECONDARY_INDEXES,
+                BillingMode='PAY_PER_REQUEST'
+            )
+            waiter = self.client.get_waiter('table_exists')
+            await waiter.wait(TableName=self.table_name)
+            await self._ensure_ttl()
+            return
+
+        existing = {index['IndexName'] for index in description['Table'].get('GlobalSecondaryIndexes', [])}
+        for index in GLOBAL_SECONDARY_INDEXES:
+            if index['IndexName'] in existing:
+                continue
+            key_attributes = {key['AttributeName'] for key in index['KeySchema']}
+            print(f"Creando índice '{index['IndexName']}' en la tabla '{self.table_name}'...")
+            try:
+                await self.client.update_table(
+                    TableName=self.table_name,
+                    AttributeDefinitions=[a for a in ATTRIBUTE_DEFINITIONS if a['AttributeName'] in key_attributes],
+                    GlobalSecondaryIndexUpdates=[{'Create': index}]
+                )
+            except ClientError as e:
+                print(f"No se pudo crear el índice '{index['IndexName']}': {e.response['Error']['Message']}")
+        await self._ensure_ttl()
+
+    async def _ensure_ttl(self):
+        response = await self.client.describe_time_to_live(TableName=self.table_name)
+        if response['TimeToLiveDescription'].get('TimeToLiveStatus') in ('ENABLED', 'ENABLING'):
+            return
+        print(f"Activando TTL ({TTL_ATTRIBUTE}) en la tabla '{self.table_name}'...")
+        try:
+            await self.client.update_time_to_live(
+                TableName=self.table_name,
+                TimeToLiveSpecification={'Enabled': True, 'AttributeName': TTL_ATTRIBUTE}
+            )
+        except ClientError as e:
+            print(f"No se pudo activar el TTL: {e.response['Error']['Message']}")
+
+    async def _retry_unprocessed(self, send, requests: list) -> list:
+        for attempt in range(MAX_BATCH_RETRIES + 1):
+            requests = await send(requests)
+            if not requests or attempt == MAX_BATCH_RETRIES:
+                break
+            await asyncio.sleep(random.uniform(0, min(BATCH_BACKOFF_CAP, BATCH_BACKOFF_BASE * 2 ** attempt)))
+        return requests
+
+    async def _batch_write(self, requests: list) -> list:
+        response = await self.client.batch_write_item(RequestItems={self.table_name: requests})
+        return response.get('UnprocessedItems', {}).get(self.table_name, [])
+
+    async def _write_all(self, requests: List[dict]) -> List[dict]:
+        """Escribe en lotes de 25 a la vez; devuelve lo que quede sin procesar (serializado)."""
+        batches = [
+            self._retry_unprocessed(self._batch_write, [_dump_request(r) for r in chunk])
+            for chunk in chunks(requests, BATCH_WRITE_LIMIT)
+        ]
+        unprocessed = []
+        for pending in await asyncio.gather(*batches):
+            unprocessed.extend(pending)
+        return unprocessed
+
+    async def create_book(self, book: Book) -> Book:
+        # ALL_OLD: si el book_id ya existía el alta lo reemplaza, y las estadísticas restan el anterior
+        response = await self.client.put_item(
+            TableName=self.table_name, Item=_dump(book_to_item(book)), ReturnValues='ALL_OLD'
+        )
+        old = _load(response['Attributes']) if 'Attributes' in response else None
+        old = old if old and is_book_item(old) else None
+        await self._bump_catalog_version(stats_delta(old, book))
+        await self._sync_index_items(book.book_id, old, book)
+        return book
+
+    async def create_books(self, books: List[Book]) -> List[Optional[Exception]]:
+        results: List[Optional[Exception]] = [None] * len(books)
+        positions = {}
+        items = {}
+        requests = []
+        for i, book in enumerate(books):
+            try:
+                item = book_to_item(book)
+            except ValueError as e:
+                results[i] = e
+                continue
+            if book.book_id in items:
+                results[i] = ValueError("book_id duplicado en el lote.")
+                continue
+            positions[book.book_id] = i
+            items[book.book_id] = item
+
+        # Imágenes anteriores para tratar como reemplazo un book_id que ya existía (ver DynamoDBDatabase)
+        old = await self._get_records(list(items), None, consistent=True) if items else {}
+        owners = {}
+        for book_id, item in items.items():
+            if book_id not in old:
+                results[positions[book_id]] = UnprocessedError("No procesado por DynamoDB tras varios reintentos.")
+                continue
+            book = books[positions[book_id]]
+            for request in [{'PutRequest': {'Item': item}}, *index_requests(book_id, old[book_id], book)]:
+                owners[request_key(request)] = book_id
+                requests.append(request)
+
+        unprocessed = await self._write_all(requests)
+        not_written = set()
+        for request in unprocessed:
+            key = _load(request['PutRequest']['Item'] if 'PutRequest' in request else request['DeleteRequest']['Key'])
+            book_id = owners[key['book_id']]
+            results[positions[book_id]] = UnprocessedError("No procesado por DynamoDB tras varios reintentos.")
+            if key['book_id'] == book_id:
+                not_written.add(book_id)
+        if requests:
+            await self._bump_catalog_version(merge(
+                stats_delta(old[book_id], books[positions[book_id]])
+                for book_id in items if book_id in old and book_id not in not_written
+            ))
+        return results
+
+    async def get_book(self, book_id: str, fields: Fields = None) -> Optional[Record]:
+        response = await self.client.get_item(
+            TableName=self.table_name, Key=_dump({'book_id': book_id}), **(projection(fields) if fields else {})
+        )
+        if 'Item' not in response:
+            return None
+        item = _load(response['Item'])
+        return to_record(item, fields) if is_book_item(item) else None
+
+    async def get_books(self, book_ids: List[str]) -> Dict[str, Optional[Book]]:
+        return await self._get_records(book_ids, None)
+
+    async def _get_records(self, book_ids: List[str], fields: Fields, *extra: str,
+                           consistent: bool = False) -> Dict[str, Optional[Record]]:
+        found: Dict[str, Optional[Record]] = {}
+        request = {**(projection(fields, *extra) if fields else {}), 'ConsistentRead': consistent}
+
+        async def fetch(chunk):
+            async def batch_get(keys):
+                response = await self.client.batch_get_item(RequestItems={self.table_name: {'Keys': keys, **request}})
+                for raw in response.get('Responses', {}).get(self.table_name, []):
+                    item = _load(raw)
+                    if is_book_item(item):
+                        found[item['book_id']] = to_record(item, fields)
+                return response.get('UnprocessedKeys', {}).get(self.table_name, {}).get('Keys', [])
+
+            unprocessed = await self._retry_unprocessed(batch_get, [_dump({'book_id': book_id}) for book_id in chunk])
+            unprocessed_ids = {_load(key)['book_id'] for key in unprocessed}
+            for book_id in chunk:
+                if book_id not in found and book_id not in unprocessed_ids:
+                    found[book_id] = None
+
+        # Los lotes de 100 se piden en paralelo
+        await asyncio.gather(*(fetch(chunk) for chunk in chunks(list(dict.fromkeys(book_ids)), BATCH_GET_LIMIT)))
+        return found
+
+    async def get_all_books(self) -> List[Book]:
+        books = [book async for book in self.iter_books()]
+        return sorted(books, key=lambda x: getattr(x, 'average_rating', 0))
+
+    async def _page(self, operation, cursor: Optional[str], **kwargs) -> Tuple[List[dict], Optional[str]]:
+        start_key = decode_cursor(cursor)
+        if start_key:
+            kwargs['ExclusiveStartKey'] = _dump(start_key)
+        response = await operation(TableName=self.table_name, **kwargs)
+        last_key = response.get('LastEvaluatedKey')
+        return [_load(item) for item in response.get('Items', [])], encode_cursor(_load(last_key) if last_key else None)
+
+    async def get_books_page(self, limit: int, cursor: Optional[str] = None,
+                             fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        # Como en DynamoDBDatabase: las particiones de rating-index solo tienen libros
+        partitions = catalog_partitions()
+        position, start_key = catalog_cursor_state(cursor)
+        items = []
+        while position < len(partitions) and len(items) < limit:
+            kwargs = {
+                'IndexName': RATING_INDEX,
+                'KeyConditionExpression': '#catalog = :catalog',
+                'ExpressionAttributeValues': _dump({':catalog': partitions[position]}),
+                'Limit': limit - len(items),
+                **_with_projection({'#catalog': 'catalog'}, fields),
+            }
+            if start_key:
+                kwargs['ExclusiveStartKey'] = _dump(start_key)
+            response = await self.client.query(TableName=self.table_name, **kwargs)
+            items.extend(_load(item) for item in response.get('Items', []))
+            last_key = response.get('LastEvaluatedKey')
+            start_key = _load(last_key) if last_key else None
+            if start_key is None:
+                position += 1
+        return [to_record(item, fields) for item in items], catalog_cursor(position, start_key)
+
+    async def get_books_by_rating(self, limit: int, cursor: Optional[str] = None, descending: bool = True,
+                                  fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        async def query(partition, start_key):
+            kwargs = {
+                'IndexName': RATING_INDEX,
+                'KeyConditionExpression': '#catalog = :catalog',
+                'ExpressionAttributeValues': _dump({':catalog': partition}),
+                'ScanIndexForward': not descending,
+                'Limit': limit,
+                **_with_projection({'#catalog': 'catalog'}, fields, 'catalog', 'average_rating'),
+            }
+            if start_key:
+                kwargs['ExclusiveStartKey'] = _dump(start_key)
+            response = await self.client.query(TableName=self.table_name, **kwargs)
+            last_key = response.get('LastEvaluatedKey')
+            return start_key, [_load(item) for item in response.get('Items', [])], _load(last_key) if last_key else None
+
+        # Las particiones de rating-index se consultan a la vez y se mezclan
+        state = rating_cursor_state(cursor)
+        results = await asyncio.gather(*(query(partition, start_key) for partition, start_key in state.items()))
+        items, next_cursor = merge_rating_pages(dict(zip(state, results)), limit, descending)
+        return [to_record(item, fields) for item in items], next_cursor
+
+    async def get_books_by_genre(self, genre: str, limit: int, cursor: Optional[str] = None,
+                                 fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        items, next_cursor = await self._page(
+            self.client.query, cursor,
+            IndexName=GENRE_INDEX,
+            KeyConditionExpression='genre_key = :genre',
+            ExpressionAttributeValues=_dump({':genre': genre}),
+            Limit=limit
+        )
+        book_ids = [item['target_id'] for item in items]
+        found = await self._get_records(book_ids, fields, 'genre') if book_ids else {}
+        books = [
+            found[book_id] for book_id in book_ids
+            if found.get(book_id) is not None and genre in record_genres(found[book_id])
+        ]
+        return books, next_cursor
+
+    async def iter_books(self, fields: Fields = None) -> AsyncIterator[Record]:
+        scan_kwargs = {
+            'FilterExpression': BOOK_FILTER, 'ConsistentRead': True, **_with_projection(BOOK_FILTER_NAMES, fields)
+        }
+        while True:
+            response = await self.client.scan(TableName=self.table_name, **scan_kwargs)
+            for item in response.get('Items', []):
+                yield to_record(_load(item), fields)
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                return
+            scan_kwargs['ExclusiveStartKey'] = last_key
+
+    async def get_changes(self, since: Optional[str], limit: int, cursor: Optional[str] = None) -> Changes:
+        state = changes_state(since, cursor)
+        if state['since'] is None:
+            return starting_point(state)
+        books, deleted = [], []
+        bucket = state.get('bucket') or change_bucket(state['since'])
+        last_bucket = change_bucket(datetime.utcnow().isoformat())
+        start_key = state.get('key')
+        while True:
+            remaining = limit - len(books) - len(deleted)
+            if not remaining:
+                return Changes(books, deleted, encode_cursor({**state, 'bucket': bucket, 'key': start_key}), None)
+            query_kwargs = changes_query(bucket, state['since'], remaining)
+            query_kwargs['ExpressionAttributeValues'] = _dump(query_kwargs['ExpressionAttributeValues'])
+            if start_key:
+                query_kwargs['ExclusiveStartKey'] = _dump(start_key)
+            response = await self.client.query(TableName=self.table_name, **query_kwargs)
+            collect_changes([_load(item) for item in response.get('Items', [])], books, deleted)
+            last_key = response.get('LastEvaluatedKey')
+            start_key = _load(last_key) if last_key else None
+            if start_key is None:
+                if bucket >= last_bucket:
+                    return Changes(books, deleted, None, state['next_since'])
+                bucket = next_bucket(bucket)
+
+    async def search_books(self, terms: List[str], limit: int, fields: Fields = None) -> List[Record]:
+        # Los términos se leen a la vez; el AND se resuelve al ordenar
+        postings = dict(zip(terms, await asyncio.gather(*(self._term_postings(term) for term in terms))))
+        ranked = [book_id for book_id, _ in rank(postings)]
+        books = []
+        # Más candidatos mientras las entradas de libros borrados o cambiados dejen la página corta
+        for window in chunks(ranked, limit):
+            found = await self._get_records(window, fields, 'title', 'description')
+            books.extend(
+                found[book_id] for book_id in window
+                if found.get(book_id) is not None and matches(terms, *record_text(found[book_id]))
+            )
+            if len(books) >= limit:
+                break
+        return books[:limit]
+
+    async def _term_postings(self, term: str) -> Dict[str, int]:
+        query_kwargs = {
+            'IndexName': TERM_INDEX,
+            'KeyConditionExpression': 'term_key = :term',
+            'ExpressionAttributeValues': _dump({':term': term}),
+            'ProjectionExpression': 'target_id, #weight',
+            'ExpressionAttributeNames': {'#weight': 'weight'},
+        }
+        postings = {}
+        while True:
+            response = await self.client.query(TableName=self.table_name, **query_kwargs)
+            for item in response.get('Items', []):
+                item = _load(item)
+                postings[item['target_id']] = int(item['weight'])
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                return postings
+            query_kwargs['ExclusiveStartKey'] = last_key
+
+    async def update_book(self, book_id: str, book: Book, expected_version: Optional[int] = None) -> Optional[Book]:
+        updates = book_updates(book_id, book)
+        try:
+            try:
+                response = await self._conditional_update(book_id, updates, expected_version)
+            except ClientError as e:
+                retry = rated_retry(updates)
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException' or retry is None:
+                    raise
+                # Puede ser un libro con valoraciones: se conserva la media del roll-up
+                updates = retry
+                response = await self._conditional_update(book_id, updates, expected_version)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            if expected_version is None:
+                return None
+            conflict = version_conflict(book_id, expected_version, await self.get_book(book_id))
+            if conflict is None:
+                return None
+            raise conflict
+        old_item = _load(response.get('Attributes', {}))
+        updated = updated_book(book_id, old_item, updates)
+        await self._bump_catalog_version(stats_delta(old_item, updated))
+        await self._sync_index_items(book_id, old_item, updated)
+        return updated
+
+    async def _conditional_update(self, book_id: str, updates: dict, expected_version: Optional[int]) -> dict:
+        update = conditional_update(book_id, updates, expected_version)
+        return await self.client.update_item(
+            TableName=self.table_name,
+            Key=_dump(update['Key']),
+            UpdateExpression=update['UpdateExpression'],
+            ConditionExpression=update['ConditionExpression'],
+            ExpressionAttributeNames=update['ExpressionAttributeNames'],
+            ExpressionAttributeValues=_dump(update['ExpressionAttributeValues']),
+            ReturnValues=update['ReturnValues']
+        )
+
+    async def borrow_book(self, book_id: str) -> Optional[Book]:
+        updated_at = datetime.utcnow().isoformat()
+        for _ in range(STOCK_ATTEMPTS):
+            for stock_condition, status in BORROW_STEPS:
+                old_item = await self._update_stock(stock_update(book_id, -1, updated_at, stock_condition, status))
+                if old_item is not None:
+                    return await self._stock_changed(book_id, old_item, stock_changes(old_item, -1, updated_at, status))
+            response = await self.client.get_item(
+                TableName=self.table_name, Key=_dump({'book_id': book_id}), ConsistentRead=True
+            )
+            current = _load(response['Item']) if 'Item' in response else None
+            if current is None or not is_book_item(current):
+                return None
+            if int(current.get('stock', 0)) < 1:
+                raise out_of_stock(book_id)
+        raise UnprocessedError("El stock cambia demasiado deprisa; reintentar el préstamo.")
+
+    async def return_book(self, book_id: str) -> Optional[Book]:
+        updated_at = datetime.utcnow().isoformat()
+        old_item = await self._update_stock(stock_update(book_id, 1, updated_at, status='available'))
+        if old_item is None:
+            return None
+        return await self._stock_changed(book_id, old_item, stock_changes(old_item, 1, updated_at, 'available'))
+
+    async def add_rating(self, book_id: str, rating: Decimal) -> bool:
+        update = rating_update(book_id, random_shard(), rating)
+        await self.client.update_item(
+            TableName=self.table_name,
+            Key=_dump(update['Key']),
+            UpdateExpression=update['UpdateExpression'],
+            ExpressionAttributeNames=update['ExpressionAttributeNames'],
+            ExpressionAttributeValues=_dump(update['ExpressionAttributeValues'])
+        )
+        return True
+
+    async def rollup_ratings(self, book_id: str) -> Optional[Book]:
+        total, count = rating_totals(await self._rating_shards(book_id))
+        if not count:
+            return None
+        average = rolled_up_average(total, count)
+        updated_at = datetime.utcnow().isoformat()
+        update = rollup_update(book_id, average, count, updated_at)
+        try:
+            response = await self.client.update_item(
+                TableName=self.table_name,
+                Key=_dump(update['Key']),
+                UpdateExpression=update['UpdateExpression'],
+                ConditionExpression=update['ConditionExpression'],
+                ExpressionAttributeNames=update['ExpressionAttributeNames'],
+                ExpressionAttributeValues=_dump(update['ExpressionAttributeValues']),
+                ReturnValues=update['ReturnValues']
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return None
+        old_item = _load(response['Attributes'])
+        updated = updated_book(book_id, old_item, {'average_rating': average, 'updated_at': updated_at})
+        await self._bump_catalog_version(stats_delta(old_item, updated))
+        return updated
+
+    async def _rating_shards(self, book_id: str) -> List[dict]:
+        shards = []
+        request = {'ConsistentRead': True, 'ProjectionExpression': 'rating_sum, rating_count'}
+
+        async def batch_get(keys):
+            response = await self.client.batch_get_item(RequestItems={self.table_name: {'Keys': keys, **request}})
+            shards.extend(_load(item) for item in response.get('Responses', {}).get(self.table_name, []))
+            return response.get('UnprocessedKeys', {}).get(self.table_name, {}).get('Keys', [])
+
+        for chunk in chunks(rating_shard_keys(book_id), BATCH_GET_LIMIT):
+            if await self._retry_unprocessed(batch_get, [_dump(key) for key in chunk]):
+                raise UnprocessedError("No se pudieron leer todos los shards de valoraciones.")
+        return shards
+
+    async def _update_stock(self, update: dict) -> Optional[dict]:
+        try:
+            response = await self.client.update_item(
+                TableName=self.table_name,
+                Key=_dump(update['Key']),
+                UpdateExpression=update['UpdateExpression'],
+                ConditionExpression=update['ConditionExpression'],
+                ExpressionAttributeNames=update['ExpressionAttributeNames'],
+                ExpressionAttributeValues=_dump(update['ExpressionAttributeValues']),
+                ReturnValues=update['ReturnValues']
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return None
+        return _load(response.get('Attributes', {}))
+
+    async def _stock_changed(self, book_id: str, old_item: dict, changes: dict) -> Book:
+        updated = updated_book(book_id, old_item, changes)
+        await self._bump_catalog_version(stats_delta(old_item, updated))
+        return updated
+
+    async def _sync_index_items(self, book_id: str, old: Optional[Record], new: Optional[Record]):
+        if await self._write_all(index_requests(book_id, old, new)):
+            raise UnprocessedError("No se pudieron actualizar los índices por género y de búsqueda.")
+
+    async def delete_book(self, book_id: str) -> bool:
+        put = tombstone_put(book_id, datetime.utcnow())
+        try:
+            response = await self.client.put_item(
+                TableName=self.table_name,
+                Item=_dump(put['Item']),
+                ConditionExpression=put['ConditionExpression'],
+                ExpressionAttributeNames=put['ExpressionAttributeNames'],
+                ReturnValues=put['ReturnValues']
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+        if 'Attributes' not in response:
+            return False
+        old_item = _load(response['Attributes'])
+        await self._bump_catalog_version(stats_delta(old_item, None))
+        await self._sync_index_items(book_id, old_item, None)
+        await self._write_all(rating_shard_requests(book_id, old_item))
+        return True
+
+    async def get_catalog_version(self) -> int:
+        return int((await self._catalog_totals(consistent=True))['version'])
+
+    async def get_stats(self) -> dict:
+        return stats_response(await self._catalog_totals(consistent=False))
+
+    async def _catalog_totals(self, consistent: bool) -> dict:
+        items = []
+
+        async def batch_get(keys):
+            response = await self.meta_client.batch_get_item(
+                RequestItems={self.table_name: {'Keys': keys, 'ConsistentRead': consistent}}
+            )
+            items.extend(_load(item) for item in response.get('Responses', {}).get(self.table_name, []))
+            return response.get('UnprocessedKeys', {}).get(self.table_name, {}).get('Keys', [])
+
+        for chunk in chunks([_dump(key) for key in catalog_version_keys()], BATCH_GET_LIMIT):
+            if await self._retry_unprocessed(batch_get, chunk):
+                raise UnprocessedError("No se pudo leer la versión del catálogo.")
+        return catalog_totals(items)
+
+    async def _bump_catalog_version(self, delta: Optional[Dict] = None):
+        # Como en DynamoDBDatabase: el libro ya está escrito y un fallo aquí no llega al cliente
+        update = catalog_version_update(delta)
+        try:
+            await self.meta_client.update_item(
+                TableName=self.table_name,
+                Key=_dump(update['Key']),
+                UpdateExpression=update['UpdateExpression'],
+                ExpressionAttributeNames=update['ExpressionAttributeNames'],
+                ExpressionAttributeValues=_dump(update['ExpressionAttributeValues'])
+            )
+        except (BotoCoreError, ClientError) as e:
+            print(f"No se pudo actualizar la versión del catálogo: {type(e).__name__}: {e}")
+            if self.on_catalog_version_error is not None:
+                self.on_catalog_version_error(e)
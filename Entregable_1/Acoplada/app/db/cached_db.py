@@ -0,0 +1,226 @@
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Tuple
+from .changes import Changes
+from .db import Database, Fields, Record, projected_attributes
+from models.book import Book
+
+_MISSING = object()
+
+
+def _key(fields: Fields):
+    return tuple(fields) if fields else None
+
+
+class LRUCache:
+    """Caché LRU acotada con caducidad por TTL y contadores de aciertos/fallos/expulsiones."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return _MISSING
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class CachedDatabase(Database):
+    """Caché de lectura delante de cualquier implementación de Database.
+
+    Las escrituras invalidan el libro afectado y todas las páginas de listados.
+    Los objetos devueltos se comparten entre peticiones y no deben modificarse.
+    """
+
+    def __init__(self, backend: Database, maxsize: int = 1024, ttl: float = 30.0):
+        self.backend = backend
+        self.cache = LRUCache(maxsize, ttl)
+        # Se incrementa en cada escritura: una lectura que empezó antes no puede
+        # guardar en caché un valor que ya está obsoleto
+        self._generation = 0
+        self._generation_lock = threading.Lock()
+
+    def initialize(self):
+        self.backend.initialize()
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+    def _read_through(self, key, load):
+        value = self.cache.get(key)
+        if value is not _MISSING:
+            return value
+        generation = self._generation
+        value = load()
+        if value is None:
+            # No se cachean los inexistentes para no ocultar altas recientes
+            return value
+        with self._generation_lock:
+            if generation == self._generation:
+                self.cache.set(key, value)
+        return value
+
+    def _invalidate(self, *book_ids: str):
+        with self._generation_lock:
+            self._generation += 1
+            for book_id in book_ids:
+                self.cache.delete(('book', book_id))
+            self.cache.delete_where(lambda key: key[0] == 'list')
+
+    def create_book(self, book: Book) -> Book:
+        try:
+            return self.backend.create_book(book)
+        finally:
+            self._invalidate(book.book_id)
+
+    def create_books(self, books: List[Book]) -> List[Optional[Exception]]:
+        try:
+            return self.backend.create_books(books)
+        finally:
+            self._invalidate(*(book.book_id for book in books))
+
+    def get_book(self, book_id: str, fields: Fields = None) -> Optional[Record]:
+        if not fields:
+            return self._read_through(('book', book_id), lambda: self.backend.get_book(book_id))
+        # Las lecturas parciales de un libro no se cachean aparte (la invalidación es por ('book', id)),
+        # pero se sirven del libro completo si ya está en caché
+        book = self.cache.get(('book', book_id))
+        if book is _MISSING:
+            return self.backend.get_book(book_id, fields)
+        return {field: getattr(book, field) for field in projected_attributes(fields)}
+
+    def get_books(self, book_ids: List[str]) -> Dict[str, Optional[Book]]:
+        found: Dict[str, Optional[Book]] = {}
+        missing = []
+        for book_id in dict.fromkeys(book_ids):
+            value = self.cache.get(('book', book_id))
+            if value is _MISSING:
+                missing.append(book_id)
+            else:
+                found[book_id] = value
+        if missing:
+            generation = self._generation
+            loaded = self.backend.get_books(missing)
+            with self._generation_lock:
+                if generation == self._generation:
+                    for book_id, book in loaded.items():
+                        if book is not None:
+                            self.cache.set(('book', book_id), book)
+            found.update(loaded)
+        return found
+
+    def get_all_books(self) -> List[Book]:
+        return self._read_through(('list', 'all'), self.backend.get_all_books)
+
+    def get_books_page(self, limit: int, cursor: Optional[str] = None,
+                       fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        return self._read_through(('list', 'page', limit, cursor, _key(fields)),
+                                  lambda: self.backend.get_books_page(limit, cursor, fields))
+
+    def get_books_by_rating(self, limit: int, cursor: Optional[str] = None, descending: bool = True,
+                            fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        return self._read_through(('list', 'rating', limit, cursor, descending, _key(fields)),
+                                  lambda: self.backend.get_books_by_rating(limit, cursor, descending, fields))
+
+    def get_books_by_genre(self, genre: str, limit: int, cursor: Optional[str] = None,
+                           fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        return self._read_through(('list', 'genre', genre, limit, cursor, _key(fields)),
+                                  lambda: self.backend.get_books_by_genre(genre, limit, cursor, fields))
+
+    def iter_books(self, fields: Fields = None) -> Iterator[Record]:
+        # El listado completo en streaming no se cachea: es justo el caso de tablas grandes
+        return self.backend.iter_books(fields)
+
+    def search_books(self, terms: List[str], limit: int, fields: Fields = None) -> List[Record]:
+        # Bajo 'list': cualquier escritura puede cambiar los resultados
+        return self._read_through(('list', 'search', tuple(terms), limit, _key(fields)),
+                                  lambda: self.backend.search_books(terms, limit, fields))
+
+    def get_changes(self, since: Optional[str], limit: int, cursor: Optional[str] = None) -> Changes:
+        # Sin caché: quien sincroniza quiere justo lo que aún no ha visto
+        return self.backend.get_changes(since, limit, cursor)
+
+    def get_catalog_version(self) -> int:
+        # Sin caché: el ETag del listado completo depende de leerla siempre del backend
+        return self.backend.get_catalog_version()
+
+    def get_stats(self) -> dict:
+        # Bajo 'list': cualquier escritura la invalida
+        return self._read_through(('list', 'stats'), self.backend.get_stats)
+
+    def update_book(self, book_id: str, book: Book, expected_version: Optional[int] = None) -> Optional[Book]:
+        try:
+            return self.backend.update_book(book_id, book, expected_version)
+        finally:
+            self._invalidate(book_id)
+
+    def borrow_book(self, book_id: str) -> Optional[Book]:
+        try:
+            return self.backend.borrow_book(book_id)
+        finally:
+            self._invalidate(book_id)
+
+    def return_book(self, book_id: str) -> Optional[Book]:
+        try:
+            return self.backend.return_book(book_id)
+        finally:
+            self._invalidate(book_id)
+
+    def add_rating(self, book_id: str, rating: Decimal) -> bool:
+        # Solo escribe en un shard: el libro no cambia hasta el roll-up
+        return self.backend.add_rating(book_id, rating)
+
+    def rollup_ratings(self, book_id: str) -> Optional[Book]:
+        updated = self.backend.rollup_ratings(book_id)
+        if updated is not None:
+            self._invalidate(book_id)
+        return updated
+
+    def delete_book(self, book_id: str) -> bool:
+        try:
+            return self.backend.delete_book(book_id)
+        finally:
+            self._invalidate(book_id)
@@ -0,0 +1,104 @@
+"""Sincronización incremental del catálogo (GET /books/changes?since=...).
+
+Un cliente que mantiene una copia local pide solo lo que ha cambiado desde la
+última vez: los libros con updated_at >= since y los borrados desde entonces,
+paginados con cursor. El coste depende de cuántos cambios hay, no del tamaño
+del catálogo.
+
+En DynamoDB cada libro lleva change_bucket (el día de su updated_at) y
+changes-index lo ordena por updated_at dentro de cada día: se consulta día a día
+desde since. Borrar un libro no elimina el item, lo convierte en un tombstone
+(entity "tombstone", con updated_at y change_bucket del borrado) que DynamoDB
+elimina cuando pasa expires_at (TTL); volver a crear ese book_id lo sobrescribe.
+PostgreSQL guarda los borrados en book_tombstones y purga los caducados al borrar.
+
+Los borrados se guardan TOMBSTONE_RETENTION_DAYS días: con un since más antiguo no
+se puede saber qué se borró y se rechaza (410), y el cliente recarga el catálogo.
+
+updated_at lo pone el servidor que escribe y los índices se actualizan con
+retardo, así que un cambio puede hacerse visible después de que se leyera ya
+más allá de su updated_at. Por eso next_since, el since de la siguiente
+sincronización, se queda CHANGES_LAG segundos por detrás de la primera página:
+algunos cambios llegan dos veces, pero ninguno se pierde (aplicarlos dos veces
+da lo mismo). Sin since ni cursor solo se devuelve next_since: el punto de
+partida que el cliente guarda antes de cargar el catálogo completo.
+"""
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import List, NamedTuple, Optional
+
+from .pagination import decode_cursor
+
+TOMBSTONE_RETENTION_DAYS = int(os.getenv('TOMBSTONE_RETENTION_DAYS', '7'))
+CHANGES_LAG = float(os.getenv('CHANGES_LAG', '5'))
+
+# Los tombstones llevan entity, como los demás items auxiliares: los listados y las lecturas no los ven
+TOMBSTONE_ENTITY = 'tombstone'
+# Atributo TTL de la tabla; solo lo llevan los tombstones
+TTL_ATTRIBUTE = 'expires_at'
+
+# change_bucket: 'YYYY-MM-DD' de updated_at
+BUCKET_LENGTH = len('YYYY-MM-DD')
+
+
+class SinceExpiredError(ValueError):
+    """since es anterior a los borrados que se conservan: hay que recargar el catálogo completo."""
+
+
+class Changes(NamedTuple):
+    books: list
+    # {'book_id', 'deleted_at'} de cada libro borrado
+    deleted: List[dict]
+    next_cursor: Optional[str]
+    # Solo en la última página: el since de la siguiente sincronización
+    next_since: Optional[str]
+
+
+def change_bucket(updated_at: str) -> str:
+    return updated_at[:BUCKET_LENGTH]
+
+
+def next_bucket(bucket: str) -> str:
+    return (date.fromisoformat(bucket) + timedelta(days=1)).isoformat()
+
+
+def parse_since(value: Optional[str], now: datetime) -> Optional[str]:
+    """since de la query en el formato de updated_at (ISO 8601 en UTC, sin zona). Lanza ValueError."""
+    if value is None:
+        return None
+    try:
+        # 'Z' no lo admite fromisoformat antes de Python 3.11
+        moment = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    except ValueError:
+        raise ValueError("El parámetro 'since' debe ser una fecha ISO 8601 (el next_since de una respuesta anterior).")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    if moment < now - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        raise SinceExpiredError(
+            f"Los borrados se conservan {TOMBSTONE_RETENTION_DAYS} días: hay que recargar el catálogo completo."
+        )
+    return moment.isoformat()
+
+
+def changes_state(since: Optional[str], cursor: Optional[str]) -> dict:
+    """Estado de la sincronización: el del cursor o, en la primera página, uno nuevo desde since.
+
+    Lleva since y next_since, fijado en la primera página; cada backend añade su posición.
+    """
+    if cursor:
+        state = decode_cursor(cursor)
+        if not isinstance(state.get('since'), str) or not isinstance(state.get('next_since'), str):
+            raise ValueError("Cursor de paginación inválido.")
+        return state
+    lagged = (datetime.utcnow() - timedelta(seconds=CHANGES_LAG)).isoformat()
+    return {'since': since, 'next_since': max(since, lagged) if since else lagged}
+
+
+def starting_point(state: dict) -> Changes:
+    """Respuesta sin since: ningún cambio, solo el next_since desde el que sincronizar."""
+    return Changes([], [], None, state['next_since'])
+
+
+def deleted_entry(book_id: str, deleted_at: str) -> dict:
+    return {'book_id': book_id, 'deleted_at': deleted_at}
+
@@ -0,0 +1,181 @@
+"""Group commit de las altas: agrupa los create_book concurrentes en un solo create_books.
+
+Cada POST /books espera en una cola; un hilo de fondo junta las altas que llegan
+en una ventana corta (window segundos desde la primera, o max_batch libros) y
+las escribe con create_books, que en DynamoDB las manda por BatchWriteItem de
+25 items (libros y sus entradas de índices) e incrementa una sola vez la versión
+y las estadísticas del catálogo. Cada petición recibe su propio resultado o error.
+
+A cambio cada alta espera como mucho window segundos más; con poca carga el
+lote es de un libro y solo se paga esa espera. Si el lote no se confirma en
+timeout segundos el alta falla con UnprocessedError (503): puede haberse escrito
+igualmente si ya iba en un lote.
+"""
+import threading
+import time
+from decimal import Decimal
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .changes import Changes
+from .db import Database, Fields, Record, UnprocessedError
+from models.book import Book
+
+
+class _PendingCreate:
+    __slots__ = ('book', 'enqueued_at', 'error', 'done')
+
+    def __init__(self, book: Book):
+        self.book = book
+        self.enqueued_at = time.monotonic()
+        self.error: Optional[Exception] = None
+        self.done = threading.Event()
+
+
+class CoalescingDatabase(Database):
+    """Delante de un backend: las altas se agrupan, el resto de operaciones pasan tal cual.
+
+    on_flush(tamaño, esperas) se llama tras cada lote con lo que esperó cada alta (métricas).
+    """
+
+    def __init__(self, backend: Database, window: float = 0.005, max_batch: int = 25,
+                 on_flush: Optional[Callable[[int, List[float]], None]] = None, timeout: float = 10.0):
+        self.backend = backend
+        self.window = window
+        self.max_batch = max_batch
+        self.on_flush = on_flush
+        self.timeout = timeout
+        self._queue: List[_PendingCreate] = []
+        self._cond = threading.Condition()
+        self._flusher = None
+
+    def initialize(self):
+        self.backend.initialize()
+
+    def _ensure_flusher(self):
+        # Se arranca con la primera alta, ya dentro del worker (gunicorn hace fork antes),
+        # y se vuelve a arrancar si el hilo ha muerto
+        if self._flusher is None or not self._flusher.is_alive():
+            with self._cond:
+                if self._flusher is None or not self._flusher.is_alive():
+                    self._flusher = threading.Thread(target=self._run, name='write-coalescer', daemon=True)
+                    self._flusher.start()
+
+    def create_book(self, book: Book) -> Book:
+        self._ensure_flusher()
+        pending = _PendingCreate(book)
+        with self._cond:
+            self._queue.append(pending)
+            self._cond.notify_all()
+        if not pending.done.wait(self.timeout):
+            with self._cond:
+                if pending in self._queue:
+                    self._queue.remove(pending)
+            raise UnprocessedError("El alta no se ha confirmado a tiempo; reintentar.")
+        if pending.error is not None:
+            raise pending.error
+        return book
+
+    def _next_batch(self) -> List[_PendingCreate]:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = self._queue[0].enqueued_at + self.window
+            while len(self._queue) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            # Un mismo book_id dos veces en un lote haría fallar la segunda alta: espera al siguiente
+            batch, rest, ids = [], [], set()
+            for pending in self._queue:
+                if len(batch) < self.max_batch and pending.book.book_id not in ids:
+                    batch.append(pending)
+                    ids.add(pending.book.book_id)
+                else:
+                    rest.append(pending)
+            self._queue = rest
+            return batch
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch = self._next_batch()
+                self._flush(batch)
+            except Exception as e:
+                # El hilo no puede morir: las altas siguientes se quedarían esperando
+                print(f"Group commit de altas fallido: {type(e).__name__}: {e}")
+                for pending in batch:
+                    if not pending.done.is_set():
+                        pending.error = UnprocessedError("No procesado, reintentar.")
+                        pending.done.set()
+
+    def _flush(self, batch: List[_PendingCreate]):
+        started = time.monotonic()
+        try:
+            errors = self.backend.create_books([pending.book for pending in batch])
+        except Exception as e:
+            errors = [e] * len(batch)
+        for pending, error in zip(batch, errors):
+            pending.error = error
+            pending.done.set()
+        if self.on_flush is not None:
+            self.on_flush(len(batch), [started - pending.enqueued_at for pending in batch])
+
+    def create_books(self, books: List[Book]) -> List[Optional[Exception]]:
+        # Ya es un lote: no pasa por la cola
+        return self.backend.create_books(books)
+
+    def get_book(self, book_id: str, fields: Fields = None) -> Optional[Record]:
+        return self.backend.get_book(book_id, fields)
+
+    def get_books(self, book_ids: List[str]) -> Dict[str, Optional[Book]]:
+        return self.backend.get_books(book_ids)
+
+    def get_all_books(self) -> List[Book]:
+        return self.backend.get_all_books()
+
+    def get_books_page(self, limit: int, cursor: Optional[str] = None,
+                       fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        return self.backend.get_books_page(limit, cursor, fields)
+
+    def get_books_by_rating(self, limit: int, cursor: Optional[str] = None, descending: bool = True,
+                            fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        return self.backend.get_books_by_rating(limit, cursor, descending, fields)
+
+    def get_books_by_genre(self, genre: str, limit: int, cursor: Optional[str] = None,
+                           fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        return self.backend.get_books_by_genre(genre, limit, cursor, fields)
+
+    def iter_books(self, fields: Fields = None) -> Iterator[Record]:
+        return self.backend.iter_books(fields)
+
+    def search_books(self, terms: List[str], limit: int, fields: Fields = None) -> List[Record]:
+        return self.backend.search_books(terms, limit, fields)
+
+    def get_changes(self, since: Optional[str], limit: int, cursor: Optional[str] = None) -> Changes:
+        return self.backend.get_changes(since, limit, cursor)
+
+    def get_catalog_version(self) -> int:
+        return self.backend.get_catalog_version()
+
+    def get_stats(self) -> dict:
+        return self.backend.get_stats()
+
+    def update_book(self, book_id: str, book: Book, expected_version: Optional[int] = None) -> Optional[Book]:
+        return self.backend.update_book(book_id, book, expected_version)
+
+    def borrow_book(self, book_id: str) -> Optional[Book]:
+        return self.backend.borrow_book(book_id)
+
+    def return_book(self, book_id: str) -> Optional[Book]:
+        return self.backend.return_book(book_id)
+
+    def add_rating(self, book_id: str, rating: Decimal) -> bool:
+        return self.backend.add_rating(book_id, rating)
+
+    def rollup_ratings(self, book_id: str) -> Optional[Book]:
+        return self.backend.rollup_ratings(book_id)
+
+    def delete_book(self, book_id: str) -> bool:
+        return self.backend.delete_book(book_id)
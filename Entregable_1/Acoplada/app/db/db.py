@@ -1,12 +1,91 @@
+import os
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
 from models.book import Book
+from .changes import Changes
+
+# Los items y filas se validan al escribirse, así que al leerlos no se vuelve a pasar
+# por el modelo (Book.from_trusted). STRICT_READS=true valida también las lecturas, para
+# detectar datos escritos por fuera de la API.
+STRICT_READS = os.getenv('STRICT_READS', 'false').lower() in ('1', 'true', 'yes')
+
+# Lectura parcial (fields=...): en vez de Book se devuelve el item tal cual, sin validar,
+# con los campos pedidos más PROJECTION_KEYS, que identifican el libro y dan su ETag
+Fields = Optional[Sequence[str]]
+Record = Union[Book, dict]
+PROJECTION_KEYS = ('book_id', 'updated_at', 'version')
+
+
+class UnprocessedError(Exception):
+    """El backend no pudo completar la operación para ese elemento; el cliente puede reintentar."""
+
+
+class ConflictError(Exception):
+    """La escritura choca con el estado actual: ya existe ese book_id o el libro no está en la versión esperada."""
+
+
+class OutOfStockError(ConflictError):
+    """Préstamo de un libro sin copias disponibles (stock 0)."""
+
+
+def check_min_attributes(data: dict):
+    """Un libro debe tener al menos 3 atributos con valor, sin contar id ni fechas."""
+    non_empty_fields = {
+        k: v for k, v in data.items()
+        if v not in (None, "", [], {}) and k not in ("book_id", "created_at", "updated_at", "version")
+    }
+    if len(non_empty_fields) < 3:
+        raise ValueError("El libro debe tener al menos 3 atributos con valor.")
+
+
+def update_fields(book: Book) -> dict:
+    """Campos a escribir en una actualización parcial (sin vacíos ni campos inmutables).
+
+    version no se escribe nunca desde el cliente: la incrementa el backend, y
+    updated_at es siempre la hora del servidor (la del cliente se ignora).
+    average_rating solo si el cliente la envía: el 0.0 por defecto del modelo
+    borraría la media del roll-up (db/ratings.py).
+    """
+    updates = {
+        k: v for k, v in book.model_dump().items()
+        if v not in (None, "", [], {}) and k not in ("book_id", "created_at", "version")
+    }
+    if "average_rating" not in book.model_fields_set:
+        updates.pop("average_rating", None)
+    updates["updated_at"] = datetime.utcnow().isoformat()
+    return updates
+
+
+def version_conflict(book_id: str, expected_version: int, current: Optional[Book]) -> Optional[ConflictError]:
+    """Tras una actualización condicional fallida: None si el libro no existe, o el conflicto de versión."""
+    if current is None:
+        return None
+    return ConflictError(
+        f"El libro {book_id} está en la versión {current.version}, no en la {expected_version} indicada en If-Match."
+    )
+
+
+def out_of_stock(book_id: str) -> OutOfStockError:
+    return OutOfStockError(f"No quedan copias disponibles del libro {book_id}.")
+
+
+def load_book(data: dict) -> Book:
+    """Book a partir de un item o fila leído del backend."""
+    return Book(**data) if STRICT_READS else Book.from_trusted(data)
+
+
+def projected_attributes(fields: Sequence[str], *extra: str) -> List[str]:
+    """Atributos a leer para `fields`; `extra` son los que necesita el propio backend (p. ej. genre para filtrar)."""
+    return list(dict.fromkeys((*PROJECTION_KEYS, *fields, *extra)))
 
 
 class Database(ABC):
     
     @abstractmethod
     def initialize(self):
+        """Crea o comprueba tablas e índices. Los constructores no la llaman: se ejecuta aparte."""
         pass
     
     @abstractmethod
@@ -14,17 +93,120 @@ class Database(ABC):
         pass
     
     @abstractmethod
-    def get_book(self, book_id: str) -> Optional[Book]:
+    def create_books(self, books: List[Book]) -> List[Optional[Exception]]:
+        """Alta por lotes. Devuelve, para cada libro y en el mismo orden, None si se creó o el error
+        (ValueError si el libro no es válido, ConflictError si el backend no admite sobrescribirlo,
+        UnprocessedError si hay que reintentarlo)."""
+        pass
+    
+    @abstractmethod
+    def get_book(self, book_id: str, fields: Fields = None) -> Optional[Record]:
+        """Con fields devuelve un dict parcial (ver PROJECTION_KEYS) en lugar de un Book."""
+        pass
+
+    @abstractmethod
+    def get_books(self, book_ids: List[str]) -> Dict[str, Optional[Book]]:
+        """Lectura por lotes: book_id -> libro, o None si no existe. Los ids que no se pudieron leer no aparecen."""
         pass
     
     @abstractmethod
     def get_all_books(self) -> List[Book]:
         pass
+
+    @abstractmethod
+    def get_books_page(self, limit: int, cursor: Optional[str] = None,
+                       fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        """Devuelve como mucho `limit` libros y el cursor opaco de la siguiente página (None si no hay más)."""
+        pass
+
+    @abstractmethod
+    def get_books_by_rating(self, limit: int, cursor: Optional[str] = None, descending: bool = True,
+                            fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        """Página de libros ordenados por average_rating; el coste depende de `limit`, no del catálogo."""
+        pass
+
+    @abstractmethod
+    def get_books_by_genre(self, genre: str, limit: int, cursor: Optional[str] = None,
+                           fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        """Página de libros de un género; el coste depende del tamaño de ese género."""
+        pass
+
+    @abstractmethod
+    def iter_books(self, fields: Fields = None) -> Iterator[Record]:
+        """Recorre todo el catálogo página a página sin cargarlo entero en memoria."""
+        pass
+
+    @abstractmethod
+    def search_books(self, terms: List[str], limit: int, fields: Fields = None) -> List[Record]:
+        """Los `limit` libros más relevantes que contienen todos los términos (ver db/search.py).
+
+        El coste depende de cuántos libros tienen esos términos, no del tamaño del catálogo.
+        """
+        pass
     
     @abstractmethod
-    def update_book(self, book_id: str, book: Book) -> Optional[Book]:
+    def get_changes(self, since: Optional[str], limit: int, cursor: Optional[str] = None) -> Changes:
+        """Libros cambiados y borrados desde since, como mucho `limit` por página (ver db/changes.py).
+
+        El coste depende de los cambios, no del catálogo. Sin since ni cursor solo
+        devuelve next_since, el punto de partida de una copia recién cargada.
+        """
+        pass
+
+    @abstractmethod
+    def get_catalog_version(self) -> int:
+        """Contador que cambia con cada escritura del catálogo (ETag del listado completo).
+
+        Se lee de forma consistente: un listado leído después ve al menos esta versión.
+        """
+        pass
+
+    @abstractmethod
+    def get_stats(self) -> dict:
+        """Resumen del catálogo (ver db/stats.py): libros, stock, libros por estado y género, valoración media.
+
+        DynamoDB lo mantiene con cada escritura (leerlo no recorre la tabla); PostgreSQL lo agrega en una consulta.
+        """
+        pass
+
+    @abstractmethod
+    def update_book(self, book_id: str, book: Book, expected_version: Optional[int] = None) -> Optional[Book]:
+        """Actualización parcial en una sola operación que incrementa version.
+
+        Devuelve None si el libro no existe. Con expected_version (If-Match) lanza
+        ConflictError si el libro ya no está en esa versión.
+        """
+        pass
+
+    @abstractmethod
+    def borrow_book(self, book_id: str) -> Optional[Book]:
+        """Presta una copia: stock - 1 sin leer el libro antes, y status "borrowed" al llegar a 0.
+
+        Es atómico frente a otros préstamos (nunca deja stock negativo). Devuelve
+        None si el libro no existe y lanza OutOfStockError si no quedan copias.
+        """
+        pass
+
+    @abstractmethod
+    def return_book(self, book_id: str) -> Optional[Book]:
+        """Devuelve una copia: stock + 1 y status "available". None si el libro no existe."""
         pass
     
+    @abstractmethod
+    def add_rating(self, book_id: str, rating: Decimal) -> bool:
+        """Suma una valoración a un shard del libro (ver db/ratings.py) sin leer ni escribir el libro.
+
+        False si se sabe que el libro no existe; DynamoDB no lo comprueba (no añade
+        lecturas) y las valoraciones de un libro inexistente no llegan a ninguna media.
+        """
+        pass
+
+    @abstractmethod
+    def rollup_ratings(self, book_id: str) -> Optional[Book]:
+        """Escribe en average_rating la media de los shards. None si no había valoraciones nuevas o no existe
+        (en PostgreSQL también si la media redondeada no cambia: el libro queda igual)."""
+        pass
+
     @abstractmethod
     def delete_book(self, book_id: str) -> bool:
         pass
\ No newline at end of file
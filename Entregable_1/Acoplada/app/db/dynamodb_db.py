@@ -1,42 +1,596 @@
 import boto3
-from botocore.exceptions import ClientError
-from typing import List, Optional
-from .db import Database
-from models.book import Book
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 from decimal import Decimal
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from .changes import (
+    TOMBSTONE_ENTITY, TOMBSTONE_RETENTION_DAYS, TTL_ATTRIBUTE, Changes, change_bucket, changes_state, deleted_entry,
+    next_bucket, starting_point,
+)
+from .db import (
+    Database, Fields, Record, UnprocessedError, check_min_attributes, load_book, out_of_stock, projected_attributes,
+    update_fields, version_conflict,
+)
+from .pagination import decode_cursor, encode_cursor
+from .ratings import RATING_ENTITY, rating_shard_key, rating_shard_keys, random_shard, rolled_up_average
+from .search import matches, rank, term_weights
+from .stats import STAT_PREFIX, add_expression, merge, stats_delta, stats_response
+from models.book import Book
+import heapq
 import os
+import random
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+
+# Límites de DynamoDB por llamada
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+MAX_BATCH_RETRIES = 5
+BATCH_BACKOFF_BASE = 0.05
+BATCH_BACKOFF_CAP = 2.0
+
+# Reintentos de botocore: backoff exponencial con jitter y cuota de reintentos (ver resilience.py).
+# El modo antiguo hacía hasta 9 reintentos por llamada a DynamoDB y amplificaba los picos de throttling
+RETRY_CONFIG = {
+    'mode': os.getenv('DDB_RETRY_MODE', 'standard'),
+    'max_attempts': int(os.getenv('DDB_MAX_ATTEMPTS', '3')),
+}
+
+# Índice por valoración: average_rating ordenado dentro de cada partición "catalog". Los libros se
+# reparten entre CATALOG_SHARDS particiones ("books#<n>", por hash de book_id) y los listados
+# ordenados mezclan las N consultas: con una sola partición todas las escrituras de libros caían en
+# la misma partición del índice, que admite unas 1000 escrituras/s, y al saturarse DynamoDB frena
+# también las escrituras de la tabla. El techo pasa a ser unas CATALOG_SHARDS * 1000 escrituras/s.
+# Cambiar CATALOG_SHARDS (o venir de la partición única "books") exige `python bulk.py reindex`
+RATING_INDEX = 'rating-index'
+CATALOG_PARTITION = 'books'
+CATALOG_SHARDS = int(os.getenv('CATALOG_SHARDS', '8'))
+
+# Índice por género: por cada género de un libro se escribe un item auxiliar
+# ("genre#<género>#<book_id>") con genre_key/target_id, indexado por genre-index
+GENRE_INDEX = 'genre-index'
+
+# Índice de búsqueda: por cada término de title/description un item auxiliar
+# ("term#<término>#<book_id>") con term_key/target_id y su peso, indexado por term-index
+TERM_INDEX = 'term-index'
+
+# Sincronización incremental (db/changes.py): libros y tombstones por día (change_bucket) y updated_at
+CHANGES_INDEX = 'changes-index'
+
+# Los items auxiliares (índices, agregados...) llevan "entity" y no son libros
+ENTITY_ATTRIBUTE = 'entity'
+BOOK_FILTER = Attr(ENTITY_ATTRIBUTE).not_exists()
+
+# Items auxiliares con la versión del catálogo (cada escritura la incrementa) y las estadísticas (db/stats.py).
+# Cada escritura suma en uno de CATALOG_VERSION_SHARDS items elegido al azar y las lecturas suman todos:
+# con un solo item todas las escrituras de la API caían en la misma clave. Solo puede crecer, como RATING_SHARDS
+CATALOG_VERSION_KEY = {'book_id': 'meta#catalog'}
+CATALOG_VERSION_SHARDS = int(os.getenv('CATALOG_VERSION_SHARDS', '10'))
+
+ATTRIBUTE_DEFINITIONS = [
+    {'AttributeName': 'book_id', 'AttributeType': 'S'},
+    {'AttributeName': 'catalog', 'AttributeType': 'S'},
+    {'AttributeName': 'average_rating', 'AttributeType': 'N'},
+    {'AttributeName': 'genre_key', 'AttributeType': 'S'},
+    {'AttributeName': 'target_id', 'AttributeType': 'S'},
+    {'AttributeName': 'term_key', 'AttributeType': 'S'},
+    {'AttributeName': 'change_bucket', 'AttributeType': 'S'},
+    {'AttributeName': 'updated_at', 'AttributeType': 'S'},
+]
+
+GLOBAL_SECONDARY_INDEXES = [
+    {
+        'IndexName': RATING_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'catalog', 'KeyType': 'HASH'},
+            {'AttributeName': 'average_rating', 'KeyType': 'RANGE'},
+        ],
+        'Projection': {'ProjectionType': 'ALL'},
+    },
+    {
+        'IndexName': GENRE_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'genre_key', 'KeyType': 'HASH'},
+            {'AttributeName': 'target_id', 'KeyType': 'RANGE'},
+        ],
+        'Projection': {'ProjectionType': 'KEYS_ONLY'},
+    },
+    {
+        'IndexName': TERM_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'term_key', 'KeyType': 'HASH'},
+            {'AttributeName': 'target_id', 'KeyType': 'RANGE'},
+        ],
+        # El peso viaja en el índice: la búsqueda ordena sin leer los items
+        'Projection': {'ProjectionType': 'INCLUDE', 'NonKeyAttributes': ['weight']},
+    },
+    {
+        'IndexName': CHANGES_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'change_bucket', 'KeyType': 'HASH'},
+            {'AttributeName': 'updated_at', 'KeyType': 'RANGE'},
+        ],
+        # Los cambios se devuelven enteros sin volver a leer la tabla
+        'Projection': {'ProjectionType': 'ALL'},
+    },
+]
+
+
+def chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def catalog_partition(book_id: str) -> str:
+    """Partición de rating-index de un libro: estable para cada book_id."""
+    return f"{CATALOG_PARTITION}#{zlib.crc32(book_id.encode('utf-8')) % CATALOG_SHARDS}"
+
+
+def catalog_partitions() -> List[str]:
+    return [f"{CATALOG_PARTITION}#{shard}" for shard in range(CATALOG_SHARDS)]
+
+
+def add_index_attributes(item: dict, book_id: Optional[str] = None) -> dict:
+    """Añade a un item los atributos que alimentan los índices secundarios."""
+    item['catalog'] = catalog_partition(book_id or item['book_id'])
+    if 'updated_at' in item:
+        item['change_bucket'] = change_bucket(item['updated_at'])
+    return item
+
+
+def rating_index_key(item: dict) -> dict:
+    return {'book_id': item['book_id'], 'catalog': item['catalog'], 'average_rating': item['average_rating']}
+
+
+def is_rating_index_key(key, partition: str) -> bool:
+    """Si key es una clave de inicio de rating-index (rating_index_key) de esa partición."""
+    return (
+        isinstance(key, dict) and set(key) == {'book_id', 'catalog', 'average_rating'}
+        and key['catalog'] == partition and isinstance(key['book_id'], str)
+        and isinstance(key['average_rating'], (int, Decimal)) and not isinstance(key['average_rating'], bool)
+    )
+
+
+def rating_cursor_state(cursor: Optional[str]) -> Dict[str, Optional[dict]]:
+    """Clave de inicio de cada partición de rating-index; las ya agotadas no aparecen."""
+    if not cursor:
+        return {partition: None for partition in catalog_partitions()}
+    state = decode_cursor(cursor).get('catalog')
+    partitions = catalog_partitions()
+    # El cursor llega del cliente: solo particiones existentes y claves con la forma de rating-index
+    if not isinstance(state, dict) or not all(
+        partition in partitions and (key is None or is_rating_index_key(key, partition))
+        for partition, key in state.items()
+    ):
+        raise ValueError("Cursor de paginación inválido.")
+    return state
+
+
+def merge_rating_pages(pages: Dict[str, Tuple[Optional[dict], List[dict], Optional[dict]]], limit: int,
+                       descending: bool) -> Tuple[List[dict], Optional[str]]:
+    """Mezcla las páginas de cada partición de rating-index (clave de inicio, items, LastEvaluatedKey).
+
+    Cada página trae hasta `limit` items ordenados, así que los `limit` primeros del total
+    están entre ellos. El cursor guarda por partición el último item consumido.
+    """
+    streams = [[(item['average_rating'], partition, item) for item in items]
+               for partition, (_, items, _) in pages.items()]
+    taken = list(heapq.merge(*streams, key=lambda entry: entry[0], reverse=descending))[:limit]
+    consumed, last = {}, {}
+    for _, partition, item in taken:
+        consumed[partition] = consumed.get(partition, 0) + 1
+        last[partition] = item
+    state = {}
+    for partition, (start_key, items, last_key) in pages.items():
+        if consumed.get(partition, 0) < len(items):
+            state[partition] = rating_index_key(last[partition]) if partition in last else start_key
+        elif last_key:
+            state[partition] = last_key
+    return [item for _, _, item in taken], encode_cursor({'catalog': state}) if state else None
+
+
+def catalog_cursor_state(cursor: Optional[str]) -> Tuple[int, Optional[dict]]:
+    """Partición de rating-index por la que va el listado sin orden y su clave de inicio."""
+    if not cursor:
+        return 0, None
+    state = decode_cursor(cursor)
+    if not isinstance(state.get('partition'), int) or not isinstance(state.get('key'), (dict, type(None))):
+        raise ValueError("Cursor de paginación inválido.")
+    return state['partition'], state['key']
+
+
+def catalog_cursor(position: int, start_key: Optional[dict]) -> Optional[str]:
+    if position >= CATALOG_SHARDS:
+        return None
+    return encode_cursor({'partition': position, 'key': start_key})
+
+
+def genre_item_key(book_id: str, genre: str) -> dict:
+    return {'book_id': f"genre#{genre}#{book_id}"}
+
+
+def genre_items(book_id: str, genres: List[str]) -> List[dict]:
+    """Items auxiliares que apuntan a un libro desde cada uno de sus géneros."""
+    return [
+        {**genre_item_key(book_id, genre), ENTITY_ATTRIBUTE: 'genre', 'genre_key': genre, 'target_id': book_id}
+        for genre in dict.fromkeys(genres)
+    ]
+
+
+def genre_index_requests(book_id: str, old_genres: List[str], new_genres: List[str]) -> List[dict]:
+    """Peticiones de BatchWriteItem que llevan el índice por género de old_genres a new_genres."""
+    requests = [
+        {'DeleteRequest': {'Key': genre_item_key(book_id, genre)}}
+        for genre in set(old_genres) - set(new_genres)
+    ]
+    requests += [
+        {'PutRequest': {'Item': item}}
+        for item in genre_items(book_id, [g for g in new_genres if g not in old_genres])
+    ]
+    return requests
+
+
+def term_item_key(book_id: str, term: str) -> dict:
+    return {'book_id': f"term#{term}#{book_id}"}
+
+
+def term_items(book_id: str, weights: Dict[str, int]) -> List[dict]:
+    """Items auxiliares que apuntan a un libro desde cada término de su título y descripción."""
+    return [
+        {**term_item_key(book_id, term), ENTITY_ATTRIBUTE: 'term', 'term_key': term, 'target_id': book_id,
+         'weight': weight}
+        for term, weight in weights.items()
+    ]
+
+
+def term_index_requests(book_id: str, old_terms: Dict[str, int], new_terms: Dict[str, int]) -> List[dict]:
+    """Peticiones de BatchWriteItem que llevan el índice de búsqueda de old_terms a new_terms."""
+    requests = [
+        {'DeleteRequest': {'Key': term_item_key(book_id, term)}}
+        for term in old_terms if term not in new_terms
+    ]
+    requests += [
+        {'PutRequest': {'Item': item}}
+        for item in term_items(book_id, {t: w for t, w in new_terms.items() if old_terms.get(t) != w})
+    ]
+    return requests
+
+
+def record_text(record: Record) -> Tuple[Optional[str], Optional[str]]:
+    if isinstance(record, dict):
+        return record.get('title'), record.get('description')
+    return record.title, record.description
+
+
+def book_terms(record: Record) -> Dict[str, int]:
+    return term_weights(*record_text(record))
+
+
+def index_items(book: Book) -> List[dict]:
+    """Items auxiliares de un libro nuevo: sus géneros y sus términos."""
+    return [*genre_items(book.book_id, book.genre), *term_items(book.book_id, book_terms(book))]
+
+
+def index_requests(book_id: str, old: Optional[Record], new: Optional[Record]) -> List[dict]:
+    """Peticiones que llevan los índices auxiliares (género y búsqueda) del libro old al new (None: sin libro)."""
+    return (
+        genre_index_requests(book_id, record_genres(old) if old else [], record_genres(new) if new else [])
+        + term_index_requests(book_id, book_terms(old) if old else {}, book_terms(new) if new else {})
+    )
+
+
+def request_key(request: dict) -> str:
+    """Clave (book_id) del item de una petición de BatchWriteItem."""
+    if 'PutRequest' in request:
+        return request['PutRequest']['Item']['book_id']
+    return request['DeleteRequest']['Key']['book_id']
+
+
+def catalog_version_key(shard: int) -> dict:
+    # El shard 0 es el item único de antes: conserva la versión y las estadísticas ya acumuladas
+    return CATALOG_VERSION_KEY if shard == 0 else {'book_id': f"{CATALOG_VERSION_KEY['book_id']}#{shard}"}
+
+
+def catalog_version_keys() -> List[dict]:
+    return [catalog_version_key(shard) for shard in range(CATALOG_VERSION_SHARDS)]
+
+
+def catalog_version_update(delta: Optional[Dict] = None, shard: Optional[int] = None) -> dict:
+    """Argumentos de update_item que incrementan la versión del catálogo y suman delta a las estadísticas.
+
+    Sin shard se elige uno al azar.
+    """
+    clauses, names, values = add_expression(delta or {})
+    if shard is None:
+        shard = random.randrange(CATALOG_VERSION_SHARDS)
+    return {
+        'Key': catalog_version_key(shard),
+        'UpdateExpression': 'ADD ' + ', '.join(['#version :one', *clauses]) + ' SET #entity = :meta',
+        'ExpressionAttributeNames': {'#version': 'version', '#entity': ENTITY_ATTRIBUTE, **names},
+        'ExpressionAttributeValues': {':one': 1, ':meta': 'meta', **values},
+    }
+
+
+def catalog_totals(items: List[dict]) -> dict:
+    """Suma los shards de meta#catalog: la versión y los contadores stat:*, como si fueran un solo item."""
+    totals = {'version': Decimal(0)}
+    for item in items:
+        for name, value in item.items():
+            if name == 'version' or name.startswith(STAT_PREFIX):
+                totals[name] = totals.get(name, Decimal(0)) + value
+    return totals
+
+
+def projection(fields: Sequence[str], *extra: str) -> dict:
+    """ProjectionExpression de una lectura parcial. Siempre incluye entity, para seguir distinguiendo los libros."""
+    attributes = projected_attributes(fields, ENTITY_ATTRIBUTE, *extra)
+    names = {f'#f{i}': attribute for i, attribute in enumerate(attributes)}
+    return {'ProjectionExpression': ', '.join(names), 'ExpressionAttributeNames': names}
+
+
+def to_record(item: dict, fields: Fields) -> Record:
+    """Book validado, o con fields el item leído tal cual (sin pasar por el modelo)."""
+    return item if fields else load_book(item)
+
+
+def record_genres(record: Record) -> List[str]:
+    return record.get('genre', []) if isinstance(record, dict) else record.genre
+
+
+def is_book_item(item: dict) -> bool:
+    return ENTITY_ATTRIBUTE not in item
+
+
+def book_to_item(book: Book) -> dict:
+    # Convierte el modelo Pydantic a diccionario; el modelo ya tipa average_rating
+    # como Decimal, así que no hace falta recorrerlo buscando floats
+    item_dict = book.model_dump()
+
+    check_min_attributes(item_dict)
+    return add_index_attributes(item_dict)
+
+
+def book_updates(book_id: str, book: Book) -> dict:
+    """Campos a escribir en una actualización parcial (sin vacíos ni campos inmutables)."""
+    updates = update_fields(book)
+
+    # Los items anteriores a los índices los reciben al actualizarse
+    return add_index_attributes(updates, book_id)
+
+
+def update_expression(updates: dict) -> Tuple[str, dict, dict]:
+    # Generar dinámicamente la expresión de actualización
+    update_expr = "SET " + ", ".join(f"#{k} = :{k}" for k in updates.keys())
+    expr_attr_names = {f"#{k}": k for k in updates.keys()}
+    expr_attr_values = {f":{k}": v for k, v in updates.items()}
+    return update_expr, expr_attr_names, expr_attr_values
+
+
+def conditional_update(book_id: str, updates: dict, expected_version: Optional[int]) -> dict:
+    """Argumentos de update_item: actualización parcial que incrementa version en el mismo viaje.
+
+    Solo se aplica sobre un libro que exista (nunca crea uno nuevo) y, con
+    expected_version, solo si sigue en esa versión. Los libros anteriores a
+    version cuentan como versión 0. Una average_rating del cliente solo se
+    escribe en libros sin valoraciones: en los demás la media es del roll-up
+    y quien llama repite la actualización sin ella (rated_retry).
+    """
+    update_expr, expr_attr_names, expr_attr_values = update_expression(updates)
+    update_expr += ", #version = if_not_exists(#version, :zero) + :one"
+    expr_attr_names.update({'#version': 'version', '#entity': ENTITY_ATTRIBUTE})
+    expr_attr_values.update({':zero': 0, ':one': 1})
+    condition = "attribute_exists(book_id) AND attribute_not_exists(#entity)"
+    if 'average_rating' in updates:
+        expr_attr_names['#rating_count'] = 'rating_count'
+        condition += " AND attribute_not_exists(#rating_count)"
+    if expected_version is not None:
+        expr_attr_values[':expected'] = expected_version
+        if expected_version == 0:
+            condition += " AND (attribute_not_exists(#version) OR #version = :expected)"
+        else:
+            condition += " AND #version = :expected"
+    return {
+        'Key': {'book_id': book_id},
+        'UpdateExpression': update_expr,
+        'ConditionExpression': condition,
+        'ExpressionAttributeNames': expr_attr_names,
+        'ExpressionAttributeValues': expr_attr_values,
+        'ReturnValues': 'ALL_OLD',  # El estado anterior dice qué entradas del índice sobran
+    }
+
+
+def rated_retry(updates: dict) -> Optional[dict]:
+    """Tras un ConditionalCheckFailed: la misma actualización sin average_rating, o None si no la llevaba."""
+    if 'average_rating' not in updates:
+        return None
+    return {k: v for k, v in updates.items() if k != 'average_rating'}
+
+
+def updated_book(book_id: str, old_item: dict, updates: dict) -> Book:
+    return load_book({**old_item, 'book_id': book_id, **updates, 'version': int(old_item.get('version', 0)) + 1})
+
+
+# Un préstamo prueba primero "quedan más copias" (status no cambia) y después "es la última"
+# (pasa a borrowed en la misma escritura). Si no se cumple ninguna, una lectura decide
+BORROW_STEPS = (('>', None), ('=', 'borrowed'))
+# Vueltas a BORROW_STEPS si entre las dos condiciones y la lectura el stock cambia cada vez
+STOCK_ATTEMPTS = 3
+
+
+def stock_update(book_id: str, delta: int, updated_at: str, stock_condition: Optional[str] = None,
+                 status: Optional[str] = None) -> dict:
+    """Argumentos de update_item que suman delta a stock con ADD (sin leer el libro) e incrementan version.
+
+    stock_condition compara el stock actual con 1 ('>' o '=') antes de sumar; status
+    se escribe en la misma operación. Solo se aplica sobre un libro que exista.
+    """
+    names = {
+        '#stock': 'stock', '#version': 'version', '#updated_at': 'updated_at', '#bucket': 'change_bucket',
+        '#entity': ENTITY_ATTRIBUTE,
+    }
+    values = {':delta': delta, ':one': 1, ':now': updated_at, ':bucket': change_bucket(updated_at)}
+    expression = 'ADD #stock :delta, #version :one SET #updated_at = :now, #bucket = :bucket'
+    if status is not None:
+        names['#status'] = 'status'
+        values[':status'] = status
+        expression += ', #status = :status'
+    condition = 'attribute_exists(book_id) AND attribute_not_exists(#entity)'
+    if stock_condition is not None:
+        condition += f' AND #stock {stock_condition} :one'
+    return {
+        'Key': {'book_id': book_id},
+        'UpdateExpression': expression,
+        'ConditionExpression': condition,
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values,
+        'ReturnValues': 'ALL_OLD',  # Para las estadísticas y la respuesta
+    }
+
+
+def stock_changes(old_item: dict, delta: int, updated_at: str, status: Optional[str]) -> dict:
+    """Lo que ha escrito stock_update, para construir el libro resultante con updated_book."""
+    changes = {'stock': int(old_item.get('stock', 0)) + delta, 'updated_at': updated_at}
+    if status is not None:
+        changes['status'] = status
+    return changes
+
+
+def rating_update(book_id: str, shard: int, rating: Decimal) -> dict:
+    """Argumentos de update_item que suman una valoración a un shard (lo crea si no existe)."""
+    return {
+        'Key': rating_shard_key(book_id, shard),
+        'UpdateExpression': 'ADD #sum :rating, #count :one SET #entity = :entity, #target = :book_id',
+        'ExpressionAttributeNames': {
+            '#sum': 'rating_sum', '#count': 'rating_count', '#entity': ENTITY_ATTRIBUTE, '#target': 'target_id',
+        },
+        'ExpressionAttributeValues': {':rating': rating, ':one': 1, ':entity': RATING_ENTITY, ':book_id': book_id},
+    }
+
+
+def rollup_update(book_id: str, average: Decimal, count: int, updated_at: str) -> dict:
+    """Argumentos de update_item que escriben la media en el libro si hay valoraciones nuevas (ver db/ratings.py)."""
+    return {
+        'Key': {'book_id': book_id},
+        'UpdateExpression': 'SET #rating = :average, #count = :count, #updated_at = :now, #bucket = :bucket '
+                            'ADD #version :one',
+        'ConditionExpression': 'attribute_exists(book_id) AND attribute_not_exists(#entity) '
+                               'AND (attribute_not_exists(#count) OR #count < :count)',
+        'ExpressionAttributeNames': {
+            '#rating': 'average_rating', '#count': 'rating_count', '#updated_at': 'updated_at',
+            '#bucket': 'change_bucket', '#version': 'version', '#entity': ENTITY_ATTRIBUTE,
+        },
+        'ExpressionAttributeValues': {
+            ':average': average, ':count': count, ':now': updated_at, ':bucket': change_bucket(updated_at), ':one': 1,
+        },
+        'ReturnValues': 'ALL_OLD',
+    }
+
+
+def rating_totals(shards: List[dict]) -> Tuple[Decimal, int]:
+    return (sum((Decimal(shard.get('rating_sum', 0)) for shard in shards), Decimal(0)),
+            sum(int(shard.get('rating_count', 0)) for shard in shards))
+
+
+def tombstone_item(book_id: str, deleted_at: datetime) -> dict:
+    """Item que reemplaza a un libro borrado hasta que caduca su TTL (ver db/changes.py)."""
+    updated_at = deleted_at.isoformat()
+    expires_at = deleted_at.replace(tzinfo=timezone.utc) + timedelta(days=TOMBSTONE_RETENTION_DAYS)
+    return {
+        'book_id': book_id,
+        ENTITY_ATTRIBUTE: TOMBSTONE_ENTITY,
+        'updated_at': updated_at,
+        'change_bucket': change_bucket(updated_at),
+        TTL_ATTRIBUTE: int(expires_at.timestamp()),
+    }
+
+
+def tombstone_put(book_id: str, deleted_at: datetime) -> dict:
+    """Argumentos de put_item que borran un libro dejando su tombstone; nunca sobre un item auxiliar."""
+    return {
+        'Item': tombstone_item(book_id, deleted_at),
+        'ConditionExpression': 'attribute_exists(book_id) AND attribute_not_exists(#entity)',
+        'ExpressionAttributeNames': {'#entity': ENTITY_ATTRIBUTE},
+        'ReturnValues': 'ALL_OLD',  # El libro borrado: estadísticas e índices auxiliares
+    }
+
+
+def changes_query(bucket: str, since: str, limit: int) -> dict:
+    """Argumentos de query sobre changes-index: cambios de un día con updated_at >= since."""
+    return {
+        'IndexName': CHANGES_INDEX,
+        'KeyConditionExpression': '#bucket = :bucket AND #updated_at >= :since',
+        'ExpressionAttributeNames': {'#bucket': 'change_bucket', '#updated_at': 'updated_at'},
+        'ExpressionAttributeValues': {':bucket': bucket, ':since': since},
+        'Limit': limit,
+    }
+
+
+def collect_changes(items: List[dict], books: list, deleted: List[dict]):
+    for item in items:
+        if item.get(ENTITY_ATTRIBUTE) == TOMBSTONE_ENTITY:
+            deleted.append(deleted_entry(item['book_id'], item['updated_at']))
+        elif is_book_item(item):
+            books.append(load_book(item))
+
+
+def rating_shard_requests(book_id: str, old_item: dict) -> List[dict]:
+    """Borrado de los shards de un libro borrado; solo si llegó a tener valoraciones (rating_count)."""
+    if 'rating_count' not in old_item:
+        return []
+    return [{'DeleteRequest': {'Key': key}} for key in rating_shard_keys(book_id)]
+
 
 class DynamoDBDatabase(Database):
     
     def __init__(self):
-        self.dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        self.dynamodb = boto3.resource(
+            'dynamodb',
+            region_name='us-east-1',
+            endpoint_url=os.getenv('DYNAMODB_ENDPOINT_URL') or None,  # DynamoDB Local para pruebas
+            config=Config(retries=RETRY_CONFIG)
+        )
         self.table_name = os.getenv('DB_DYNAMONAME')
         self.table = self.dynamodb.Table(self.table_name)
-        self.initialize()
+        # Cliente aparte para los items meta#catalog: main.py no le instala el circuit breaker, así que
+        # el throttling de esas claves no corta las lecturas de libros (ver _bump_catalog_version)
+        self.meta_dynamodb = boto3.resource(
+            'dynamodb',
+            region_name='us-east-1',
+            endpoint_url=os.getenv('DYNAMODB_ENDPOINT_URL') or None,
+            config=Config(retries=RETRY_CONFIG)
+        )
+        self.meta_table = self.meta_dynamodb.Table(self.table_name)
+        # Se llama con la excepción cuando falla _bump_catalog_version (métricas)
+        self.on_catalog_version_error: Optional[Callable[[Exception], None]] = None
     
     def initialize(self):
+        # No se llama desde __init__: crear el objeto no hace llamadas de red (ver readiness.py)
         try:
             self.table.load()
         except ClientError as e:
             if e.response['Error']['Code'] == 'ResourceNotFoundException':
                 # La tabla no existe, crearla
                 print(f"Creando tabla DynamoDB '{self.table_name}'...")
-                table = self.dynamodb.create_table(
-                    TableName=self.table_name,
-                    KeySchema=[
-                        {
-                            'AttributeName': 'book_id',
-                            'KeyType': 'HASH'
-                        }
-                    ],
-                    AttributeDefinitions=[
-                        {
-                            'AttributeName': 'book_id',
-                            'AttributeType': 'S'
-                        }
-                    ],
-                    BillingMode='PAY_PER_REQUEST'
-                )
+                try:
+                    table = self.dynamodb.create_table(
+                        TableName=self.table_name,
+                        KeySchema=[
+                            {
+                                'AttributeName': 'book_id',
+                                'KeyType': 'HASH'
+                            }
+                        ],
+                        AttributeDefinitions=ATTRIBUTE_DEFINITIONS,
+                        GlobalSecondaryIndexes=GLOBAL_SECONDARY_INDEXES,
+                        BillingMode='PAY_PER_REQUEST'
+                    )
+                except ClientError as create_error:
+                    # Otro worker la está creando a la vez: basta con esperarla
+                    if create_error.response['Error']['Code'] != 'ResourceInUseException':
+                        raise
+                    table = self.dynamodb.Table(self.table_name)
                 
                 # Esperar a que la tabla esté activa
                 table.wait_until_exists()
@@ -45,6 +599,42 @@ class DynamoDBDatabase(Database):
                 self.table = table
             else:
                 raise
+        else:
+            self._ensure_indexes()
+        self._ensure_ttl()
+
+    def _ensure_indexes(self):
+        # Tablas creadas antes de existir los índices: se añaden los que falten
+        existing = {index['IndexName'] for index in (self.table.global_secondary_indexes or [])}
+        for index in GLOBAL_SECONDARY_INDEXES:
+            if index['IndexName'] in existing:
+                continue
+            key_attributes = {key['AttributeName'] for key in index['KeySchema']}
+            print(f"Creando índice '{index['IndexName']}' en la tabla '{self.table_name}'...")
+            try:
+                self.table.meta.client.update_table(
+                    TableName=self.table_name,
+                    AttributeDefinitions=[a for a in ATTRIBUTE_DEFINITIONS if a['AttributeName'] in key_attributes],
+                    GlobalSecondaryIndexUpdates=[{'Create': index}]
+                )
+            except ClientError as e:
+                # DynamoDB solo admite crear un índice por llamada; el resto se crea en el siguiente arranque
+                print(f"No se pudo crear el índice '{index['IndexName']}': {e.response['Error']['Message']}")
+
+    def _ensure_ttl(self):
+        # DynamoDB elimina los tombstones al pasar expires_at (ver db/changes.py)
+        client = self.table.meta.client
+        description = client.describe_time_to_live(TableName=self.table_name)['TimeToLiveDescription']
+        if description.get('TimeToLiveStatus') in ('ENABLED', 'ENABLING'):
+            return
+        print(f"Activando TTL ({TTL_ATTRIBUTE}) en la tabla '{self.table_name}'...")
+        try:
+            client.update_time_to_live(
+                TableName=self.table_name,
+                TimeToLiveSpecification={'Enabled': True, 'AttributeName': TTL_ATTRIBUTE}
+            )
+        except ClientError as e:
+            print(f"No se pudo activar el TTL: {e.response['Error']['Message']}")
     
     #   def create_book(self, book: Book) -> Book:
     #       self.table.put_item(Item=book.model_dump())
@@ -52,45 +642,250 @@ class DynamoDBDatabase(Database):
     
    
     def create_book(self, book: Book) -> Book:
-        # Convierte el modelo Pydantic a diccionario
-        item_dict = book.model_dump()
-
-        def convert_to_decimal(obj):
-            if isinstance(obj, float):
-                return Decimal(str(obj))
-            elif isinstance(obj, list):
-                return [convert_to_decimal(i) for i in obj]
-            elif isinstance(obj, dict):
-                return {k: convert_to_decimal(v) for k, v in obj.items()}
-            else:
-                return obj
+        # ALL_OLD: si el book_id ya existía el alta lo reemplaza, y las estadísticas restan el anterior
+        response = self.table.put_item(Item=book_to_item(book), ReturnValues='ALL_OLD')
+        old = response.get('Attributes')
+        old = old if old and is_book_item(old) else None
+        self._bump_catalog_version(stats_delta(old, book))
+        # Las entradas de los índices por género y de búsqueda que ya no correspondan se borran
+        self._sync_index_items(book.book_id, old, book)
+        return book
 
-        item_dict = convert_to_decimal(item_dict)
+    def create_books(self, books: List[Book]) -> List[Optional[Exception]]:
+        results: List[Optional[Exception]] = [None] * len(books)
+        positions = {}
+        requests = {}
+        pending = []
+        for i, book in enumerate(books):
+            try:
+                item = book_to_item(book)
+            except ValueError as e:
+                results[i] = e
+                continue
+            if book.book_id in requests:
+                # BatchWriteItem rechaza el lote entero si una clave se repite
+                results[i] = ValueError("book_id duplicado en el lote.")
+                continue
+            positions[book.book_id] = i
+            requests[book.book_id] = item
 
-        # Validar que tenga al menos 3 atributos válidos
-        non_empty_fields = {
-            k: v for k, v in item_dict.items()
-            if v not in (None, "", [], {}) and k not in ("book_id", "created_at", "updated_at")
-        }
+        # BatchWriteItem no devuelve la imagen anterior: se lee antes para que las estadísticas y los
+        # índices traten como reemplazo un book_id que ya existía. Entre la lectura y la escritura
+        # puede colarse otra escritura del mismo libro; esa deriva la corrige rebuild-stats.
+        old = self._get_records(list(requests), None, consistent=True) if requests else {}
+        owners = {}
+        for book_id, item in requests.items():
+            if book_id not in old:
+                results[positions[book_id]] = UnprocessedError("No procesado por DynamoDB tras varios reintentos.")
+                continue
+            book = books[positions[book_id]]
+            for request in [{'PutRequest': {'Item': item}}, *index_requests(book_id, old[book_id], book)]:
+                owners[request_key(request)] = book_id
+                pending.append(request)
 
-        if len(non_empty_fields) < 3:
-            raise ValueError("El libro debe tener al menos 3 atributos con valor.")
+        not_written = set()
+        for chunk in chunks(pending, BATCH_WRITE_LIMIT):
+            unprocessed = self._retry_unprocessed(self._batch_write, chunk)
+            for request in unprocessed:
+                key = request_key(request)
+                # Si falla una entrada del índice se informa sobre su libro; reintentar es idempotente
+                book_id = owners[key]
+                results[positions[book_id]] = UnprocessedError("No procesado por DynamoDB tras varios reintentos.")
+                if key == book_id:
+                    not_written.add(book_id)
+        if pending:
+            self._bump_catalog_version(merge(
+                stats_delta(old[book_id], books[positions[book_id]])
+                for book_id in requests if book_id in old and book_id not in not_written
+            ))
+        return results
 
-        # Guardar el item en DynamoDB
-        self.table.put_item(Item=item_dict)
-        return book
-    
-    def get_book(self, book_id: str) -> Optional[Book]:
-        response = self.table.get_item(Key={'book_id': book_id})
-        if 'Item' in response:
-            return Book(**response['Item'])
+    def _batch_write(self, requests: list) -> list:
+        response = self.dynamodb.batch_write_item(RequestItems={self.table_name: requests})
+        return response.get('UnprocessedItems', {}).get(self.table_name, [])
+
+    def get_book(self, book_id: str, fields: Fields = None) -> Optional[Record]:
+        response = self.table.get_item(Key={'book_id': book_id}, **(projection(fields) if fields else {}))
+        if 'Item' in response and is_book_item(response['Item']):
+            return to_record(response['Item'], fields)
         return None
     
+    def get_books(self, book_ids: List[str]) -> Dict[str, Optional[Book]]:
+        return self._get_records(book_ids, None)
+
+    def _get_records(self, book_ids: List[str], fields: Fields, *extra: str,
+                     consistent: bool = False) -> Dict[str, Optional[Record]]:
+        found: Dict[str, Optional[Record]] = {}
+        unique_ids = list(dict.fromkeys(book_ids))
+        request = {**(projection(fields, *extra) if fields else {}), 'ConsistentRead': consistent}
+        for chunk in chunks(unique_ids, BATCH_GET_LIMIT):
+            def batch_get(keys):
+                response = self.dynamodb.batch_get_item(RequestItems={self.table_name: {'Keys': keys, **request}})
+                for item in response.get('Responses', {}).get(self.table_name, []):
+                    if is_book_item(item):
+                        found[item['book_id']] = to_record(item, fields)
+                return response.get('UnprocessedKeys', {}).get(self.table_name, {}).get('Keys', [])
+
+            unprocessed = self._retry_unprocessed(batch_get, [{'book_id': book_id} for book_id in chunk])
+            unprocessed_ids = {key['book_id'] for key in unprocessed}
+            for book_id in chunk:
+                if book_id not in found and book_id not in unprocessed_ids:
+                    found[book_id] = None
+        return found
+
+    def _retry_unprocessed(self, send, requests: list) -> list:
+        """Envía un lote y reintenta lo no procesado con backoff exponencial y jitter.
+
+        Devuelve lo que sigue sin procesar tras agotar los reintentos.
+        """
+        for attempt in range(MAX_BATCH_RETRIES + 1):
+            requests = send(requests)
+            if not requests or attempt == MAX_BATCH_RETRIES:
+                break
+            time.sleep(random.uniform(0, min(BATCH_BACKOFF_CAP, BATCH_BACKOFF_BASE * 2 ** attempt)))
+        return requests
+
     def get_all_books(self) -> List[Book]:
-        response = self.table.scan()
-        books = [Book(**item) for item in response.get('Items', [])]
+        # Un único scan se corta en 1 MB: hay que seguir LastEvaluatedKey
+        books = list(self.iter_books())
         return sorted(books, key=lambda x: getattr(x, 'average_rating', 0))
 
+    def get_books_page(self, limit: int, cursor: Optional[str] = None,
+                       fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        # Las particiones de rating-index una tras otra: solo tienen libros, así que cada consulta
+        # devuelve lo que se le pide. Un Scan con BOOK_FILTER leía también los items auxiliares
+        # (géneros, términos...) y devolvía páginas cortas o vacías
+        partitions = catalog_partitions()
+        position, start_key = catalog_cursor_state(cursor)
+        books = []
+        while position < len(partitions) and len(books) < limit:
+            query_kwargs = {
+                'IndexName': RATING_INDEX,
+                'KeyConditionExpression': Key('catalog').eq(partitions[position]),
+                'Limit': limit - len(books),
+                **(projection(fields) if fields else {}),
+            }
+            if start_key:
+                query_kwargs['ExclusiveStartKey'] = start_key
+            response = self.table.query(**query_kwargs)
+            books.extend(to_record(item, fields) for item in response.get('Items', []))
+            start_key = response.get('LastEvaluatedKey')
+            if start_key is None:
+                position += 1
+        return books, catalog_cursor(position, start_key)
+
+    def get_books_by_rating(self, limit: int, cursor: Optional[str] = None, descending: bool = True,
+                            fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        pages = {}
+        for partition, start_key in rating_cursor_state(cursor).items():
+            query_kwargs = {
+                'IndexName': RATING_INDEX,
+                'KeyConditionExpression': Key('catalog').eq(partition),
+                'ScanIndexForward': not descending,
+                'Limit': limit,
+                **(projection(fields, 'catalog', 'average_rating') if fields else {}),
+            }
+            if start_key:
+                query_kwargs['ExclusiveStartKey'] = start_key
+            response = self.table.query(**query_kwargs)
+            pages[partition] = (start_key, response.get('Items', []), response.get('LastEvaluatedKey'))
+        items, next_cursor = merge_rating_pages(pages, limit, descending)
+        return [to_record(item, fields) for item in items], next_cursor
+
+    def get_books_by_genre(self, genre: str, limit: int, cursor: Optional[str] = None,
+                           fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        query_kwargs = {
+            'IndexName': GENRE_INDEX,
+            'KeyConditionExpression': Key('genre_key').eq(genre),
+            'Limit': limit,
+        }
+        start_key = decode_cursor(cursor)
+        if start_key:
+            query_kwargs['ExclusiveStartKey'] = start_key
+        response = self.table.query(**query_kwargs)
+        book_ids = [item['target_id'] for item in response.get('Items', [])]
+        found = self._get_records(book_ids, fields, 'genre') if book_ids else {}
+        # Las entradas del índice se escriben aparte del libro: se descartan las que
+        # apunten a libros borrados o que ya no tengan ese género
+        books = [
+            found[book_id] for book_id in book_ids
+            if found.get(book_id) is not None and genre in record_genres(found[book_id])
+        ]
+        return books, encode_cursor(response.get('LastEvaluatedKey'))
+
+    def iter_books(self, fields: Fields = None) -> Iterator[Record]:
+        # Lectura consistente: el listado completo no puede ser más antiguo que get_catalog_version()
+        scan_kwargs = {'FilterExpression': BOOK_FILTER, 'ConsistentRead': True, **(projection(fields) if fields else {})}
+        while True:
+            response = self.table.scan(**scan_kwargs)
+            for item in response.get('Items', []):
+                yield to_record(item, fields)
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                return
+            scan_kwargs['ExclusiveStartKey'] = last_key
+
+
+    def get_changes(self, since: Optional[str], limit: int, cursor: Optional[str] = None) -> Changes:
+        state = changes_state(since, cursor)
+        if state['since'] is None:
+            return starting_point(state)
+        books, deleted = [], []
+        # Se recorre changes-index día a día, desde el de since hasta hoy
+        bucket = state.get('bucket') or change_bucket(state['since'])
+        last_bucket = change_bucket(datetime.utcnow().isoformat())
+        start_key = state.get('key')
+        while True:
+            remaining = limit - len(books) - len(deleted)
+            if not remaining:
+                return Changes(books, deleted, encode_cursor({**state, 'bucket': bucket, 'key': start_key}), None)
+            query_kwargs = changes_query(bucket, state['since'], remaining)
+            if start_key:
+                query_kwargs['ExclusiveStartKey'] = start_key
+            response = self.table.query(**query_kwargs)
+            collect_changes(response.get('Items', []), books, deleted)
+            start_key = response.get('LastEvaluatedKey')
+            if start_key is None:
+                if bucket >= last_bucket:
+                    return Changes(books, deleted, None, state['next_since'])
+                bucket = next_bucket(bucket)
+
+    def search_books(self, terms: List[str], limit: int, fields: Fields = None) -> List[Record]:
+        postings = {}
+        for term in terms:
+            postings[term] = self._term_postings(term)
+            if not postings[term]:
+                return []  # AND: sin resultados, no hace falta leer el resto de términos
+        ranked = [book_id for book_id, _ in rank(postings)]
+        books = []
+        # Como en el índice por género, se descartan entradas de libros borrados o cambiados;
+        # se siguen leyendo candidatos mientras eso deje la página corta
+        for window in chunks(ranked, limit):
+            found = self._get_records(window, fields, 'title', 'description')
+            books.extend(
+                found[book_id] for book_id in window
+                if found.get(book_id) is not None and matches(terms, *record_text(found[book_id]))
+            )
+            if len(books) >= limit:
+                break
+        return books[:limit]
+
+    def _term_postings(self, term: str) -> Dict[str, int]:
+        query_kwargs = {
+            'IndexName': TERM_INDEX,
+            'KeyConditionExpression': Key('term_key').eq(term),
+            'ProjectionExpression': 'target_id, #weight',
+            'ExpressionAttributeNames': {'#weight': 'weight'},
+        }
+        postings = {}
+        while True:
+            response = self.table.query(**query_kwargs)
+            for item in response.get('Items', []):
+                postings[item['target_id']] = int(item['weight'])
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                return postings
+            query_kwargs['ExclusiveStartKey'] = last_key
     
     #def update_book(self, book_id: str, book: Book) -> Optional[Book]:
     #    book.update_timestamp()
@@ -98,47 +893,162 @@ class DynamoDBDatabase(Database):
     #    self.table.update_item(Item=book.model_dump()) #antes habia un put mirar a ver si esto lo soluciona
     #    return book
     
-    def update_book(self, book_id: str, book: Book) -> Optional[Book]:
-        # Convertir el modelo a dict y eliminar campos vacíos o no actualizables
-        updates = {
-            k: v for k, v in book.model_dump().items()
-            if v not in (None, "", [], {}) and k not in ("book_id", "created_at")
-        }
+    def update_book(self, book_id: str, book: Book, expected_version: Optional[int] = None) -> Optional[Book]:
+        updates = book_updates(book_id, book)
+        try:
+            try:
+                response = self.table.update_item(**conditional_update(book_id, updates, expected_version))
+            except ClientError as e:
+                retry = rated_retry(updates)
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException' or retry is None:
+                    raise
+                # Puede ser un libro con valoraciones: se conserva la media del roll-up
+                updates = retry
+                response = self.table.update_item(**conditional_update(book_id, updates, expected_version))
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            if expected_version is None:
+                return None
+            # Solo en el camino de error: una lectura para distinguir 404 de 409
+            conflict = version_conflict(book_id, expected_version, self.get_book(book_id))
+            if conflict is None:
+                return None
+            raise conflict
+        old_item = response.get("Attributes", {})
+        updated = updated_book(book_id, old_item, updates)
+        self._bump_catalog_version(stats_delta(old_item, updated))
+        self._sync_index_items(book_id, old_item, updated)
+        return updated
 
-        if not updates:
-            raise ValueError("No hay campos válidos para actualizar.")
+    def borrow_book(self, book_id: str) -> Optional[Book]:
+        updated_at = datetime.utcnow().isoformat()
+        for _ in range(STOCK_ATTEMPTS):
+            for stock_condition, status in BORROW_STEPS:
+                response = self._update_stock(stock_update(book_id, -1, updated_at, stock_condition, status))
+                if response is not None:
+                    return self._stock_changed(book_id, response, stock_changes(response, -1, updated_at, status))
+            # Solo en el camino de error: no existe, no quedan copias o el stock cambió entre medias
+            current = self.table.get_item(Key={'book_id': book_id}, ConsistentRead=True).get('Item')
+            if current is None or not is_book_item(current):
+                return None
+            if int(current.get('stock', 0)) < 1:
+                raise out_of_stock(book_id)
+        raise UnprocessedError("El stock cambia demasiado deprisa; reintentar el préstamo.")
 
-        # Convertir floats a Decimal para DynamoDB
-        from decimal import Decimal
-        for k, v in updates.items():
-            if isinstance(v, float):
-                updates[k] = Decimal(str(v))
+    def return_book(self, book_id: str) -> Optional[Book]:
+        updated_at = datetime.utcnow().isoformat()
+        response = self._update_stock(stock_update(book_id, 1, updated_at, status='available'))
+        if response is None:
+            return None
+        return self._stock_changed(book_id, response, stock_changes(response, 1, updated_at, 'available'))
 
-        # Generar dinámicamente la expresión de actualización
-        update_expr = "SET " + ", ".join(f"#{k} = :{k}" for k in updates.keys())
-        expr_attr_names = {f"#{k}": k for k in updates.keys()}
-        expr_attr_values = {f":{k}": v for k, v in updates.items()}
+    def add_rating(self, book_id: str, rating: Decimal) -> bool:
+        self.table.update_item(**rating_update(book_id, random_shard(), rating))
+        return True
 
+    def rollup_ratings(self, book_id: str) -> Optional[Book]:
+        total, count = rating_totals(self._rating_shards(book_id))
+        if not count:
+            return None
+        average = rolled_up_average(total, count)
+        updated_at = datetime.utcnow().isoformat()
         try:
-            response = self.table.update_item(
-                Key={"book_id": book_id},
-                UpdateExpression=update_expr,
-                ExpressionAttributeNames=expr_attr_names,
-                ExpressionAttributeValues=expr_attr_values,
-                ReturnValues="ALL_NEW"  # Devuelve el nuevo estado del item
-            )
-            updated_item = response.get("Attributes")
-            if updated_item:
-                return Book(**updated_item)
+            response = self.table.update_item(**rollup_update(book_id, average, count, updated_at))
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
             return None
+        old_item = response['Attributes']
+        updated = updated_book(book_id, old_item, {'average_rating': average, 'updated_at': updated_at})
+        self._bump_catalog_version(stats_delta(old_item, updated))
+        return updated
+
+    def _rating_shards(self, book_id: str) -> List[dict]:
+        shards = []
+        request = {'ConsistentRead': True, 'ProjectionExpression': 'rating_sum, rating_count'}
+
+        def batch_get(keys):
+            response = self.dynamodb.batch_get_item(RequestItems={self.table_name: {'Keys': keys, **request}})
+            shards.extend(response.get('Responses', {}).get(self.table_name, []))
+            return response.get('UnprocessedKeys', {}).get(self.table_name, {}).get('Keys', [])
+
+        for chunk in chunks(rating_shard_keys(book_id), BATCH_GET_LIMIT):
+            # Con un shard sin leer la media saldría mal: mejor no escribirla
+            if self._retry_unprocessed(batch_get, chunk):
+                raise UnprocessedError("No se pudieron leer todos los shards de valoraciones.")
+        return shards
+
+    def _update_stock(self, update: dict) -> Optional[dict]:
+        """El libro anterior, o None si no se cumplió la condición."""
+        try:
+            return self.table.update_item(**update).get('Attributes', {})
         except ClientError as e:
-            raise e
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return None
+
+    def _stock_changed(self, book_id: str, old_item: dict, changes: dict) -> Book:
+        # stock y status no están en los índices auxiliares: basta con la versión y las estadísticas
+        updated = updated_book(book_id, old_item, changes)
+        self._bump_catalog_version(stats_delta(old_item, updated))
+        return updated
 
 
 
+    def _sync_index_items(self, book_id: str, old: Optional[Record], new: Optional[Record]):
+        requests = index_requests(book_id, old, new)
+        for chunk in chunks(requests, BATCH_WRITE_LIMIT):
+            if self._retry_unprocessed(self._batch_write, chunk):
+                raise UnprocessedError("No se pudieron actualizar los índices por género y de búsqueda.")
+
     def delete_book(self, book_id: str) -> bool:
-        response = self.table.delete_item(
-            Key={'book_id': book_id},
-            ReturnValues='ALL_OLD'
-        )
-        return 'Attributes' in response
\ No newline at end of file
+        try:
+            # El libro se reemplaza por su tombstone: la sincronización incremental ve el borrado
+            response = self.table.put_item(**tombstone_put(book_id, datetime.utcnow()))
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+        if 'Attributes' not in response:
+            return False
+        self._bump_catalog_version(stats_delta(response['Attributes'], None))
+        self._sync_index_items(book_id, response['Attributes'], None)
+        # Si algún shard no se borra solo queda un item auxiliar suelto que nadie suma
+        for chunk in chunks(rating_shard_requests(book_id, response['Attributes']), BATCH_WRITE_LIMIT):
+            self._retry_unprocessed(self._batch_write, chunk)
+        return True
+
+    def get_catalog_version(self) -> int:
+        return int(self._catalog_totals(consistent=True)['version'])
+
+    def _catalog_totals(self, consistent: bool) -> dict:
+        items = []
+
+        def batch_get(keys):
+            response = self.meta_dynamodb.batch_get_item(
+                RequestItems={self.table_name: {'Keys': keys, 'ConsistentRead': consistent}}
+            )
+            items.extend(response.get('Responses', {}).get(self.table_name, []))
+            return response.get('UnprocessedKeys', {}).get(self.table_name, {}).get('Keys', [])
+
+        for chunk in chunks(catalog_version_keys(), BATCH_GET_LIMIT):
+            # Con un shard sin leer la versión podría repetirse: mejor fallar
+            if self._retry_unprocessed(batch_get, chunk):
+                raise UnprocessedError("No se pudo leer la versión del catálogo.")
+        return catalog_totals(items)
+
+    def get_stats(self) -> dict:
+        return stats_response(self._catalog_totals(consistent=False))
+
+    def _bump_catalog_version(self, delta: Optional[Dict] = None):
+        # Siempre después de escribir: quien lea la versión nueva y luego el catálogo ya ve el cambio.
+        # Las estadísticas viajan en el mismo update_item. El libro ya está escrito, así que un fallo
+        # aquí no se devuelve al cliente: el ETag del listado completo cambiará con la siguiente
+        # escritura y las estadísticas se corrigen con `python bulk.py rebuild-stats`
+        try:
+            self.meta_table.update_item(**catalog_version_update(delta))
+        except (BotoCoreError, ClientError) as e:
+            print(f"No se pudo actualizar la versión del catálogo: {type(e).__name__}: {e}")
+            if self.on_catalog_version_error is not None:
+                self.on_catalog_version_error(e)
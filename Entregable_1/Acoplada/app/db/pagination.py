@@ -0,0 +1,27 @@
+"""Cursores de paginación opacos, comunes a todos los backends."""
+import base64
+import json
+from decimal import Decimal
+from typing import Optional
+
+
+def encode_cursor(last_key: Optional[dict]) -> Optional[str]:
+    """Convierte la última clave leída (LastEvaluatedKey, fila de keyset...) en un cursor opaco."""
+    if not last_key:
+        return None
+    raw = json.dumps(last_key, default=lambda o: {'__decimal__': str(o)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[dict]:
+    """Inverso de encode_cursor. Lanza ValueError si el cursor no es válido."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        key = json.loads(raw, object_hook=lambda d: Decimal(d['__decimal__']) if '__decimal__' in d else d)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Cursor de paginación inválido.") from e
+    if not isinstance(key, dict):
+        raise ValueError("Cursor de paginación inválido.")
+    return key
@@ -0,0 +1,503 @@
+"""Backend PostgreSQL (DB_TYPE=postgres).
+
+Configuración por entorno: DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD,
+DB_POOL_MIN, DB_POOL_MAX y CATALOG_VERSION_SHARDS. Para probarlo en local:
+
+    docker run -d -p 5432:5432 -e POSTGRES_PASSWORD=postgres postgres:16
+    DB_TYPE=postgres DB_HOST=localhost DB_USER=postgres DB_PASSWORD=postgres gunicorn -c gunicorn.conf.py main:app
+"""
+import csv
+import io
+import os
+import random
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool
+
+from .changes import TOMBSTONE_RETENTION_DAYS, Changes, changes_state, deleted_entry, starting_point
+from .db import (
+    ConflictError, Database, Fields, Record, check_min_attributes, load_book, out_of_stock, projected_attributes,
+    update_fields, version_conflict,
+)
+from .pagination import decode_cursor, encode_cursor
+from .ratings import random_shard
+from .stats import STAT_PREFIX, stats_response
+from models.book import Book
+
+COLUMNS = (
+    'book_id', 'title', 'description', 'genre', 'status', 'stock', 'average_rating', 'created_at', 'updated_at', 'version'
+)
+# Columnas que admite una actualización parcial, en el orden de los parámetros de 'update_book'
+UPDATE_COLUMNS = ('title', 'description', 'genre', 'status', 'stock', 'average_rating', 'updated_at')
+SELECT_COLUMNS = ', '.join(COLUMNS)
+UPDATED_AT = COLUMNS.index('updated_at')
+
+# Filas que trae cada viaje del cursor de servidor al recorrer el catálogo
+STREAM_BATCH_SIZE = 500
+
+# Versión del catálogo repartida en filas, como los items meta#catalog de DynamoDB: cada escritura
+# incrementa una al azar y la versión es la suma. Con una sola fila todas las escrituras esperaban
+# su bloqueo hasta el commit de la anterior. Solo puede crecer, como RATING_SHARDS
+CATALOG_VERSION_SHARDS = int(os.getenv('CATALOG_VERSION_SHARDS', '10'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    book_id TEXT PRIMARY KEY,
+    title VARCHAR(255) NOT NULL,
+    description TEXT,
+    genre TEXT[] NOT NULL DEFAULT '{}',
+    status VARCHAR(16) NOT NULL DEFAULT 'available',
+    stock INTEGER NOT NULL CHECK (stock >= 0),
+    average_rating NUMERIC NOT NULL DEFAULT 0 CHECK (average_rating BETWEEN 0 AND 5),
+    created_at TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+ALTER TABLE books ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0;
+CREATE INDEX IF NOT EXISTS books_rating_idx ON books (average_rating, book_id);
+CREATE INDEX IF NOT EXISTS books_genre_idx ON books USING GIN (genre);
+-- Búsqueda de texto: columna generada (se mantiene sola en cada INSERT/UPDATE) con índice GIN;
+-- el título pesa más que la descripción, como en el índice de términos de DynamoDB
+ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', coalesce(description, '')), 'D')
+) STORED;
+CREATE INDEX IF NOT EXISTS books_search_idx ON books USING GIN (search_vector);
+-- Valoraciones repartidas en shards por libro (ver db/ratings.py); rating_count del libro es el total del último roll-up
+ALTER TABLE books ADD COLUMN IF NOT EXISTS rating_count BIGINT NOT NULL DEFAULT 0;
+CREATE TABLE IF NOT EXISTS book_ratings (
+    book_id TEXT NOT NULL REFERENCES books (book_id) ON DELETE CASCADE,
+    shard SMALLINT NOT NULL,
+    rating_sum NUMERIC NOT NULL DEFAULT 0,
+    rating_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (book_id, shard)
+);
+-- Sincronización incremental (ver db/changes.py): cambios por updated_at y libros borrados
+CREATE INDEX IF NOT EXISTS books_updated_idx ON books (updated_at, book_id);
+CREATE TABLE IF NOT EXISTS book_tombstones (
+    book_id TEXT PRIMARY KEY,
+    deleted_at TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS book_tombstones_deleted_idx ON book_tombstones (deleted_at, book_id);
+CREATE TABLE IF NOT EXISTS catalog_version_shards (
+    shard SMALLINT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+-- La versión de la tabla de una sola fila pasa al shard 0 para que la suma no retroceda
+DO $$
+BEGIN
+    IF to_regclass('catalog_version') IS NOT NULL THEN
+        INSERT INTO catalog_version_shards (shard, version) SELECT 0, version FROM catalog_version
+        ON CONFLICT (shard) DO NOTHING;
+    END IF;
+END $$;
+"""
+
+# Sentencias preparadas por conexión; los listados paginan por keyset (limit + 1 para saber si hay más)
+STATEMENTS = {
+    'insert_book': f"INSERT INTO books ({SELECT_COLUMNS}) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)",
+    'get_book': f"SELECT {SELECT_COLUMNS} FROM books WHERE book_id = $1",
+    'get_books': f"SELECT {SELECT_COLUMNS} FROM books WHERE book_id = ANY($1)",
+    'get_all_books': f"SELECT {SELECT_COLUMNS} FROM books ORDER BY average_rating, book_id",
+    'books_page': f"SELECT {SELECT_COLUMNS} FROM books WHERE book_id > $1 ORDER BY book_id LIMIT $2",
+    'rating_desc_first': f"SELECT {SELECT_COLUMNS} FROM books "
+                         f"ORDER BY average_rating DESC, book_id DESC LIMIT $1",
+    'rating_desc_after': f"SELECT {SELECT_COLUMNS} FROM books WHERE (average_rating, book_id) < ($1, $2) "
+                         f"ORDER BY average_rating DESC, book_id DESC LIMIT $3",
+    'rating_asc_first': f"SELECT {SELECT_COLUMNS} FROM books ORDER BY average_rating, book_id LIMIT $1",
+    'rating_asc_after': f"SELECT {SELECT_COLUMNS} FROM books WHERE (average_rating, book_id) > ($1, $2) "
+                        f"ORDER BY average_rating, book_id LIMIT $3",
+    'genre_page': f"SELECT {SELECT_COLUMNS} FROM books WHERE genre @> ARRAY[$1]::text[] AND book_id > $2 "
+                  f"ORDER BY book_id LIMIT $3",
+    # $1 son los términos ya normalizados por db/search.py, separados por espacios (AND)
+    'search_books': f"SELECT {SELECT_COLUMNS} FROM books, plainto_tsquery('simple', $1) query "
+                    f"WHERE search_vector @@ query ORDER BY ts_rank(search_vector, query) DESC, book_id LIMIT $2",
+    # Los campos vacíos llegan como NULL y conservan el valor anterior; $9 es la versión de If-Match (o NULL).
+    # Con valoraciones (rating_count > 0) la media es del roll-up y se ignora la del cliente
+    'update_book': f"UPDATE books SET title = COALESCE($2, title), description = COALESCE($3, description), "
+                   f"genre = COALESCE($4, genre), status = COALESCE($5, status), stock = COALESCE($6, stock), "
+                   f"average_rating = CASE WHEN rating_count > 0 THEN average_rating "
+                   f"ELSE COALESCE($7, average_rating) END, updated_at = COALESCE($8, updated_at), "
+                   f"version = version + 1 "
+                   f"WHERE book_id = $1 AND ($9::integer IS NULL OR version = $9) RETURNING {SELECT_COLUMNS}",
+    # Préstamo y devolución en una sola sentencia: la fila queda bloqueada y la condición
+    # se vuelve a evaluar tras esperar a otro préstamo, así que stock nunca baja de 0
+    'borrow_book': f"UPDATE books SET stock = stock - 1, "
+                   f"status = CASE WHEN stock = 1 THEN 'borrowed' ELSE status END, "
+                   f"updated_at = $2, version = version + 1 "
+                   f"WHERE book_id = $1 AND stock > 0 RETURNING {SELECT_COLUMNS}",
+    'return_book': f"UPDATE books SET stock = stock + 1, status = 'available', updated_at = $2, version = version + 1 "
+                   f"WHERE book_id = $1 RETURNING {SELECT_COLUMNS}",
+    'book_exists': "SELECT 1 FROM books WHERE book_id = $1",
+    # Cada valoración bloquea solo la fila de su shard, no la del libro
+    'add_rating': "INSERT INTO book_ratings (book_id, shard, rating_sum, rating_count) VALUES ($1, $2, $3, 1) "
+                  "ON CONFLICT (book_id, shard) DO UPDATE SET rating_sum = book_ratings.rating_sum + EXCLUDED.rating_sum, "
+                  "rating_count = book_ratings.rating_count + 1",
+    # Si la media redondeada no cambia solo se guarda rating_count: el libro (updated_at, version) queda igual
+    # y la última columna, que dice si cambió, es falsa
+    'rollup_ratings': f"UPDATE books SET average_rating = r.average, rating_count = r.count, "
+                      f"updated_at = CASE WHEN average_rating = r.average THEN updated_at ELSE $2 END, "
+                      f"version = CASE WHEN average_rating = r.average THEN version ELSE version + 1 END "
+                      f"FROM (SELECT round(sum(rating_sum) / sum(rating_count), 2) AS average, "
+                      f"sum(rating_count) AS count FROM book_ratings WHERE book_id = $1) r "
+                      f"WHERE books.book_id = $1 AND r.count > books.rating_count "
+                      f"RETURNING {SELECT_COLUMNS}, updated_at = $2",
+    # El borrado deja su tombstone en la misma sentencia
+    'delete_book': "WITH deleted AS (DELETE FROM books WHERE book_id = $1 RETURNING book_id) "
+                   "INSERT INTO book_tombstones (book_id, deleted_at) SELECT book_id, $2 FROM deleted "
+                   "ON CONFLICT (book_id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at RETURNING book_id",
+    'purge_tombstones': "DELETE FROM book_tombstones WHERE deleted_at < $1",
+    # Un book_id que se vuelve a crear deja de estar borrado
+    'clear_tombstones': "DELETE FROM book_tombstones WHERE book_id = ANY($1)",
+    # Libros y tombstones en un solo orden (updated_at, book_id), paginado por keyset desde ($1, $2)
+    'changes_page': f"SELECT * FROM (SELECT {SELECT_COLUMNS}, FALSE AS deleted FROM books "
+                    f"WHERE (updated_at, book_id) > ($1, $2) "
+                    f"UNION ALL SELECT book_id, NULL, NULL, NULL, NULL, NULL, NULL, NULL, deleted_at, NULL, TRUE "
+                    f"FROM book_tombstones WHERE (deleted_at, book_id) > ($1, $2)) changes "
+                    f"ORDER BY updated_at, book_id LIMIT $3",
+    # Se incrementa en la misma transacción que la escritura: nunca se ve antes que los datos
+    # $1 es el shard; la fila se crea en su primer incremento
+    'bump_catalog_version': "INSERT INTO catalog_version_shards (shard, version) VALUES ($1, 1) "
+                            "ON CONFLICT (shard) DO UPDATE SET version = catalog_version_shards.version + 1",
+    'get_catalog_version': "SELECT coalesce(sum(version), 0)::bigint FROM catalog_version_shards",
+    # Los mismos contadores que db/stats.py mantiene en DynamoDB, como filas (nombre, valor)
+    'get_stats': "SELECT 'books', count(*)::numeric FROM books "
+                 "UNION ALL SELECT 'stock', coalesce(sum(stock), 0) FROM books "
+                 "UNION ALL SELECT 'rating_sum', coalesce(sum(average_rating), 0) FROM books "
+                 "UNION ALL SELECT 'status:' || status, count(*) FROM books GROUP BY status "
+                 "UNION ALL SELECT 'genre:' || g, count(DISTINCT book_id) FROM books, unnest(genre) g GROUP BY g",
+}
+
+
+class PreparedConnection(psycopg2.extensions.connection):
+    """Conexión que recuerda qué sentencias tiene ya preparadas en el servidor."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+def execute(cursor, name: str, params: tuple = ()):
+    connection = cursor.connection
+    if name not in connection.prepared:
+        cursor.execute(f"PREPARE {name} AS {STATEMENTS[name]}")
+        connection.prepared.add(name)
+    if params:
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cursor.execute(f"EXECUTE {name}")
+
+
+def row_to_book(row: tuple) -> Book:
+    data = dict(zip(COLUMNS, row))
+    data['created_at'] = data['created_at'].isoformat()
+    data['updated_at'] = data['updated_at'].isoformat()
+    return load_book(data)
+
+
+def row_to_record(row: tuple, fields: Fields) -> Record:
+    # La fila ya viene entera (las sentencias preparadas son fijas): se recorta aquí y se evita validar el Book
+    if not fields:
+        return row_to_book(row)
+    data = dict(zip(COLUMNS, row))
+    record = {column: data[column] for column in projected_attributes(fields) if column in data}
+    for column in ('created_at', 'updated_at'):
+        if column in record:
+            record[column] = record[column].isoformat()
+    return record
+
+
+def book_row(book: Book) -> tuple:
+    data = book.model_dump()
+    return tuple(data[column] for column in COLUMNS)
+
+
+def copy_value(value) -> str:
+    # Formato de texto de COPY en CSV: los arrays van como literal {"a","b"}
+    if isinstance(value, list):
+        return '{' + ','.join('"' + v.replace('\\', '\\\\').replace('"', '\\"') + '"' for v in value) + '}'
+    return value
+
+
+def bump_catalog_version(cursor):
+    execute(cursor, 'bump_catalog_version', (random.randrange(CATALOG_VERSION_SHARDS),))
+
+
+class PostgresDatabase(Database):
+
+    def __init__(self):
+        self.minconn = int(os.getenv('DB_POOL_MIN', '1'))
+        self.maxconn = int(os.getenv('DB_POOL_MAX', '10'))
+        self._connect_kwargs = {
+            'host': os.getenv('DB_HOST', 'localhost'),
+            'port': int(os.getenv('DB_PORT', '5432')),
+            'dbname': os.getenv('DB_NAME', 'postgres'),
+            'user': os.getenv('DB_USER', 'postgres'),
+            'password': os.getenv('DB_PASSWORD', ''),
+            'connection_factory': PreparedConnection,
+        }
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # ThreadedConnectionPool falla si se agota: con el semáforo los hilos esperan turno
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+
+    @property
+    def pool(self) -> ThreadedConnectionPool:
+        # Se crea en el primer uso: importar la app no abre conexiones y, con preload_app,
+        # cada worker de gunicorn abre las suyas después del fork
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadedConnectionPool(self.minconn, self.maxconn, **self._connect_kwargs)
+        return self._pool
+
+    @contextmanager
+    def _connection(self):
+        with self._slots:
+            connection = self.pool.getconn()
+            try:
+                yield connection
+            except psycopg2.OperationalError:
+                # Conexión probablemente rota: se descarta en lugar de devolverla al pool
+                self.pool.putconn(connection, close=True)
+                raise
+            except BaseException:
+                if not connection.closed:
+                    connection.rollback()
+                self.pool.putconn(connection, close=bool(connection.closed))
+                raise
+            else:
+                self.pool.putconn(connection)
+
+    @contextmanager
+    def _cursor(self):
+        with self._connection() as connection:
+            with connection:  # commit al salir, rollback si hay excepción
+                with connection.cursor() as cursor:
+                    yield cursor
+
+    def initialize(self):
+        with self._cursor() as cursor:
+            cursor.execute(SCHEMA)
+
+    def create_book(self, book: Book) -> Book:
+        check_min_attributes(book.model_dump())
+        # Un book_id repetido lanza psycopg2.IntegrityError (409 en la API)
+        with self._cursor() as cursor:
+            execute(cursor, 'insert_book', book_row(book))
+            execute(cursor, 'clear_tombstones', ([book.book_id],))
+            bump_catalog_version(cursor)
+        return book
+
+    def create_books(self, books: List[Book]) -> List[Optional[Exception]]:
+        results: List[Optional[Exception]] = [None] * len(books)
+        positions = {}
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for i, book in enumerate(books):
+            try:
+                check_min_attributes(book.model_dump())
+            except ValueError as e:
+                results[i] = e
+                continue
+            if book.book_id in positions:
+                results[i] = ValueError("book_id duplicado en el lote.")
+                continue
+            positions[book.book_id] = i
+            writer.writerow([copy_value(value) for value in book_row(book)])
+
+        if not positions:
+            return results
+
+        buffer.seek(0)
+        with self._cursor() as cursor:
+            # COPY a una tabla temporal y de ahí un único INSERT: los ids repetidos no abortan el lote
+            cursor.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS books_staging (LIKE books INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+            )
+            cursor.copy_expert(f"COPY books_staging ({SELECT_COLUMNS}) FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.execute(
+                f"INSERT INTO books ({SELECT_COLUMNS}) SELECT {SELECT_COLUMNS} FROM books_staging "
+                f"ON CONFLICT (book_id) DO NOTHING RETURNING book_id"
+            )
+            inserted = {row[0] for row in cursor.fetchall()}
+            if inserted:
+                execute(cursor, 'clear_tombstones', (list(inserted),))
+                bump_catalog_version(cursor)
+
+        for book_id, i in positions.items():
+            if book_id not in inserted:
+                results[i] = ConflictError(f"Ya existe un libro con book_id {book_id}")
+        return results
+
+    def get_book(self, book_id: str, fields: Fields = None) -> Optional[Record]:
+        with self._cursor() as cursor:
+            execute(cursor, 'get_book', (book_id,))
+            row = cursor.fetchone()
+        return row_to_record(row, fields) if row else None
+
+    def get_books(self, book_ids: List[str]) -> Dict[str, Optional[Book]]:
+        unique_ids = list(dict.fromkeys(book_ids))
+        with self._cursor() as cursor:
+            execute(cursor, 'get_books', (unique_ids,))
+            rows = cursor.fetchall()
+        found: Dict[str, Optional[Book]] = dict.fromkeys(unique_ids)
+        for row in rows:
+            found[row[0]] = row_to_book(row)
+        return found
+
+    def get_all_books(self) -> List[Book]:
+        with self._cursor() as cursor:
+            execute(cursor, 'get_all_books')
+            return [row_to_book(row) for row in cursor.fetchall()]
+
+    def _page(self, name: str, params: tuple, limit: int, cursor_columns: Tuple[str, ...], fields: Fields):
+        with self._cursor() as cursor:
+            execute(cursor, name, (*params, limit + 1))
+            rows = cursor.fetchall()
+        books = [row_to_record(row, fields) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = dict(zip(COLUMNS, rows[limit - 1]))
+            next_cursor = encode_cursor({column: last[column] for column in cursor_columns})
+        return books, next_cursor
+
+    def get_books_page(self, limit: int, cursor: Optional[str] = None,
+                       fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        start = decode_cursor(cursor) or {}
+        return self._page('books_page', (start.get('book_id', ''),), limit, ('book_id',), fields)
+
+    def get_books_by_rating(self, limit: int, cursor: Optional[str] = None, descending: bool = True,
+                            fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        start = decode_cursor(cursor)
+        direction = 'desc' if descending else 'asc'
+        if start is None:
+            return self._page(f'rating_{direction}_first', (), limit, ('average_rating', 'book_id'), fields)
+        try:
+            params = (start['average_rating'], start['book_id'])
+        except KeyError as e:
+            raise ValueError("Cursor de paginación inválido.") from e
+        return self._page(f'rating_{direction}_after', params, limit, ('average_rating', 'book_id'), fields)
+
+    def get_books_by_genre(self, genre: str, limit: int, cursor: Optional[str] = None,
+                           fields: Fields = None) -> Tuple[List[Record], Optional[str]]:
+        start = decode_cursor(cursor) or {}
+        return self._page('genre_page', (genre, start.get('book_id', '')), limit, ('book_id',), fields)
+
+    def iter_books(self, fields: Fields = None) -> Iterator[Record]:
+        # Cursor con nombre: el servidor entrega las filas por tandas y la memoria no crece con la tabla.
+        # La conexión queda reservada hasta que se termina (o se descarta) el generador.
+        with self._connection() as connection:
+            with connection:
+                with connection.cursor(name='iter_books') as cursor:
+                    cursor.itersize = STREAM_BATCH_SIZE
+                    cursor.execute(f"SELECT {SELECT_COLUMNS} FROM books ORDER BY book_id")
+                    for row in cursor:
+                        yield row_to_record(row, fields)
+
+    def search_books(self, terms: List[str], limit: int, fields: Fields = None) -> List[Record]:
+        with self._cursor() as cursor:
+            execute(cursor, 'search_books', (' '.join(terms), limit))
+            return [row_to_record(row, fields) for row in cursor.fetchall()]
+
+    def get_changes(self, since: Optional[str], limit: int, cursor: Optional[str] = None) -> Changes:
+        state = changes_state(since, cursor)
+        if state['since'] is None:
+            return starting_point(state)
+        position = (state.get('updated_at', state['since']), state.get('book_id', ''))
+        with self._cursor() as cursor:
+            execute(cursor, 'changes_page', (*position, limit + 1))
+            rows = cursor.fetchall()
+        books, deleted = [], []
+        for row in rows[:limit]:
+            if row[-1]:
+                deleted.append(deleted_entry(row[0], row[UPDATED_AT].isoformat()))
+            else:
+                books.append(row_to_book(row[:-1]))
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor({**state, 'updated_at': last[UPDATED_AT].isoformat(), 'book_id': last[0]})
+            return Changes(books, deleted, next_cursor, None)
+        return Changes(books, deleted, None, state['next_since'])
+
+    def update_book(self, book_id: str, book: Book, expected_version: Optional[int] = None) -> Optional[Book]:
+        updates = update_fields(book)
+        params = (book_id, *(updates.get(column) for column in UPDATE_COLUMNS), expected_version)
+        with self._cursor() as cursor:
+            execute(cursor, 'update_book', params)
+            row = cursor.fetchone()
+            if row:
+                bump_catalog_version(cursor)
+            elif expected_version is not None:
+                execute(cursor, 'get_book', (book_id,))
+                current = cursor.fetchone()
+                conflict = version_conflict(book_id, expected_version, row_to_book(current) if current else None)
+                if conflict is not None:
+                    raise conflict
+        return row_to_book(row) if row else None
+
+    def borrow_book(self, book_id: str) -> Optional[Book]:
+        with self._cursor() as cursor:
+            execute(cursor, 'borrow_book', (book_id, datetime.utcnow().isoformat()))
+            row = cursor.fetchone()
+            if row is None:
+                execute(cursor, 'book_exists', (book_id,))
+                if cursor.fetchone() is None:
+                    return None
+                raise out_of_stock(book_id)
+            bump_catalog_version(cursor)
+        return row_to_book(row)
+
+    def return_book(self, book_id: str) -> Optional[Book]:
+        with self._cursor() as cursor:
+            execute(cursor, 'return_book', (book_id, datetime.utcnow().isoformat()))
+            row = cursor.fetchone()
+            if row:
+                bump_catalog_version(cursor)
+        return row_to_book(row) if row else None
+
+    def add_rating(self, book_id: str, rating: Decimal) -> bool:
+        try:
+            with self._cursor() as cursor:
+                execute(cursor, 'add_rating', (book_id, random_shard(), rating))
+        except psycopg2.errors.ForeignKeyViolation:
+            return False
+        return True
+
+    def rollup_ratings(self, book_id: str) -> Optional[Book]:
+        with self._cursor() as cursor:
+            execute(cursor, 'rollup_ratings', (book_id, datetime.utcnow().isoformat()))
+            row = cursor.fetchone()
+            changed = row is not None and row[-1]
+            if changed:
+                bump_catalog_version(cursor)
+        return row_to_book(row[:-1]) if changed else None
+
+    def delete_book(self, book_id: str) -> bool:
+        deleted_at = datetime.utcnow()
+        with self._cursor() as cursor:
+            execute(cursor, 'delete_book', (book_id, deleted_at.isoformat()))
+            deleted = cursor.fetchone() is not None
+            if deleted:
+                # Sin TTL en PostgreSQL: cada borrado purga los tombstones caducados (índice por deleted_at)
+                execute(cursor, 'purge_tombstones',
+                        ((deleted_at - timedelta(days=TOMBSTONE_RETENTION_DAYS)).isoformat(),))
+                bump_catalog_version(cursor)
+            return deleted
+
+    def get_catalog_version(self) -> int:
+        with self._cursor() as cursor:
+            execute(cursor, 'get_catalog_version')
+            row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def get_stats(self) -> dict:
+        with self._cursor() as cursor:
+            execute(cursor, 'get_stats')
+            return stats_response({STAT_PREFIX + name: value for name, value in cursor.fetchall()})
@@ -0,0 +1,59 @@
+"""Valoraciones de los usuarios (POST /books/<id>/ratings) con contadores repartidos en shards.
+
+Cada valoración suma a rating_sum y rating_count de uno de RATING_SHARDS items
+("rating#<book_id>#<n>", elegido al azar) con un ADD y sin leer nada: las
+valoraciones de un título muy popular se reparten entre N claves en lugar de
+caer todas en la del libro (DynamoDB admite unas 1000 escrituras/s por clave).
+
+El roll-up suma los shards y escribe la media en average_rating del libro, de
+donde la leen el índice por valoración y los listados ordenados. Guarda también
+el total de valoraciones (rating_count) y solo escribe si ha crecido: no hay
+escrituras sin valoraciones nuevas y dos roll-ups a la vez no pueden dejar la
+media más antigua encima de la nueva.
+
+RATING_SHARDS solo puede crecer: los shards por encima de un valor nuevo más
+bajo dejarían de contarse.
+"""
+import os
+import random
+from decimal import ROUND_HALF_UP, Decimal
+from typing import List
+
+RATING_SHARDS = int(os.getenv('RATING_SHARDS', '10'))
+MIN_RATING = Decimal(0)
+MAX_RATING = Decimal(5)
+# Como round(..., 2) en PostgreSQL
+AVERAGE_PRECISION = Decimal('0.01')
+
+# Los shards llevan entity, como los demás items auxiliares: no son libros ni cuentan en las estadísticas
+RATING_ENTITY = 'rating'
+
+
+def rating_shard_key(book_id: str, shard: int) -> dict:
+    return {'book_id': f"rating#{book_id}#{shard}"}
+
+
+def rating_shard_keys(book_id: str) -> List[dict]:
+    return [rating_shard_key(book_id, shard) for shard in range(RATING_SHARDS)]
+
+
+def random_shard() -> int:
+    return random.randrange(RATING_SHARDS)
+
+
+def parse_rating(data) -> Decimal:
+    """Valoración de un cuerpo {"rating": 4.5}, entre MIN_RATING y MAX_RATING. Lanza ValueError."""
+    value = data.get('rating') if isinstance(data, dict) else None
+    if isinstance(value, bool) or not isinstance(value, (int, float, Decimal)):
+        raise ValueError("El cuerpo debe ser {\"rating\": <número>}.")
+    rating = Decimal(str(value))
+    if not rating.is_finite():
+        # NaN o Infinity: compararlos lanza InvalidOperation (un 500) en lugar de rechazarlos
+        raise ValueError("rating debe ser un número finito.")
+    if not MIN_RATING <= rating <= MAX_RATING:
+        raise ValueError(f"rating debe estar entre {MIN_RATING} y {MAX_RATING}.")
+    return rating
+
+
+def rolled_up_average(total: Decimal, count: int) -> Decimal:
+    return (Decimal(total) / count).quantize(AVERAGE_PRECISION, rounding=ROUND_HALF_UP)
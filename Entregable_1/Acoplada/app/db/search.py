@@ -0,0 +1,88 @@
+"""Búsqueda de texto sobre title y description con un índice invertido.
+
+Cada libro aporta un término por palabra distinta de su título y descripción,
+con un peso (las del título cuentan TITLE_WEIGHT veces). En DynamoDB cada término
+es un item auxiliar ("term#<término>#<book_id>") indexado por term-index, así que
+buscar cuesta tantas lecturas como entradas tengan los términos buscados, no como
+libros haya en el catálogo. PostgreSQL usa su propio índice GIN de texto.
+
+La búsqueda es un AND de los términos de q, ordenado por relevancia.
+"""
+import math
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TITLE_WEIGHT = 3
+MIN_TERM_LENGTH = 2
+# Los términos son clave de un índice de DynamoDB: las "palabras" desmesuradas no se indexan
+MAX_TERM_LENGTH = 64
+# Acota los items auxiliares que escribe un libro con una descripción muy larga
+MAX_TERMS_PER_BOOK = 100
+MAX_QUERY_TERMS = 8
+
+# Palabras vacías en castellano e inglés: aparecen en casi todos los libros y no discriminan
+STOPWORDS = frozenset("""
+a al algo como con de del el ella en entre era es esta este la las lo los mas mi no o para pero por que se si
+sin sobre su sus un una uno y ya
+an and are as at be by for from has have in is it its of on or that the this to was were will with
+""".split())
+
+_WORD = re.compile(r'\w+')
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Palabras en minúsculas, sin vacías ni demasiado cortas, en orden de aparición."""
+    if not text:
+        return []
+    return [
+        word for word in _WORD.findall(text.lower())
+        if MIN_TERM_LENGTH <= len(word) <= MAX_TERM_LENGTH and word not in STOPWORDS
+    ]
+
+
+def term_weights(title: Optional[str], description: Optional[str]) -> Dict[str, int]:
+    """Peso de cada término de un libro: apariciones en la descripción más TITLE_WEIGHT por cada una en el título."""
+    weights: Dict[str, int] = {}
+    for term in tokenize(title):
+        weights[term] = weights.get(term, 0) + TITLE_WEIGHT
+    for term in tokenize(description):
+        weights[term] = weights.get(term, 0) + 1
+    if len(weights) > MAX_TERMS_PER_BOOK:
+        weights = dict(sorted(weights.items(), key=lambda kv: -kv[1])[:MAX_TERMS_PER_BOOK])
+    return weights
+
+
+def parse_query(q: Optional[str]) -> List[str]:
+    """Términos de la búsqueda. Lanza ValueError si no queda ninguno que se pueda buscar."""
+    if not q or not q.strip():
+        raise ValueError("El parámetro 'q' es obligatorio.")
+    terms = list(dict.fromkeys(tokenize(q)))
+    if not terms:
+        raise ValueError("La búsqueda no contiene términos indexables.")
+    if len(terms) > MAX_QUERY_TERMS:
+        raise ValueError(f"La búsqueda admite como mucho {MAX_QUERY_TERMS} términos.")
+    return terms
+
+
+def rank(postings: Dict[str, Dict[str, int]], limit: Optional[int] = None) -> List[Tuple[str, float]]:
+    """(book_id, puntuación) de los libros que tienen todos los términos, de más a menos relevante.
+
+    postings es, por término, {book_id: peso}. Cada peso se multiplica por un factor
+    que baja con el número de libros que tienen el término: los raros pesan más.
+    """
+    if not postings or not all(postings.values()):
+        return []
+    ordered = sorted(postings.values(), key=len)
+    candidates = set(ordered[0]).intersection(*ordered[1:])
+    scores = {book_id: 0.0 for book_id in candidates}
+    for entries in postings.values():
+        idf = 1 / (1 + math.log(len(entries)))
+        for book_id in candidates:
+            scores[book_id] += entries[book_id] * idf
+    return sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+
+
+def matches(terms: Iterable[str], title: Optional[str], description: Optional[str]) -> bool:
+    """El libro sigue conteniendo todos los términos (las entradas del índice se escriben aparte)."""
+    weights = term_weights(title, description)
+    return all(term in weights for term in terms)
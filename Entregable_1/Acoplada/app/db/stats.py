@@ -0,0 +1,94 @@
+"""Estadísticas del catálogo mantenidas por incrementos (GET /books/stats).
+
+Son contadores "stat:..." en los items meta#catalog, los mismos que guardan la
+versión del catálogo: cada escritura calcula la diferencia entre el libro anterior
+y el nuevo (stats_delta) y la suma con ADD en el update_item que ya incrementa la
+versión, así que mantenerlas no añade escrituras. Los contadores están repartidos
+en CATALOG_VERSION_SHARDS items (ver dynamodb_db.py) y leerlos es un BatchGetItem
+que los suma.
+
+La versión desacoplada aplica las mismas diferencias desde el stream de la tabla
+(stats_stream). Si los contadores se desvían (importaciones masivas, escrituras
+por fuera de la API) se recalculan con: python bulk.py rebuild-stats
+"""
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+
+STAT_PREFIX = 'stat:'
+RATING_PRECISION = Decimal('0.01')
+
+
+def _get(record, name: str):
+    return record.get(name) if isinstance(record, dict) else getattr(record, name, None)
+
+
+def _number(value) -> Decimal:
+    try:
+        return Decimal(str(value)) if value is not None else Decimal(0)
+    except ArithmeticError:
+        return Decimal(0)
+
+
+def book_counters(record) -> Dict[str, Decimal]:
+    """Lo que aporta un libro a cada contador (vacío si no hay libro)."""
+    if record is None:
+        return {}
+    counters = {
+        'books': Decimal(1),
+        'stock': _number(_get(record, 'stock')),
+        'rating_sum': _number(_get(record, 'average_rating')),
+    }
+    status = _get(record, 'status') or 'available'
+    counters[f'status:{status}'] = Decimal(1)
+    genres = _get(record, 'genre')
+    for genre in dict.fromkeys(genres if isinstance(genres, list) else []):
+        counters[f'genre:{genre}'] = Decimal(1)
+    return counters
+
+
+def stats_delta(old, new) -> Dict[str, Decimal]:
+    """Cambio en los contadores al pasar del libro old al new (None: alta o borrado). Sin ceros."""
+    delta = dict(book_counters(new))
+    for name, value in book_counters(old).items():
+        delta[name] = delta.get(name, Decimal(0)) - value
+    return {name: value for name, value in delta.items() if value}
+
+
+def merge(deltas: Iterable[Dict[str, Decimal]]) -> Dict[str, Decimal]:
+    total: Dict[str, Decimal] = {}
+    for delta in deltas:
+        for name, value in delta.items():
+            total[name] = total.get(name, Decimal(0)) + value
+    return {name: value for name, value in total.items() if value}
+
+
+def add_expression(delta: Dict[str, Decimal]) -> tuple:
+    """Cláusulas de ADD (y sus nombres y valores) que suman delta a los contadores stat:*."""
+    names = {f'#s{i}': STAT_PREFIX + name for i, name in enumerate(delta)}
+    values = {f':s{i}': value for i, value in enumerate(delta.values())}
+    clauses = [f'#s{i} :s{i}' for i in range(len(delta))]
+    return clauses, names, values
+
+
+def stats_response(item: Optional[dict]) -> dict:
+    """Cuerpo de GET /books/stats a partir de los contadores del item meta#catalog."""
+    counters = {
+        name[len(STAT_PREFIX):]: _number(value)
+        for name, value in (item or {}).items() if name.startswith(STAT_PREFIX)
+    }
+    books = int(counters.get('books', 0))
+    average = counters.get('rating_sum', Decimal(0)) / books if books else Decimal(0)
+
+    def group(prefix):
+        return {
+            name[len(prefix):]: int(value)
+            for name, value in sorted(counters.items()) if name.startswith(prefix) and value
+        }
+
+    return {
+        'books': books,
+        'stock': int(counters.get('stock', 0)),
+        'status': group('status:'),
+        'genres': group('genre:'),
+        'average_rating': str(average.quantize(RATING_PRECISION)),
+    }
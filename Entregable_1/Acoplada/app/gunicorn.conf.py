@@ -0,0 +1,55 @@
+"""Configuración de gunicorn para el contenedor: gunicorn -c gunicorn.conf.py main:app
+
+Workers con hilos (gthread): las llamadas a DynamoDB/PostgreSQL bloquean y con
+hilos un worker atiende varias a la vez; el streaming de /books también ocupa un
+hilo y no el proceso entero. Todo se ajusta por entorno:
+
+- GUNICORN_WORKERS (2: una tarea Fargate de 0.25 vCPU y 512 MB no da para más) y
+  GUNICORN_THREADS (8)
+- GUNICORN_PRELOAD (true): importa la app una vez en el máster y los workers
+  arrancan por fork en milisegundos, compartiendo la memoria de los imports
+- GUNICORN_TIMEOUT (30) y GUNICORN_KEEPALIVE (75 s con la conexión ociosa)
+
+Cada worker es un proceso con su propio estado en memoria. Con varios:
+
+- Caché de lectura (CACHE_MAXSIZE): no es segura, cada worker solo invalida lo
+  que escribe él. Está desactivada por defecto y on_starting avisa si se activa.
+- Roll-up de valoraciones (rating_rollup.py): seguro. Cada worker recalcula los
+  libros que valoró él a partir de los shards, y la escritura es condicional
+  sobre rating_count, así que dos workers no se pisan ni retroceden la media.
+- Group commit de las altas (WRITE_COALESCE_WINDOW_MS): seguro, cada worker
+  agrupa solo sus propias altas.
+- Limitador y circuit breaker de DynamoDB (resilience.py): seguros, pero por
+  worker; los techos de DDB_RATE_LIMITS se multiplican por GUNICORN_WORKERS.
+- /metrics: cada respuesta trae los contadores del worker que la atiende.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '20'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '75'))
+accesslog = os.getenv('GUNICORN_ACCESSLOG') or None
+errorlog = '-'
+
+
+def on_starting(server):
+    if workers > 1 and int(os.getenv('CACHE_MAXSIZE', '0')) > 0:
+        server.log.warning("CACHE_MAXSIZE > 0 con %d workers: cada worker cachea por su cuenta y las lecturas "
+                           "pueden tardar hasta CACHE_TTL segundos en ver lo escrito por otro", workers)
+
+
+def post_fork(server, worker):
+    # Inicialización de la BD en cada worker nada más nacer, sin esperar a su primera petición
+    from main import startup
+    startup.start()
+
+
+def worker_exit(server, worker):
+    # Las medias pendientes de recalcular están en la memoria del worker: se escriben antes de salir
+    from main import rating_rollup
+    rating_rollup.flush()
@@ -0,0 +1,154 @@
+"""ETag, GET condicional y compresión de las respuestas de lectura.
+
+- Un libro: su versión seguida del hash de (book_id, updated_at). Cambia con
+  cada PUT, y la versión inicial es la que espera If-Match en el siguiente PUT.
+- Una página: hash de los (book_id, updated_at) que contiene y de next_cursor.
+  Se calcula antes de serializar, así que un 304 no paga el volcado a JSON.
+- El catálogo completo en streaming: la versión del catálogo, que cada escritura
+  incrementa. No hace falta leer la tabla entera antes de mandar las cabeceras.
+
+Las respuestas JSON de más de COMPRESS_MIN_SIZE bytes (1024 por defecto) se
+comprimen con brotli o gzip según Accept-Encoding; brotli solo si está instalado.
+"""
+import hashlib
+import os
+import zlib
+from typing import Iterable, List, Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende de la imagen
+    brotli = None
+
+from db.db import Fields, Record
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+COMPRESS_LEVEL = {'gzip': 6, 'br': 4}
+ENCODINGS = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def _etag(*parts) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b'\0')
+    return f'"{digest.hexdigest()}"'
+
+
+def _get(record: Record, name: str):
+    return record.get(name) if isinstance(record, dict) else getattr(record, name)
+
+
+# Con fields la representación es otra: los campos pedidos entran en el ETag
+def book_etag(book: Record, fields: Fields = None) -> str:
+    digest = _etag(_get(book, 'book_id'), _get(book, 'updated_at'), *(fields or ()))
+    return f'"{int(_get(book, "version") or 0)}.{digest[1:]}'
+
+
+def page_etag(books: List[Record], next_cursor: Optional[str], fields: Fields = None) -> str:
+    return _etag(next_cursor, *(fields or ()),
+                 *(f"{_get(book, 'book_id')}:{_get(book, 'updated_at')}" for book in books))
+
+
+def catalog_etag(version: int, fields: Fields = None) -> str:
+    return _etag('catalog', version, *(fields or ()))
+
+
+def _opaque_tag(tag: str) -> str:
+    # Comparación débil (RFC 9110): se ignora W/ y el sufijo que se añade al comprimir
+    tag = tag.strip()
+    if tag.startswith('W/'):
+        tag = tag[2:]
+    for encoding in COMPRESS_LEVEL:
+        suffix = f'-{encoding}"'
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)] + '"'
+    return tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return _opaque_tag(etag) in {_opaque_tag(tag) for tag in if_none_match.split(',')}
+
+
+def if_match_version(if_match: Optional[str]) -> Optional[int]:
+    """Versión que exige If-Match: el ETag de GET /books/<id> o la versión a secas. None sin condición."""
+    if not if_match or if_match.strip() == '*':
+        return None
+    tag = if_match.split(',')[0].strip()
+    if tag.startswith('W/'):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"').split('.')[0])
+    except ValueError:
+        raise ValueError("Cabecera If-Match inválida: se espera el ETag del libro o su versión.")
+
+
+def cache_headers(etag: str) -> dict:
+    # no-cache: el cliente guarda la respuesta pero revalida siempre con If-None-Match
+    return {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+
+def _compressor(encoding: str):
+    if encoding == 'br':
+        return brotli.Compressor(quality=COMPRESS_LEVEL['br'])
+    return zlib.compressobj(COMPRESS_LEVEL['gzip'], zlib.DEFLATED, 31)  # wbits=31: formato gzip
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    compressor = _compressor(encoding)
+    if encoding == 'br':
+        return compressor.process(data) + compressor.finish()
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str):
+    compressor = _compressor(encoding)
+    if encoding == 'br':
+        for chunk in chunks:
+            out = compressor.process(chunk)
+            if out:
+                yield out
+        yield compressor.finish()
+        return
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def init_app(app):
+    """Middleware de Flask: comprime las respuestas JSON 200 grandes (o en streaming)."""
+    from flask import request
+
+    @app.after_request
+    def _compress(response):
+        if response.status_code != 200 or response.mimetype != 'application/json':
+            return response
+        response.vary.add('Accept-Encoding')
+        if request.method == 'HEAD' or 'Content-Encoding' in response.headers:
+            return response
+        encoding = request.accept_encodings.best_match(ENCODINGS)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < COMPRESS_MIN_SIZE:
+                return response
+            response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag = response.headers.get('ETag')
+        if etag and etag.endswith('"'):
+            # Otra representación, otro ETag fuerte; etag_matches acepta ambas
+            response.headers['ETag'] = f'{etag[:-1]}-{encoding}"'
+        return response
+
+    return app
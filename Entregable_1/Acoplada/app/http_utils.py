@@ -0,0 +1,167 @@
+"""Validación de parámetros y armado de respuestas compartidos por la app Flask y la ASGI."""
+from datetime import datetime
+from pydantic import ValidationError
+from db.changes import parse_since
+from db.db import ConflictError
+from db.search import parse_query
+from models.book import Book, GENRES
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_SIZE = 1000
+DEFAULT_SEARCH_RESULTS = 20
+MAX_SEARCH_RESULTS = 100
+
+# Campos que admite fields=; book_id se devuelve siempre
+BOOK_FIELDS = tuple(Book.model_fields)
+# Los pone siempre el servidor: de updated_at salen change_bucket y el orden de GET /books/changes,
+# y un alta nunca reemplaza un libro existente (book_id nuevo, versión 0), como en la Desacoplada
+SERVER_FIELDS = ('book_id', 'version', 'created_at', 'updated_at')
+
+
+def parse_limit(value):
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("El parámetro 'limit' debe ser un entero.")
+    if limit < 1:
+        raise ValueError("El parámetro 'limit' debe ser mayor que 0.")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def parse_fields(value):
+    """fields=title,stock -> ('title', 'stock'); None si no se pide una lectura parcial."""
+    if value is None:
+        return None
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    if not fields:
+        raise ValueError("El parámetro 'fields' no puede estar vacío.")
+    unknown = [field for field in fields if field not in BOOK_FIELDS]
+    if unknown:
+        raise ValueError(f"Campos no válidos en 'fields': {', '.join(unknown)}. Se admite: {', '.join(BOOK_FIELDS)}")
+    return fields
+
+
+def parse_list_query(args):
+    """Traduce la query de GET /books a (modo, parámetros). Lanza ValueError si no es válida.
+
+    Modos: 'genre', 'rating', 'page' o 'stream' (todo el catálogo). Todos aceptan fields.
+    """
+    mode, params = _list_mode(args)
+    params['fields'] = parse_fields(args.get('fields'))
+    return mode, params
+
+
+def parse_search_query(args):
+    """Parámetros de GET /books/search (terms, limit, fields). Lanza ValueError si no son válidos."""
+    limit = parse_limit(args.get('limit')) if 'limit' in args else DEFAULT_SEARCH_RESULTS
+    return {
+        'terms': parse_query(args.get('q')),
+        'limit': min(limit, MAX_SEARCH_RESULTS),
+        'fields': parse_fields(args.get('fields')),
+    }
+
+
+def parse_changes_query(args):
+    """Parámetros de GET /books/changes (since, limit, cursor). Lanza ValueError, o SinceExpiredError (410)."""
+    return {
+        'since': parse_since(args.get('since'), datetime.utcnow()),
+        'limit': parse_limit(args.get('limit')),
+        'cursor': args.get('cursor'),
+    }
+
+
+def _list_mode(args):
+    sort = args.get('sort')
+    genre = args.get('genre')
+    cursor = args.get('cursor')
+    if genre is not None:
+        if genre not in GENRES:
+            raise ValueError(f"Género no válido, se admite: {', '.join(GENRES)}")
+        if sort is not None:
+            raise ValueError('No se puede combinar genre con sort')
+        return 'genre', {'genre': genre, 'limit': parse_limit(args.get('limit')), 'cursor': cursor}
+    if sort is not None:
+        if sort != 'rating':
+            raise ValueError("Solo se admite sort=rating")
+        order = args.get('order', 'desc')
+        if order not in ('asc', 'desc'):
+            raise ValueError("order debe ser 'asc' o 'desc'")
+        return 'rating', {'limit': parse_limit(args.get('limit')), 'cursor': cursor, 'descending': order == 'desc'}
+    if 'limit' in args or cursor is not None:
+        return 'page', {'limit': parse_limit(args.get('limit')), 'cursor': cursor}
+    return 'stream', {}
+
+
+def parse_batch_ids(data):
+    ids = (data or {}).get('ids')
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, str) and i for i in ids):
+        raise ValueError("Se esperaba 'ids': lista no vacía de book_id")
+    if len(ids) > MAX_BATCH_SIZE:
+        raise ValueError(f'Como máximo {MAX_BATCH_SIZE} ids por petición')
+    return ids
+
+
+def batch_get_results(ids, found):
+    results = []
+    for book_id in ids:
+        if book_id not in found:
+            results.append({'book_id': book_id, 'status': 503, 'error': 'No procesado, reintentar'})
+        elif found[book_id] is None:
+            results.append({'book_id': book_id, 'status': 404, 'error': 'Item no encontrado'})
+        else:
+            results.append({'book_id': book_id, 'status': 200, 'book': found[book_id].model_dump()})
+    return results
+
+
+def json_object(data) -> dict:
+    """Cuerpo JSON que debe ser un objeto (null, listas o cadenas son un 400, no un 500)."""
+    if not isinstance(data, dict):
+        raise ValueError('El cuerpo debe ser un objeto JSON')
+    return data
+
+
+def new_book(data: dict) -> Book:
+    """Book de un cuerpo de creación; book_id, version y las fechas son del servidor (las del cliente se ignoran)."""
+    book = Book(**{k: v for k, v in json_object(data).items() if k not in SERVER_FIELDS})
+    book.created_at = book.updated_at
+    return book
+
+
+def parse_batch_books(data):
+    """Valida cada libro del lote. Devuelve (resultados con los inválidos ya rellenos, [(posición, Book)])."""
+    items = (data or {}).get('books')
+    if not isinstance(items, list) or not items:
+        raise ValueError("Se esperaba 'books': lista no vacía de libros")
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(f'Como máximo {MAX_BATCH_SIZE} libros por petición')
+
+    # Los libros inválidos se informan uno a uno y no bloquean al resto del lote
+    results = [None] * len(items)
+    valid = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[i] = {'status': 400, 'error': 'Cada libro debe ser un objeto JSON'}
+            continue
+        try:
+            valid.append((i, new_book(item)))
+        except ValidationError as e:
+            results[i] = {'status': 400, 'error': 'Validation error', 'details': e.errors()}
+    return results, valid
+
+
+def batch_write_results(results, valid, errors):
+    for (i, book), error in zip(valid, errors):
+        if error is None:
+            results[i] = {'book_id': book.book_id, 'status': 201, 'book': book.model_dump()}
+        else:
+            if isinstance(error, ValueError):
+                status = 400
+            elif isinstance(error, ConflictError):
+                status = 409
+            else:
+                status = 503
+            results[i] = {'book_id': book.book_id, 'status': status, 'error': str(error)}
+    return results
@@ -1,10 +1,29 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from pydantic import ValidationError
 import psycopg2
 from botocore.exceptions import ClientError
 from models.book import Book
 from db.dynamodb_db import DynamoDBDatabase
+from db.postgres_db import PostgresDatabase
+from db.cached_db import CachedDatabase
+from db.coalesced_db import CoalescingDatabase
+from db.changes import SinceExpiredError
+from db.db import ConflictError, OutOfStockError, UnprocessedError
+from db.ratings import parse_rating
+import metrics
+import http_cache
+import resilience
+import profiling
+from readiness import BackgroundInit
+from rating_rollup import RatingRollup
+from codec import dump_book, dump_changes, dump_page, dump_partial, dump_partial_page
+from http_cache import book_etag, cache_headers, catalog_etag, etag_matches, if_match_version, page_etag
+from http_utils import (
+    batch_get_results, batch_write_results, json_object, new_book, parse_batch_books, parse_batch_ids,
+    parse_changes_query, parse_fields, parse_list_query, parse_search_query,
+)
+import os
 
 
 
@@ -12,22 +31,94 @@ from db.dynamodb_db import DynamoDBDatabase
 app = Flask(__name__)
 
 CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials= True) # permite cabeceras de autenticacion de otras entidades
+metrics.init_app(app)
+http_cache.init_app(app)
+resilience.init_app(app)
+# Perfiles bajo demanda (PROFILE_SAMPLE_RATE o cabecera X-Profile-Token firmada)
+profiling.init_app(app)
+
+# Backend elegido en el despliegue con el parámetro DBType
+DB_BACKENDS = {
+    'dynamodb': DynamoDBDatabase,
+    'postgres': PostgresDatabase,
+}
+DB_TYPE = os.getenv('DB_TYPE', 'dynamodb')
 
 try:
-    db = DynamoDBDatabase() 
+    if DB_TYPE not in DB_BACKENDS:
+        raise ValueError(f"DB_TYPE no soportado: {DB_TYPE} (opciones: {', '.join(DB_BACKENDS)})")
+    db = DB_BACKENDS[DB_TYPE]()
 except ValueError as e:
     raise RuntimeError(f"Error initializing DB: {e}") from e
 
+# Latencia y capacidad consumida de cada llamada a DynamoDB, visibles en /metrics;
+# después, limitador y circuit breaker (las sobrecargas acaban en 503 con Retry-After)
+if isinstance(db, DynamoDBDatabase):
+    metrics.instrument_dynamodb(db.dynamodb.meta.client)
+    resilience.install_dynamodb(db.dynamodb.meta.client)
+    # Los items meta#catalog no pasan por el circuit breaker: su throttling no corta el resto
+    metrics.instrument_dynamodb(db.meta_dynamodb.meta.client)
+    db.on_catalog_version_error = metrics.observe_catalog_version_error
+
+# Group commit de las altas en DynamoDB: los POST /books que llegan en WRITE_COALESCE_WINDOW_MS
+# (o hasta WRITE_COALESCE_MAX_BATCH libros) salen juntos por BatchWriteItem; 0 lo desactiva
+WRITE_COALESCE_WINDOW_MS = float(os.getenv('WRITE_COALESCE_WINDOW_MS', '0'))
+WRITE_COALESCE_MAX_BATCH = int(os.getenv('WRITE_COALESCE_MAX_BATCH', '25'))
+# Espera máxima de cada alta a que se confirme su lote (después, 503)
+WRITE_COALESCE_TIMEOUT = float(os.getenv('WRITE_COALESCE_TIMEOUT', '10'))
+if WRITE_COALESCE_WINDOW_MS > 0 and isinstance(db, DynamoDBDatabase):
+    db = CoalescingDatabase(db, window=WRITE_COALESCE_WINDOW_MS / 1000, max_batch=WRITE_COALESCE_MAX_BATCH,
+                            on_flush=metrics.observe_write_batch, timeout=WRITE_COALESCE_TIMEOUT)
+
+# Caché de lectura en proceso, desactivada por defecto (CACHE_MAXSIZE=0). Cada proceso solo invalida
+# lo que escribe él: con varios workers de gunicorn o varias tareas, una lectura puede tardar hasta
+# CACHE_TTL segundos en ver lo que escribió otro proceso
+CACHE_MAXSIZE = int(os.getenv('CACHE_MAXSIZE', '0'))
+CACHE_TTL = float(os.getenv('CACHE_TTL', '30'))
+if CACHE_MAXSIZE > 0:
+    db = CachedDatabase(db, maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL)
+
+# Las valoraciones se suman en shards; la media de los libros con valoraciones nuevas
+# se recalcula cada RATING_ROLLUP_INTERVAL segundos (ver rating_rollup.py)
+RATING_ROLLUP_INTERVAL = float(os.getenv('RATING_ROLLUP_INTERVAL', '5'))
+rating_rollup = RatingRollup(RATING_ROLLUP_INTERVAL, rollup=db.rollup_ratings, on_rollup=metrics.observe_rating_rollup)
+
+# La tabla se comprueba (o se crea) en segundo plano: el proceso responde a /health desde el primer momento.
+# Las peticiones que llegan antes esperan como mucho READY_TIMEOUT segundos y si no reciben un 503.
+startup = BackgroundInit(db.initialize)
+READY_TIMEOUT = float(os.getenv('READY_TIMEOUT', '5'))
+PROBE_ENDPOINTS = {'health', 'ready', 'metrics_endpoint'}
+
+@app.before_request
+def wait_until_ready():
+    startup.start()
+    if request.endpoint in PROBE_ENDPOINTS or startup.wait(READY_TIMEOUT):
+        return None
+    return jsonify({'error': 'Servicio inicializándose, reintente', **startup.status()}), 503, {'Retry-After': '1'}
+
+def stream_json_array(first, rest, dump=dump_book):
+    # Emite el array JSON libro a libro para que la memoria no dependa del tamaño de la tabla
+    yield b'['
+    if first is not None:
+        yield dump(first)
+        for book in rest:
+            yield b',' + dump(book)
+    yield b']'
+
 
 @app.route('/books', methods=['POST'])
 def create_item():
     try:
         data = request.get_json()
-        book = Book(**data)
+        book = new_book(data)
         created = db.create_book(book)
-        return jsonify(created.model_dump()), 201
+        return Response(dump_book(created), mimetype='application/json'), 201
     except ValidationError as e:
         return jsonify({'error': 'Validation error', 'details': e.errors()}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except UnprocessedError as e:
+        return jsonify({'error': str(e)}), 503
     except psycopg2.IntegrityError as e:
         return jsonify({'error': 'Database integrity error', 'details': str(e)}), 409
     except psycopg2.OperationalError as e:
@@ -40,10 +131,17 @@ def create_item():
 @app.route('/books/<book_id>', methods=['GET'])
 def get_book(book_id):
     try:
-        book = db.get_book(book_id)
+        fields = parse_fields(request.args.get('fields'))
+        book = db.get_book(book_id, fields)
         if book:
-            return jsonify(book.model_dump()), 200
+            etag = book_etag(book, fields)
+            if etag_matches(request.headers.get('If-None-Match'), etag):
+                return Response(status=304, headers=cache_headers(etag))
+            body = dump_partial(book, fields) if fields else dump_book(book)
+            return Response(body, mimetype='application/json', headers=cache_headers(etag)), 200
         return jsonify({'error': 'Item no encontrado'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except psycopg2.OperationalError as e:
         return jsonify({'error': 'Database connection error', 'details': str(e)}), 503
     except psycopg2.Error as e:
@@ -54,8 +152,82 @@ def get_book(book_id):
 @app.route('/books', methods=['GET'])
 def get_all_books():
     try:
-        books = db.get_all_books()
-        return jsonify([t.model_dump() for t in books]), 200
+        mode, params = parse_list_query(request.args)
+        if mode == 'genre':
+            books, next_cursor = db.get_books_by_genre(**params)
+        elif mode == 'rating':
+            books, next_cursor = db.get_books_by_rating(**params)
+        elif mode == 'page':
+            books, next_cursor = db.get_books_page(**params)
+        else:
+            # Sin paginación: se devuelve todo el catálogo en streaming.
+            # La versión se lee antes que los datos: el ETag nunca es más nuevo que el contenido.
+            fields = params['fields']
+            etag = catalog_etag(db.get_catalog_version(), fields)
+            if etag_matches(request.headers.get('If-None-Match'), etag):
+                return Response(status=304, headers=cache_headers(etag))
+            # El primer libro se pide aquí para que los errores de la BD sigan llegando como 5xx.
+            books = db.iter_books(**params)
+            first = next(books, None)
+            dump = (lambda record: dump_partial(record, fields)) if fields else dump_book
+            return Response(stream_with_context(stream_json_array(first, books, dump)), mimetype='application/json',
+                            headers=cache_headers(etag)), 200
+        fields = params['fields']
+        etag = page_etag(books, next_cursor, fields)
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response(status=304, headers=cache_headers(etag))
+        body = dump_partial_page(books, next_cursor, fields) if fields else dump_page(books, next_cursor)
+        return Response(body, mimetype='application/json', headers=cache_headers(etag)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except psycopg2.OperationalError as e:
+        return jsonify({'error': 'Database connection error', 'details': str(e)}), 503
+    except psycopg2.Error as e:
+        return jsonify({'error': 'Database error', 'details': str(e)}), 500
+    except ClientError as e:
+        return jsonify({'error': 'DynamoDB error', 'details': e.response['Error']['Message']}), 500
+
+@app.route('/books/search', methods=['GET'])
+def search_books():
+    try:
+        params = parse_search_query(request.args)
+        books = db.search_books(**params)
+        fields = params['fields']
+        etag = page_etag(books, None, fields)
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response(status=304, headers=cache_headers(etag))
+        body = dump_partial_page(books, None, fields) if fields else dump_page(books, None)
+        return Response(body, mimetype='application/json', headers=cache_headers(etag)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except psycopg2.OperationalError as e:
+        return jsonify({'error': 'Database connection error', 'details': str(e)}), 503
+    except psycopg2.Error as e:
+        return jsonify({'error': 'Database error', 'details': str(e)}), 500
+    except ClientError as e:
+        return jsonify({'error': 'DynamoDB error', 'details': e.response['Error']['Message']}), 500
+
+@app.route('/books/stats', methods=['GET'])
+def get_stats():
+    try:
+        return jsonify(db.get_stats()), 200
+    except psycopg2.OperationalError as e:
+        return jsonify({'error': 'Database connection error', 'details': str(e)}), 503
+    except psycopg2.Error as e:
+        return jsonify({'error': 'Database error', 'details': str(e)}), 500
+    except ClientError as e:
+        return jsonify({'error': 'DynamoDB error', 'details': e.response['Error']['Message']}), 500
+
+@app.route('/books/changes', methods=['GET'])
+def get_changes():
+    # Sincronización incremental (ver db/changes.py): sin since solo devuelve el punto de partida
+    try:
+        changes = db.get_changes(**parse_changes_query(request.args))
+        return Response(dump_changes(changes), mimetype='application/json'), 200
+    except SinceExpiredError as e:
+        return jsonify({'error': str(e)}), 410
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except psycopg2.OperationalError as e:
         return jsonify({'error': 'Database connection error', 'details': str(e)}), 503
     except psycopg2.Error as e:
@@ -66,16 +238,23 @@ def get_all_books():
 @app.route('/books/<book_id>', methods=['PUT'])
 def update_book(book_id):
     try:
-        data = request.get_json()
+        # If-Match opcional: la actualización solo se aplica si el libro sigue en esa versión
+        expected_version = if_match_version(request.headers.get('If-Match'))
+        data = json_object(request.get_json())
         data.pop('book_id', None)
         data.pop('created_at', None)
         book = Book(**data)
-        updated = db.update_book(book_id, book)
+        updated = db.update_book(book_id, book, expected_version)
         if updated:
-            return jsonify(updated.model_dump()), 200
+            return Response(dump_book(updated), mimetype='application/json',
+                            headers=cache_headers(book_etag(updated))), 200
         return jsonify({'error': 'Item no encontrado'}), 404
     except ValidationError as e:
         return jsonify({'error': 'Validation error', 'details': e.errors()}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ConflictError as e:
+        return jsonify({'error': 'Version conflict', 'details': str(e)}), 409
     except psycopg2.IntegrityError as e:
         return jsonify({'error': 'Database integrity error', 'details': str(e)}), 409
     except psycopg2.OperationalError as e:
@@ -85,6 +264,52 @@ def update_book(book_id):
     except ClientError as e:
         return jsonify({'error': 'DynamoDB error', 'details': e.response['Error']['Message']}), 500
 
+def change_stock(change, book_id):
+    """Préstamo o devolución: una sola escritura atómica sobre stock, sin leer el libro antes."""
+    try:
+        updated = change(book_id)
+        if updated:
+            return Response(dump_book(updated), mimetype='application/json',
+                            headers=cache_headers(book_etag(updated))), 200
+        return jsonify({'error': 'Item no encontrado'}), 404
+    except OutOfStockError as e:
+        return jsonify({'error': 'Sin stock', 'details': str(e)}), 409
+    except UnprocessedError as e:
+        return jsonify({'error': str(e)}), 503
+    except psycopg2.OperationalError as e:
+        return jsonify({'error': 'Database connection error', 'details': str(e)}), 503
+    except psycopg2.Error as e:
+        return jsonify({'error': 'Database error', 'details': str(e)}), 500
+    except ClientError as e:
+        return jsonify({'error': 'DynamoDB error', 'details': e.response['Error']['Message']}), 500
+
+@app.route('/books/<book_id>/borrow', methods=['POST'])
+def borrow_book(book_id):
+    return change_stock(db.borrow_book, book_id)
+
+@app.route('/books/<book_id>/return', methods=['POST'])
+def return_book(book_id):
+    return change_stock(db.return_book, book_id)
+
+@app.route('/books/<book_id>/ratings', methods=['POST'])
+def rate_book(book_id):
+    try:
+        rating = parse_rating(request.get_json(silent=True))
+        if not db.add_rating(book_id, rating):
+            return jsonify({'error': 'Item no encontrado'}), 404
+        metrics.RATINGS_RECEIVED.inc()
+        rating_rollup.mark(book_id)
+        # Aceptada: average_rating se actualiza en el próximo roll-up
+        return jsonify({'book_id': book_id, 'rating': float(rating)}), 202
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except psycopg2.OperationalError as e:
+        return jsonify({'error': 'Database connection error', 'details': str(e)}), 503
+    except psycopg2.Error as e:
+        return jsonify({'error': 'Database error', 'details': str(e)}), 500
+    except ClientError as e:
+        return jsonify({'error': 'DynamoDB error', 'details': e.response['Error']['Message']}), 500
+
 @app.route('/books/<book_id>', methods=['DELETE'])
 def delete_book(book_id):
     try:
@@ -98,9 +323,58 @@ def delete_book(book_id):
     except ClientError as e:
         return jsonify({'error': 'DynamoDB error', 'details': e.response['Error']['Message']}), 500
 
+@app.route('/books:batchGet', methods=['POST'])
+def batch_get_books():
+    try:
+        ids = parse_batch_ids(request.get_json(silent=True))
+        results = batch_get_results(ids, db.get_books(ids))
+        return jsonify({'results': results}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except psycopg2.OperationalError as e:
+        return jsonify({'error': 'Database connection error', 'details': str(e)}), 503
+    except psycopg2.Error as e:
+        return jsonify({'error': 'Database error', 'details': str(e)}), 500
+    except ClientError as e:
+        return jsonify({'error': 'DynamoDB error', 'details': e.response['Error']['Message']}), 500
+
+@app.route('/books:batchWrite', methods=['POST'])
+def batch_write_books():
+    try:
+        results, valid = parse_batch_books(request.get_json(silent=True))
+        errors = db.create_books([book for _, book in valid]) if valid else []
+        return jsonify({'results': batch_write_results(results, valid, errors)}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except psycopg2.IntegrityError as e:
+        return jsonify({'error': 'Database integrity error', 'details': str(e)}), 409
+    except psycopg2.OperationalError as e:
+        return jsonify({'error': 'Database connection error', 'details': str(e)}), 503
+    except psycopg2.Error as e:
+        return jsonify({'error': 'Database error', 'details': str(e)}), 500
+    except ClientError as e:
+        return jsonify({'error': 'DynamoDB error', 'details': e.response['Error']['Message']}), 500
+
 @app.route('/health', methods=['GET'])
 def health():
     return jsonify({'status': 'healthy'}), 200
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    status = startup.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4'), 200
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    if isinstance(db, CachedDatabase):
+        return jsonify({'enabled': True, **db.stats()}), 200
+    return jsonify({'enabled': False}), 200
+
 if __name__ == '__main__':
+    # Servidor de desarrollo; en el contenedor se usa gunicorn (gunicorn.conf.py)
+    startup.start()
     app.run(host='0.0.0.0', port=8080)
\ No newline at end of file
@@ -0,0 +1,277 @@
+"""Métricas en proceso expuestas en formato de texto de Prometheus (GET /metrics).
+
+Se miden dos capas para poder separar el tiempo propio del de la base de datos:
+- Cada petición HTTP: latencia y códigos de estado por ruta, y cuánto de esa
+  latencia se pasó esperando a DynamoDB.
+- Cada llamada a DynamoDB: latencia (reintentos incluidos), errores y
+  ConsumedCapacity, que se pide automáticamente en las operaciones que lo admiten.
+"""
+import threading
+import time
+from contextvars import ContextVar
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Operaciones de DynamoDB que aceptan ReturnConsumedCapacity
+CAPACITY_OPERATIONS = (
+    'GetItem', 'PutItem', 'UpdateItem', 'DeleteItem', 'Query', 'Scan',
+    'BatchGetItem', 'BatchWriteItem', 'TransactGetItems', 'TransactWriteItems', 'ExecuteStatement',
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                yield f'{self.name}{_labels(self.labelnames, key)} {value}'
+
+
+class Gauge:
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} gauge'
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                yield f'{self.name}{_labels(self.labelnames, key)} {value}'
+
+
+class Histogram:
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # labels -> [conteo por cubo..., suma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, state):
+                    yield f'{self.name}_bucket{_labels(self.labelnames, key, [("le", bound)])} {count}'
+                yield f'{self.name}_bucket{_labels(self.labelnames, key, [("le", "+Inf")])} {state[-1]}'
+                yield f'{self.name}_sum{_labels(self.labelnames, key)} {state[-2]}'
+                yield f'{self.name}_count{_labels(self.labelnames, key)} {state[-1]}'
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        metric = Gauge(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(line for metric in self._metrics for line in metric.render()) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'http_requests_total', 'Peticiones HTTP atendidas', ('method', 'route', 'status'))
+HTTP_LATENCY = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Latencia de las peticiones HTTP', ('method', 'route'))
+HTTP_DYNAMODB_TIME = REGISTRY.histogram(
+    'http_request_dynamodb_seconds', 'Parte de cada petición HTTP pasada en llamadas a DynamoDB', ('method', 'route'))
+DYNAMODB_LATENCY = REGISTRY.histogram(
+    'dynamodb_operation_duration_seconds', 'Latencia de cada llamada a DynamoDB, reintentos incluidos', ('operation',))
+DYNAMODB_ERRORS = REGISTRY.counter(
+    'dynamodb_errors_total', 'Llamadas a DynamoDB que terminaron en error', ('operation', 'code'))
+DYNAMODB_CAPACITY = REGISTRY.counter(
+    'dynamodb_consumed_capacity_units_total', 'Unidades de capacidad consumidas', ('operation', 'table'))
+
+# Capa de resiliencia (resilience.py)
+DYNAMODB_RETRIES = REGISTRY.counter(
+    'dynamodb_retries_total', 'Reintentos hechos por botocore en llamadas a DynamoDB', ('operation',))
+DYNAMODB_THROTTLES = REGISTRY.counter(
+    'dynamodb_throttled_attempts_total', 'Intentos rechazados por DynamoDB por throttling', ('operation',))
+DYNAMODB_RATE_LIMITED = REGISTRY.counter(
+    'dynamodb_rate_limited_total', 'Llamadas retenidas (delayed) o rechazadas (rejected) por el limitador',
+    ('operation', 'outcome'))
+DYNAMODB_RATE_LIMIT_WAIT = REGISTRY.counter(
+    'dynamodb_rate_limit_wait_seconds_total', 'Tiempo de espera impuesto por el limitador', ('operation',))
+DYNAMODB_CIRCUIT_STATE = REGISTRY.gauge(
+    'dynamodb_circuit_state', 'Estado del circuit breaker de DynamoDB (0 cerrado, 1 semiabierto, 2 abierto)')
+DYNAMODB_CIRCUIT_TRANSITIONS = REGISTRY.counter(
+    'dynamodb_circuit_transitions_total', 'Cambios de estado del circuit breaker', ('state',))
+DYNAMODB_CIRCUIT_REJECTED = REGISTRY.counter(
+    'dynamodb_circuit_rejected_total', 'Llamadas cortadas sin llegar a DynamoDB por el circuit breaker', ('operation',))
+
+# Group commit de las altas (db/coalesced_db.py)
+WRITE_BATCH_SIZE = REGISTRY.histogram(
+    'write_coalescer_batch_size', 'Altas agrupadas en cada escritura por lotes', buckets=(1, 2, 5, 10, 15, 20, 25, 50, 100))
+WRITE_BATCH_WAIT = REGISTRY.histogram(
+    'write_coalescer_wait_seconds', 'Espera añadida a cada alta hasta que sale su lote',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+
+# Valoraciones (db/ratings.py y rating_rollup.py)
+RATINGS_RECEIVED = REGISTRY.counter('ratings_received_total', 'Valoraciones sumadas a un shard')
+RATING_ROLLUPS = REGISTRY.counter(
+    'rating_rollups_total', 'Roll-ups de valoraciones: media escrita (updated), sin cambios o con error', ('outcome',))
+
+# Versión y estadísticas del catálogo (items meta#catalog): su fallo no llega al cliente
+CATALOG_VERSION_ERRORS = REGISTRY.counter(
+    'catalog_version_errors_total', 'Escrituras de la versión del catálogo fallidas, por tipo de error', ('error',))
+
+# Tiempo de DynamoDB acumulado en la petición en curso (hilo en Flask, tarea en ASGI)
+_request_dynamodb_time: ContextVar = ContextVar('request_dynamodb_time', default=None)
+
+
+# ---------------------------------------------------------------------------
+# DYNAMODB
+# ---------------------------------------------------------------------------
+
+def _request_capacity(params, model, **kwargs):
+    if model.name in CAPACITY_OPERATIONS:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+
+def _start_call(context, **kwargs):
+    context['metrics_start'] = time.perf_counter()
+
+
+def _end_call(http_response, parsed, model, context, **kwargs):
+    start = context.get('metrics_start')
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    DYNAMODB_LATENCY.observe(elapsed, operation=model.name)
+    accumulated = _request_dynamodb_time.get()
+    if accumulated is not None:
+        accumulated[0] += elapsed
+        accumulated[1] += 1
+
+    if 'Error' in parsed:
+        DYNAMODB_ERRORS.inc(operation=model.name, code=parsed['Error'].get('Code', 'Unknown'))
+    capacity = parsed.get('ConsumedCapacity') or []
+    for entry in capacity if isinstance(capacity, list) else [capacity]:
+        DYNAMODB_CAPACITY.inc(entry.get('CapacityUnits', 0), operation=model.name, table=entry.get('TableName', ''))
+
+
+def instrument_dynamodb(client):
+    """Registra los hooks de métricas en un cliente de botocore/aiobotocore (resource.meta.client)."""
+    events = client.meta.events
+    events.register('provide-client-params.dynamodb', _request_capacity, unique_id='metrics-capacity')
+    events.register('before-call.dynamodb', _start_call, unique_id='metrics-start')
+    events.register('after-call.dynamodb', _end_call, unique_id='metrics-end')
+    return client
+
+
+def observe_write_batch(size: int, waits):
+    """on_flush de CoalescingDatabase: tamaño del lote y espera de cada alta."""
+    WRITE_BATCH_SIZE.observe(size)
+    for wait in waits:
+        WRITE_BATCH_WAIT.observe(wait)
+
+
+def observe_rating_rollup(outcome: str):
+    """on_rollup de RatingRollup."""
+    RATING_ROLLUPS.inc(outcome=outcome)
+
+
+def observe_catalog_version_error(error: Exception):
+    """on_catalog_version_error de los backends DynamoDB."""
+    CATALOG_VERSION_ERRORS.inc(error=type(error).__name__)
+
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+def start_request():
+    _request_dynamodb_time.set([0.0, 0])
+    return time.perf_counter()
+
+
+def finish_request(start: float, method: str, route: str, status: int):
+    HTTP_LATENCY.observe(time.perf_counter() - start, method=method, route=route)
+    HTTP_REQUESTS.inc(method=method, route=route, status=str(status))
+    accumulated = _request_dynamodb_time.get()
+    if accumulated is not None:
+        HTTP_DYNAMODB_TIME.observe(accumulated[0], method=method, route=route)
+        _request_dynamodb_time.set(None)
+
+
+def init_app(app):
+    """Middleware de Flask: mide cada petición por plantilla de ruta (no por URL, para acotar las series)."""
+    from flask import g, request
+
+    @app.before_request
+    def _before():
+        g.metrics_start = start_request()
+
+    @app.after_request
+    def _after(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            # En las respuestas en streaming solo se mide hasta el primer libro
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            finish_request(start, request.method, route, response.status_code)
+        return response
+
+    return app
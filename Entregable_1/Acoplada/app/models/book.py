@@ -1,22 +1,26 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional, List, Literal
+from typing import Optional, List, Literal, get_args
 from datetime import datetime
 import uuid
 from decimal import Decimal
 
+Genre = Literal[
+    "fiction", "non-fiction", "fantasy", "sci-fi", "romance",
+    "mystery", "thriller", "biography", "history", "self-help"
+]
+GENRES = get_args(Genre)
+
 class Book(BaseModel):
     book_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     title: str = Field(..., min_length=1, max_length=255)
     description: Optional[str] = None
-    genre: List[Literal[
-        "fiction", "non-fiction", "fantasy", "sci-fi", "romance",
-        "mystery", "thriller", "biography", "history", "self-help"
-    ]] = Field(default_factory=list)
+    genre: List[Genre] = Field(default_factory=list)
     status: Literal["available", "borrowed"] = "available"
     stock: int = Field(..., ge=0, description="Cantidad de copias disponibles en inventario")
     average_rating: Decimal = Field(default=Decimal("0.0"), ge=0, le=5)
     created_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
     updated_at: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
+    version: int = Field(default=0, ge=0, description="Se incrementa en cada actualización (If-Match)")
 
     class Config:
         json_schema_extra = {
@@ -39,3 +43,41 @@ class Book(BaseModel):
         if not v:
             raise ValueError("Debe incluir al menos un género.")
         return v
+
+    @classmethod
+    def from_trusted(cls, data: dict) -> "Book":
+        """Book sin validar a partir de un item o fila que ya se validó al escribirlo.
+
+        Hace lo mismo que model_construct, que en pydantic 2 es más lento que validar:
+        copia los campos del modelo (descarta los atributos internos), rellena los
+        que falten con su valor por defecto y pasa a int los enteros que DynamoDB
+        devuelve como Decimal. Si falta un campo obligatorio se valida como siempre.
+        """
+        values = {name: data[name] for name in _FIELD_NAMES if name in data}
+        if len(values) != len(_FIELD_NAMES):
+            # Items antiguos: se completan en el orden del modelo, que es el del JSON de salida
+            complete = {}
+            for name, field in cls.model_fields.items():
+                if name in values:
+                    complete[name] = values[name]
+                elif field.is_required():
+                    return cls(**data)
+                else:
+                    complete[name] = field.get_default(call_default_factory=True)
+            values = complete
+        for name in _INT_FIELDS:
+            if type(values[name]) is not int:
+                values[name] = int(values[name])
+        book = cls.__new__(cls)
+        _set = object.__setattr__
+        _set(book, '__dict__', values)
+        # Todos los campos están puestos. Un set por instancia, como en pydantic: si se modifica
+        # no cambia el de los demás libros
+        _set(book, '__pydantic_fields_set__', set(_FIELD_NAMES))
+        _set(book, '__pydantic_extra__', None)
+        _set(book, '__pydantic_private__', None)
+        return book
+
+
+_FIELD_NAMES = tuple(Book.model_fields)
+_INT_FIELDS = tuple(name for name, field in Book.model_fields.items() if field.annotation is int)
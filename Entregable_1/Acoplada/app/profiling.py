@@ -0,0 +1,318 @@
+"""Perfiles de peticiones bajo demanda, para ver en qué se va el tiempo de una ruta lenta.
+
+Se perfila (con cProfile) una de cada tantas peticiones, según PROFILE_SAMPLE_RATE
+(0 por defecto: ninguna), y las que traen la cabecera X-Profile-Token firmada con
+PROFILE_SECRET (python profiling.py [segundos] genera una). Apagado solo cuesta mirar
+esa cabecera, así que se queda siempre montado.
+
+Cada perfil reparte la duración de la petición entre la E/S de la base de datos
+(boto3/botocore o psycopg2), la validación de pydantic, las conversiones a y desde
+Decimal, la serialización JSON y el resto del código. Con PROFILE_DIR se guarda ahí
+en formato speedscope (.speedscope.json, se abre en https://www.speedscope.app) o
+pstats (.prof, para python -m pstats o snakeviz) según PROFILE_FORMAT, y el log solo
+lleva el reparto; sin PROFILE_DIR la línea de log incluye el perfil speedscope. La
+respuesta lleva X-Profile-Id para encontrarlo.
+
+cProfile solo guarda pares llamador → llamado, no pilas completas: las pilas y el
+reparto se reconstruyen repartiendo el tiempo de cada función entre quienes la
+llaman, como hacen flameprof o gprof2dot. Es exacto cuando una función se llama
+desde un solo sitio y una buena aproximación en el resto de casos.
+
+Se perfila una petición a la vez por proceso (cProfile no admite dos activos desde
+Python 3.12); las que coinciden con otra en curso no se perfilan.
+"""
+import cProfile
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Optional
+
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_SECRET = os.getenv('PROFILE_SECRET', '')
+PROFILE_DIR = os.getenv('PROFILE_DIR', '')
+PROFILE_FORMAT = os.getenv('PROFILE_FORMAT', 'speedscope')
+
+TOKEN_HEADER = 'X-Profile-Token'
+TOKEN_ENVIRON = 'HTTP_' + TOKEN_HEADER.upper().replace('-', '_')
+# Un token firmado caduca como mucho en una hora: no sirve para perfilar indefinidamente
+MAX_TOKEN_TTL = 3600
+# Las llamadas por debajo de esta fracción de la petición no se siguen expandiendo:
+# quedan como hoja, con todo su tiempo, para no perderlas en el reparto
+MIN_NODE_FRACTION = 0.001
+MAX_STACK_DEPTH = 200
+
+# Categorías de cada función según su fichero (o, en las de C, su nombre). Se miran
+# en este orden: boto3/dynamodb/types.py son las conversiones Decimal de boto3
+CATEGORIES = (
+    ('decimal', ('/boto3/dynamodb/types.py', '/_pydecimal.py'), ('decimal.Decimal',)),
+    ('db_io', ('/boto3/', '/botocore/', '/urllib3/', '/psycopg2/', '/http/client.py', '/socket.py', '/ssl.py'),
+     ('psycopg2', '_socket', '_ssl')),
+    ('validation', ('/pydantic/', '/pydantic_core/'), ('pydantic_core',)),
+    ('serialization', ('/json/', '/app/codec.py', '/flask/json/'), ('orjson', '_json')),
+)
+CATEGORY_NAMES = tuple(name for name, _, _ in CATEGORIES) + ('other',)
+
+_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# ACTIVACIÓN
+# ---------------------------------------------------------------------------
+
+def _signature(secret: str, expires: int) -> str:
+    return hmac.new(secret.encode(), str(expires).encode(), hashlib.sha256).hexdigest()
+
+
+def profile_token(secret: str, ttl: int = 300, now: Optional[float] = None) -> str:
+    """Valor de X-Profile-Token válido durante ttl segundos: '<caducidad>.<HMAC-SHA256>'."""
+    expires = int((now if now is not None else time.time()) + min(ttl, MAX_TOKEN_TTL))
+    return f'{expires}.{_signature(secret, expires)}'
+
+
+def valid_token(token: str, secret: str = None, now: Optional[float] = None) -> bool:
+    secret = PROFILE_SECRET if secret is None else secret
+    expires, _, signature = token.partition('.')
+    if not secret or not expires.isdigit():
+        return False
+    now = now if now is not None else time.time()
+    if not now <= int(expires) <= now + MAX_TOKEN_TTL:
+        return False
+    return hmac.compare_digest(signature, _signature(secret, int(expires)))
+
+
+def should_profile(token: Optional[str]) -> bool:
+    if token is not None and valid_token(token):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def begin() -> Optional[cProfile.Profile]:
+    """Empieza a perfilar si no hay otro perfil en curso; None si lo hay."""
+    if not _lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Otro perfilador (un depurador, por ejemplo) ya está activo
+        _lock.release()
+        return None
+    return profiler
+
+
+def finish(profiler: cProfile.Profile, name: str, duration: float, profile_id: str) -> Optional[dict]:
+    """Para el perfil, lo escribe (PROFILE_DIR o log) y devuelve su resumen.
+
+    Un fallo al procesarlo se escribe en el log: nunca llega a la petición perfilada.
+    """
+    try:
+        profiler.disable()
+    finally:
+        _lock.release()
+    try:
+        return _report(profiler, name, duration, profile_id)
+    except Exception as e:
+        print(f"Perfil {profile_id} descartado: {type(e).__name__}: {e}")
+        return None
+
+
+def _report(profiler: cProfile.Profile, name: str, duration: float, profile_id: str) -> dict:
+    stats = _stats(profiler)
+    samples = list(_samples(stats))
+    record = {
+        'profile_id': profile_id,
+        'name': name,
+        'duration_ms': round(duration * 1000, 3),
+        'categories_ms': _categories(samples, duration),
+    }
+    if PROFILE_DIR:
+        record['path'] = _write(profiler, samples, name, profile_id)
+    else:
+        record['speedscope'] = speedscope(samples, name)
+    print(json.dumps({'profile': record}))
+    record.pop('speedscope', None)
+    return record
+
+
+def new_profile_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+# ---------------------------------------------------------------------------
+# PILAS Y REPARTO
+# ---------------------------------------------------------------------------
+
+def _stats(profiler: cProfile.Profile) -> dict:
+    """Grafo de llamadas: graph = {función: [tiempo acumulado, {llamada: tiempo de esas llamadas}]}
+    y roots, las funciones sin llamador dentro del perfil."""
+    profiler.create_stats()
+    graph = {func: [ct, {}] for func, (_, _, _, ct, _) in profiler.stats.items()}
+    for func, (_, _, _, _, callers) in profiler.stats.items():
+        for caller, edge in callers.items():
+            if caller in graph:
+                graph[caller][1][func] = edge[3]
+    roots = [func for func, (_, _, _, _, callers) in profiler.stats.items()
+             if not any(caller in graph for caller in callers)]
+    return {'graph': graph, 'roots': roots}
+
+
+def _samples(stats: dict):
+    """(pila, milisegundos propios) reconstruidos de arriba abajo desde las raíces."""
+    graph = stats['graph']
+    total = sum(graph[root][0] for root in stats['roots'])
+    threshold = total * MIN_NODE_FRACTION
+    pending = [((root,), graph[root][0]) for root in stats['roots']]
+    while pending:
+        stack, weight = pending.pop()
+        func = stack[-1]
+        cumulative, callees = graph[func]
+        children = []
+        if len(stack) < MAX_STACK_DEPTH and cumulative > 0:
+            # Las llamadas recursivas ya están contadas en el tiempo de la función
+            children = [(callee, edge) for callee, edge in callees.items() if callee not in stack]
+            scale = weight / cumulative
+            spent = sum(edge for _, edge in children) * scale
+            if spent > weight:
+                scale *= weight / spent
+            children = [(callee, edge * scale) for callee, edge in children]
+        own = weight - sum(share for _, share in children)
+        if own > 0:
+            yield stack, own * 1000
+        for callee, share in children:
+            if share >= threshold:
+                pending.append((stack + (callee,), share))
+            elif share > 0:
+                yield stack + (callee,), share * 1000
+
+
+def classify(func) -> Optional[str]:
+    filename, _, name = func
+    path = filename.replace('\\', '/')
+    for category, paths, names in CATEGORIES:
+        if filename == '~':
+            if any(fragment in name for fragment in names):
+                return category
+        elif any(fragment in path for fragment in paths):
+            return category
+    return None
+
+
+def _categories(samples, duration: float) -> dict:
+    """Milisegundos por categoría: cuenta la función categorizada más externa de la pila,
+    salvo las conversiones Decimal, que cuentan aparte aunque estén dentro de otra."""
+    totals = dict.fromkeys(CATEGORY_NAMES, 0.0)
+    known = {}
+    for stack, weight in samples:
+        category = None
+        for func in stack:
+            found = known[func] if func in known else known.setdefault(func, classify(func))
+            if found == 'decimal' or (found and category is None):
+                category = found
+        totals[category or 'other'] += weight
+    # Lo que cProfile no ve (el servidor antes y después de la aplicación) va a other
+    totals['other'] += max(duration * 1000 - sum(totals.values()), 0)
+    return {name: round(value, 3) for name, value in totals.items()}
+
+
+# ---------------------------------------------------------------------------
+# SALIDA
+# ---------------------------------------------------------------------------
+
+def _frame_name(func) -> dict:
+    filename, line, name = func
+    if filename == '~':
+        return {'name': name}
+    return {'name': name, 'file': filename, 'line': line}
+
+
+def speedscope(samples, name: str) -> dict:
+    """Perfil en el formato de speedscope (https://www.speedscope.app/file-format-schema.json)."""
+    frames, index = [], {}
+    stacks, weights = [], []
+    for stack, weight in samples:
+        for func in stack:
+            if func not in index:
+                index[func] = len(frames)
+                frames.append(_frame_name(func))
+        stacks.append([index[func] for func in stack])
+        weights.append(round(weight, 4))
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': round(sum(weights), 4),
+            'samples': stacks,
+            'weights': weights,
+        }],
+        'name': name,
+        'exporter': 'books-api profiling',
+    }
+
+
+def _write(profiler: cProfile.Profile, samples, name: str, profile_id: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    if PROFILE_FORMAT == 'pstats':
+        path = os.path.join(PROFILE_DIR, f'{profile_id}.prof')
+        profiler.dump_stats(path)
+    else:
+        path = os.path.join(PROFILE_DIR, f'{profile_id}.speedscope.json')
+        with open(path, 'w') as f:
+            json.dump(speedscope(samples, name), f)
+    return path
+
+
+# ---------------------------------------------------------------------------
+# FLASK
+# ---------------------------------------------------------------------------
+
+def init_app(app):
+    """Middleware WSGI: perfila la petición entera, respuestas en streaming incluidas."""
+    wsgi_app = app.wsgi_app
+
+    def profiled_app(environ, start_response):
+        if not should_profile(environ.get(TOKEN_ENVIRON)):
+            return wsgi_app(environ, start_response)
+        return _profiled_response(wsgi_app, environ, start_response)
+
+    app.wsgi_app = profiled_app
+    return app
+
+
+def _profiled_response(wsgi_app, environ, start_response):
+    # El perfil empieza al pedir el primer trozo de la respuesta: si el servidor
+    # descarta el iterable sin recorrerlo, no queda ningún perfil a medias
+    profiler = begin()
+    started = time.perf_counter()
+    profile_id = new_profile_id()
+
+    def start_profiled(status, headers, exc_info=None):
+        return start_response(status, [*headers, ('X-Profile-Id', profile_id)], exc_info)
+
+    body = None
+    try:
+        body = wsgi_app(environ, start_profiled if profiler is not None else start_response)
+        yield from body
+    finally:
+        try:
+            if hasattr(body, 'close'):
+                body.close()
+        finally:
+            if profiler is not None:
+                name = f"{environ.get('REQUEST_METHOD')} {environ.get('PATH_INFO')}"
+                finish(profiler, name, time.perf_counter() - started, profile_id)
+
+
+if __name__ == '__main__':
+    if not PROFILE_SECRET:
+        sys.exit('Defina PROFILE_SECRET, el mismo que usa el servidor')
+    print(profile_token(PROFILE_SECRET, int(sys.argv[1]) if len(sys.argv) > 1 else 300))
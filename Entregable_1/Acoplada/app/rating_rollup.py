@@ -0,0 +1,75 @@
+"""Roll-up periódico de las valoraciones (ver db/ratings.py).
+
+POST /books/<id>/ratings solo suma en un shard y deja el libro pendiente; cada
+RATING_ROLLUP_INTERVAL segundos se recalcula la media de los pendientes y se
+escribe en el libro. Con miles de valoraciones por minuto a un mismo título el
+libro se escribe una vez por intervalo y no una por valoración.
+
+Cada proceso lleva sus propios pendientes. Si dos procesos recalculan el mismo
+libro, el roll-up solo escribe cuando hay más valoraciones que en el anterior.
+Un roll-up que falla se reintenta en el intervalo siguiente. Los pendientes
+viven en memoria: al parar el proceso se recalculan antes de salir (el hook
+worker_exit de gunicorn.conf.py y el after_serving de asgi.py).
+"""
+import threading
+import time
+import traceback
+from typing import Callable, List, Optional
+
+
+class RatingRollup:
+    """Libros con valoraciones nuevas y, en la app Flask, el hilo que los recalcula."""
+
+    def __init__(self, interval: float, rollup: Optional[Callable[[str], object]] = None,
+                 on_rollup: Optional[Callable[[str], None]] = None):
+        self.interval = interval
+        self.rollup = rollup
+        self.on_rollup = on_rollup
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def mark(self, book_id: str):
+        with self._lock:
+            self._pending.add(book_id)
+        if self.rollup is not None:
+            self._ensure_thread()
+
+    def take(self) -> List[str]:
+        """Los pendientes, que dejan de estarlo. Quien los recalcule vuelve a marcar los que fallen."""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        return list(pending)
+
+    def report(self, outcome: str):
+        if self.on_rollup is not None:
+            self.on_rollup(outcome)
+
+    def _ensure_thread(self):
+        # Se arranca con la primera valoración, ya dentro del worker (gunicorn hace fork antes)
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='rating-rollup', daemon=True)
+                    self._thread.start()
+
+    def run_once(self):
+        for book_id in self.take():
+            try:
+                updated = self.rollup(book_id)
+            except Exception:
+                traceback.print_exc()
+                self.mark(book_id)
+                self.report('error')
+                continue
+            self.report('updated' if updated is not None else 'unchanged')
+
+    def flush(self):
+        """Recalcula los pendientes al parar el proceso: no se pierden con él."""
+        if self.rollup is not None:
+            self.run_once()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.run_once()
@@ -0,0 +1,81 @@
+"""Comprueba que la lectura de confianza (Book.from_trusted) da lo mismo que validar.
+
+    python read_check.py
+
+Se ejecuta al construir la imagen (ver Dockerfile), con la versión de pydantic
+que se despliega: from_trusted escribe a mano los atributos internos del modelo
+(__dict__, __pydantic_fields_set__...) y un cambio de pydantic podría romperlo
+sin que falle nada más. Para cada item de ejemplo, load_book con
+STRICT_READS=true y con STRICT_READS=false tiene que dar el mismo model_dump,
+el mismo JSON y el mismo resultado tras asignar un campo; from_trusted marca
+todos los campos como puestos, cada libro con su propio set. Sale con 1 si
+falla alguna comprobación.
+"""
+import sys
+from datetime import datetime
+from decimal import Decimal
+
+import db.db as db_module
+from db.db import load_book
+
+ITEMS = {
+    # Como lo devuelve boto3: números como Decimal y atributos de índice que no son del modelo
+    'dynamodb': {
+        'book_id': '00000001-check', 'title': 'Uno', 'description': 'Descripción', 'genre': ['fantasy', 'sci-fi'],
+        'status': 'available', 'stock': Decimal(3), 'average_rating': Decimal('4.5'),
+        'created_at': '2024-01-01T00:00:00', 'updated_at': '2024-01-02T00:00:00', 'version': Decimal(2),
+        'catalog': 'books', 'changes_bucket': '2024-01-02',
+    },
+    # Como lo deja row_to_book: fechas ya en ISO y enteros de PostgreSQL
+    'postgres': {
+        'book_id': '00000002-check', 'title': 'Dos', 'description': None, 'genre': ['history'],
+        'status': 'borrowed', 'stock': 0, 'average_rating': Decimal('0.00'),
+        'created_at': datetime(2024, 1, 1).isoformat(), 'updated_at': datetime(2024, 1, 3, 12, 30).isoformat(),
+        'version': 7,
+    },
+    # Item antiguo, sin los campos opcionales: se completan con sus valores por defecto
+    'antiguo': {
+        'book_id': '00000003-check', 'title': 'Tres', 'stock': Decimal(1),
+        'created_at': '2023-06-01T00:00:00', 'updated_at': '2023-06-01T00:00:00',
+    },
+}
+
+
+def load(item: dict, strict: bool):
+    db_module.STRICT_READS = strict
+    return load_book(dict(item))
+
+
+def check(name: str, item: dict) -> list:
+    errors = []
+    strict, trusted = load(item, True), load(item, False)
+    if trusted.model_dump() != strict.model_dump():
+        errors.append(f"{name}: model_dump {trusted.model_dump()} frente a {strict.model_dump()}")
+    if trusted.model_dump_json() != strict.model_dump_json():
+        errors.append(f"{name}: model_dump_json {trusted.model_dump_json()} frente a {strict.model_dump_json()}")
+    if trusted.model_fields_set != set(type(strict).model_fields):
+        errors.append(f"{name}: model_fields_set {sorted(trusted.model_fields_set)}")
+    if trusted != load(item, False):
+        errors.append(f"{name}: dos lecturas del mismo item no son iguales")
+
+    # Cada libro tiene sus atributos internos: modificar uno no toca otro leído igual
+    other = load(item, False)
+    trusted.model_fields_set.discard('title')
+    if other.model_fields_set != set(type(strict).model_fields):
+        errors.append(f"{name}: los libros comparten model_fields_set")
+    trusted.title = strict.title = 'Cambiado'
+    if trusted.model_dump() != strict.model_dump() or other.title == 'Cambiado':
+        errors.append(f"{name}: asignar un campo da {trusted.model_dump()} frente a {strict.model_dump()}")
+    return errors
+
+
+def main():
+    errors = [error for name, item in ITEMS.items() for error in check(name, item)]
+    for error in errors:
+        print(error)
+    print(f"read_check: {len(ITEMS)} items, {len(errors)} errores")
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
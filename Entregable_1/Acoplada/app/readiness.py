@@ -0,0 +1,79 @@
+"""Inicialización de la base de datos en segundo plano.
+
+El proceso empieza a servir en cuanto se importa la app: la comprobación o
+creación de la tabla (o del esquema en PostgreSQL) corre en un hilo aparte y se
+reintenta con backoff si falla. De ahí salen dos sondas distintas:
+
+- /health (liveness): el proceso responde; nunca toca la base de datos.
+- /ready (readiness): 200 solo cuando la inicialización ha terminado.
+
+El hilo se arranca por proceso: con gunicorn y preload_app la app se importa en
+el máster, pero cada worker lo lanza tras el fork (en post_fork o, si no, en su
+primera petición).
+"""
+import os
+import threading
+import time
+import traceback
+
+
+class BackgroundInit:
+
+    def __init__(self, initialize, retry_delay: float = 1.0, max_delay: float = 30.0):
+        self.initialize = initialize
+        self.retry_delay = retry_delay
+        self.max_delay = max_delay
+        self.attempts = 0
+        self.error = None
+        self.started_at = None
+        self.ready_at = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def start(self):
+        """Lanza el hilo si este proceso aún no lo tiene; es barato llamarlo en cada petición."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            # Tras un fork el estado copiado del padre no vale: cada proceso se inicializa
+            self._ready = threading.Event()
+            self.started_at = time.monotonic()
+            threading.Thread(target=self._run, name='db-init', daemon=True).start()
+
+    def _run(self):
+        delay = self.retry_delay
+        while True:
+            self.attempts += 1
+            try:
+                self.initialize()
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+                print(f"Inicialización de la BD fallida (intento {self.attempts}), reintento en {delay:.0f}s")
+                traceback.print_exc()
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_delay)
+                continue
+            self.error = None
+            self.ready_at = time.monotonic()
+            self._ready.set()
+            print(f"BD inicializada en {self.ready_at - self.started_at:.2f}s")
+            return
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        return self._ready.wait(timeout)
+
+    def status(self) -> dict:
+        return {
+            'ready': self.ready,
+            'attempts': self.attempts,
+            'error': self.error,
+            'startup_seconds': round(self.ready_at - self.started_at, 3) if self.ready_at else None,
+        }
@@ -0,0 +1,345 @@
+"""Protección frente a la limitación (throttling) de DynamoDB bajo picos de carga.
+
+Tres capas, instaladas como hooks del cliente de botocore/aiobotocore igual que
+las métricas (metrics.instrument_dynamodb):
+
+- Reintentos: los hace botocore en modo "standard" (DDB_RETRY_MODE), con
+  backoff exponencial con jitter y una cuota de reintentos que se agota si
+  fallan muchos seguidos. Como mucho DDB_MAX_ATTEMPTS reintentos por llamada:
+  el modo antiguo llegaba a 9 y multiplicaba la sobrecarga.
+- Limitador por operación (AdaptiveLimiter): un token bucket que no limita
+  nada hasta que DynamoDB devuelve un throttle; entonces baja el ritmo de esa
+  operación a la mitad de lo que se estaba enviando y lo recupera poco a poco
+  con cada éxito. DDB_RATE_LIMITS fija además techos fijos ("Scan=20,*=500").
+  Una llamada espera su turno como mucho DDB_LIMIT_MAX_WAIT segundos.
+- Circuit breaker (CircuitBreaker): tras DDB_BREAKER_THRESHOLD fallos seguidos
+  (throttles o errores 5xx ya sin reintentos, o errores de conexión) corta
+  todas las llamadas durante DDB_BREAKER_RESET segundos y luego deja pasar una
+  de prueba. Mientras está abierto se falla al momento, sin tocar DynamoDB.
+
+Lo que no se puede atender acaba en OverloadedError, que init_app convierte en
+un 503 con Retry-After. Los contadores están en /metrics (dynamodb_retries_total,
+dynamodb_throttled_attempts_total, dynamodb_rate_limited_total,
+dynamodb_circuit_state...).
+"""
+import asyncio
+import inspect
+import math
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import metrics
+
+# Errores de DynamoDB que indican sobrecarga (del lado de la tabla o de la cuenta)
+THROTTLE_CODES = frozenset({
+    'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded',
+})
+
+CIRCUIT_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+
+class OverloadedError(Exception):
+    """No se ha llamado (o no se ha podido completar) la llamada a DynamoDB por sobrecarga."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class CircuitOpenError(OverloadedError):
+    pass
+
+
+class RateLimitedError(OverloadedError):
+    pass
+
+
+class ThrottledError(OverloadedError):
+    pass
+
+
+def parse_rate_limits(value: Optional[str]) -> Dict[str, float]:
+    """"Scan=20,Query=200,*=500" -> {'Scan': 20.0, 'Query': 200.0, '*': 500.0} (llamadas por segundo)."""
+    limits = {}
+    for entry in (value or '').split(','):
+        if not entry.strip():
+            continue
+        operation, _, rate = entry.partition('=')
+        try:
+            limits[operation.strip()] = float(rate)
+        except ValueError:
+            raise ValueError(f"Límite inválido en DDB_RATE_LIMITS: {entry!r}") from None
+    return limits
+
+
+class AdaptiveLimiter:
+    """Token bucket de una operación cuyo ritmo baja con cada throttle y se recupera con los éxitos."""
+
+    MIN_RATE = 1.0
+    DECREASE = 0.5
+    # Entre dos bajadas: los throttles de las llamadas que ya estaban en vuelo no cuentan dos veces
+    DECREASE_COOLDOWN = 1.0
+    # Crecimiento del ritmo por segundo mientras no hay throttles
+    RECOVERY = 0.1
+    # Tokens que se pueden acumular, en segundos de ritmo
+    BURST = 1.0
+
+    def __init__(self, ceiling: Optional[float] = None):
+        self.ceiling = ceiling
+        self.rate = ceiling
+        self.tokens = self._capacity()
+        self._updated = None
+        self._recover_to = None
+        self._last_decrease = None
+        self._last_increase = None
+        self._window_start = None
+        self._window_count = 0
+        self.measured = None
+        self._lock = threading.Lock()
+
+    def _capacity(self) -> float:
+        return max(1.0, self.rate * self.BURST) if self.rate else 0.0
+
+    def _refill(self, now: float):
+        if self._updated is not None:
+            self.tokens = min(self._capacity(), self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _count(self, now: float):
+        # Ritmo real de la última ventana de un segundo: de ahí parte la primera bajada
+        if self._window_start is None:
+            self._window_start = now
+        elif now - self._window_start >= 1.0:
+            self.measured = self._window_count / (now - self._window_start)
+            self._window_start, self._window_count = now, 0
+        self._window_count += 1
+
+    def reserve(self, now: float, max_wait: float) -> float:
+        """Segundos que debe esperar la llamada antes de salir. Lanza RateLimitedError si son más de max_wait."""
+        with self._lock:
+            self._count(now)
+            if self.rate is None:
+                return 0.0
+            self._refill(now)
+            wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+            if wait > max_wait:
+                raise RateLimitedError("Límite de ritmo de DynamoDB alcanzado", wait)
+            # Los tokens negativos son las llamadas que ya esperan turno
+            self.tokens -= 1
+            return wait
+
+    def on_throttle(self, now: float):
+        with self._lock:
+            if self._last_decrease is not None and now - self._last_decrease < self.DECREASE_COOLDOWN:
+                return
+            base = self.rate or self.measured or self.MIN_RATE
+            if self.rate is None or self._recover_to is None:
+                self._recover_to = self.ceiling or base
+            self.rate = max(self.MIN_RATE, base * self.DECREASE)
+            self.tokens = min(self.tokens, 0.0)
+            self._updated = now
+            self._last_decrease = self._last_increase = now
+
+    def on_success(self, now: float):
+        with self._lock:
+            if self._recover_to is None:
+                return
+            self._refill(now)
+            self.rate *= (1 + self.RECOVERY) ** (now - self._last_increase)
+            self._last_increase = now
+            if self.rate >= self._recover_to:
+                # Recuperado: vuelve al techo configurado (o a no limitar)
+                self.rate, self._recover_to = self.ceiling, None
+                self.tokens = min(self.tokens, self._capacity())
+
+
+class CircuitBreaker:
+    """closed -> open tras `threshold` fallos seguidos; open -> half_open pasados `reset_timeout` segundos."""
+
+    def __init__(self, threshold: int, reset_timeout: float, on_change=None):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.on_change = on_change
+        self.state = 'closed'
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_at = None
+        self._lock = threading.Lock()
+
+    def _set(self, state: str):
+        if state != self.state:
+            self.state = state
+            if self.on_change is not None:
+                self.on_change(state)
+
+    def before(self, now: float) -> bool:
+        """Deja pasar la llamada (True si es la de prueba) o lanza CircuitOpenError."""
+        with self._lock:
+            if self.state == 'closed':
+                return False
+            if self.state == 'open':
+                remaining = self.reset_timeout - (now - self._opened_at)
+                if remaining > 0:
+                    raise CircuitOpenError("DynamoDB no disponible temporalmente", remaining)
+                self._set('half_open')
+            elif self._probe_at is not None and now - self._probe_at < self.reset_timeout:
+                # Ya hay una llamada de prueba en vuelo
+                raise CircuitOpenError("DynamoDB no disponible temporalmente", self.reset_timeout - (now - self._probe_at))
+            self._probe_at = now
+            return True
+
+    def cancel_probe(self):
+        with self._lock:
+            self._probe_at = None
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self._probe_at = None
+            self._set('closed')
+
+    def failure(self, now: float):
+        with self._lock:
+            self.failures += 1
+            self._probe_at = None
+            if self.state == 'half_open' or self.failures >= self.threshold:
+                self._opened_at = now
+                self._set('open')
+
+
+class Resilience:
+    """Limitadores por operación y un circuit breaker compartidos por los clientes en los que se instala."""
+
+    def __init__(self, limits: Optional[Dict[str, float]] = None, max_wait: float = 0.5,
+                 threshold: int = 5, reset_timeout: float = 10.0, clock=time.monotonic):
+        self.limits = limits or {}
+        self.max_wait = max_wait
+        self.clock = clock
+        self.breaker = CircuitBreaker(threshold, reset_timeout, on_change=self._circuit_changed)
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+        self._limiters_lock = threading.Lock()
+        metrics.DYNAMODB_CIRCUIT_STATE.set(CIRCUIT_STATES['closed'])
+
+    @classmethod
+    def from_env(cls) -> 'Resilience':
+        return cls(
+            limits=parse_rate_limits(os.getenv('DDB_RATE_LIMITS')),
+            max_wait=float(os.getenv('DDB_LIMIT_MAX_WAIT', '0.5')),
+            threshold=int(os.getenv('DDB_BREAKER_THRESHOLD', '5')),
+            reset_timeout=float(os.getenv('DDB_BREAKER_RESET', '10')),
+        )
+
+    def limiter(self, operation: str) -> AdaptiveLimiter:
+        limiter = self._limiters.get(operation)
+        if limiter is None:
+            with self._limiters_lock:
+                limiter = self._limiters.setdefault(
+                    operation, AdaptiveLimiter(self.limits.get(operation, self.limits.get('*'))))
+        return limiter
+
+    @staticmethod
+    def _circuit_changed(state: str):
+        metrics.DYNAMODB_CIRCUIT_STATE.set(CIRCUIT_STATES[state])
+        metrics.DYNAMODB_CIRCUIT_TRANSITIONS.inc(state=state)
+
+    # -- hooks ---------------------------------------------------------------
+
+    def _admit(self, operation: str, context: dict) -> float:
+        now = self.clock()
+        try:
+            context['resilience_probe'] = self.breaker.before(now)
+        except CircuitOpenError:
+            metrics.DYNAMODB_CIRCUIT_REJECTED.inc(operation=operation)
+            raise
+        try:
+            wait = self.limiter(operation).reserve(now, self.max_wait)
+        except RateLimitedError:
+            if context.pop('resilience_probe'):
+                self.breaker.cancel_probe()
+            metrics.DYNAMODB_RATE_LIMITED.inc(operation=operation, outcome='rejected')
+            raise
+        if wait > 0:
+            metrics.DYNAMODB_RATE_LIMITED.inc(operation=operation, outcome='delayed')
+            metrics.DYNAMODB_RATE_LIMIT_WAIT.inc(wait, operation=operation)
+        context['resilience_operation'] = operation
+        return wait
+
+    def _before_call(self, model, context, **kwargs):
+        wait = self._admit(model.name, context)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def _before_call_async(self, model, context, **kwargs):
+        wait = self._admit(model.name, context)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def _needs_retry(self, response, operation, **kwargs):
+        # Se ve cada intento, también los que botocore reintenta con éxito; no decide nada (devuelve None)
+        if response is not None and response[1].get('Error', {}).get('Code') in THROTTLE_CODES:
+            metrics.DYNAMODB_THROTTLES.inc(operation=operation.name)
+            self.limiter(operation.name).on_throttle(self.clock())
+
+    def _after_call(self, http_response, parsed, model, context, **kwargs):
+        if 'resilience_operation' not in context:
+            return
+        retries = parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+        if retries:
+            metrics.DYNAMODB_RETRIES.inc(retries, operation=model.name)
+        code = parsed.get('Error', {}).get('Code')
+        now = self.clock()
+        if code in THROTTLE_CODES or http_response.status_code >= 500:
+            self.breaker.failure(now)
+        else:
+            self.breaker.success()
+            self.limiter(model.name).on_success(now)
+        if code in THROTTLE_CODES:
+            raise ThrottledError("DynamoDB está limitando las peticiones", self.breaker.reset_timeout
+                                 if self.breaker.state == 'open' else 1.0)
+
+    def _after_call_error(self, exception, context, **kwargs):
+        # Errores de conexión o timeouts ya sin reintentos
+        if 'resilience_operation' in context:
+            self.breaker.failure(self.clock())
+
+    def install(self, client):
+        """Registra los hooks en un cliente de botocore o aiobotocore (resource.meta.client).
+
+        Va después de metrics.instrument_dynamodb: así las métricas ven la respuesta
+        antes de que un throttle se convierta en ThrottledError.
+        """
+        events = client.meta.events
+        asynchronous = inspect.iscoroutinefunction(client._make_api_call)
+        events.register('before-call.dynamodb',
+                        self._before_call_async if asynchronous else self._before_call, unique_id='resilience-before')
+        events.register('needs-retry.dynamodb', self._needs_retry, unique_id='resilience-retry')
+        events.register('after-call.dynamodb', self._after_call, unique_id='resilience-after')
+        events.register('after-call-error.dynamodb', self._after_call_error, unique_id='resilience-error')
+        return client
+
+
+DYNAMODB = Resilience.from_env()
+
+
+def install_dynamodb(client):
+    return DYNAMODB.install(client)
+
+
+def overloaded_body(e: OverloadedError) -> dict:
+    return {'error': 'Servicio sobrecargado, reintente', 'details': str(e)}
+
+
+def init_app(app):
+    """Flask: las OverloadedError que no captura ninguna ruta se responden con 503 y Retry-After."""
+    from flask import jsonify
+
+    @app.errorhandler(OverloadedError)
+    def _overloaded(e):
+        return jsonify(overloaded_body(e)), 503, {'Retry-After': e.retry_after_header()}
+
+    return app
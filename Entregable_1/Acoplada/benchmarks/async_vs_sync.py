@@ -0,0 +1,130 @@
+"""Compara la app Flask (main.py) con la variante ASGI (asgi.py) bajo carga concurrente.
+
+    python benchmarks/async_vs_sync.py --endpoint-url http://localhost:8000 [--concurrency 1 16 64 256]
+
+Levanta ambos servidores contra el mismo DynamoDB (DynamoDB Local o moto_server
+en --endpoint-url), siembra libros y lanza GET /books/<id> con N clientes
+simultáneos. La caché en proceso se desactiva para medir el acceso a la BD.
+Necesita requirements-asgi.txt instalado (uvicorn, quart, aiobotocore).
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+
+SERVERS = {
+    'sync (Flask)': lambda port: [sys.executable, '-c', f"import main; main.app.run(host='127.0.0.1', port={port}, threaded=True)"],
+    'async (ASGI)': lambda port: [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1',
+                                  '--port', str(port), '--log-level', 'warning'],
+}
+
+
+def start_server(command, port, env):
+    process = subprocess.Popen(command(port), cwd=APP_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            # /ready y no /health: la BD se inicializa en segundo plano y no debe entrar en la medida
+            status, _ = request(port, 'GET', '/ready')
+            if status == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"El servidor en el puerto {port} no arrancó")
+
+
+def request(port, method, path, body=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        payload = json.dumps(body) if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload else {}
+        connection.request(method, path, body=payload, headers=headers)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def seed(port, count):
+    book_ids = []
+    for start in range(0, count, 500):
+        books = [
+            {'title': f'Bench {i}', 'stock': 1, 'genre': ['fiction'], 'average_rating': round(random.uniform(0, 5), 1)}
+            for i in range(start, min(count, start + 500))
+        ]
+        status, body = request(port, 'POST', '/books:batchWrite', {'books': books})
+        if status != 200:
+            raise RuntimeError(f"Fallo al sembrar: {status} {body[:200]!r}")
+        book_ids.extend(r['book_id'] for r in json.loads(body)['results'] if r['status'] == 201)
+    return book_ids
+
+
+def run_load(port, book_ids, concurrency, total):
+    def one(_):
+        start = time.perf_counter()
+        status, _ = request(port, 'GET', f'/books/{random.choice(book_ids)}')
+        return (time.perf_counter() - start) * 1000, status == 200
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'rps': round(total / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2], 2),
+        'p95_ms': round(latencies[max(0, math.ceil(len(latencies) * 0.95) - 1)], 2),
+        'p99_ms': round(latencies[max(0, math.ceil(len(latencies) * 0.99) - 1)], 2),
+        'mean_ms': round(statistics.mean(latencies), 2),
+        'errors': sum(1 for _, ok in results if not ok),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endpoint-url', required=True, help="DynamoDB Local / moto_server")
+    parser.add_argument('--table', default='books-bench')
+    parser.add_argument('--books', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=2000, help="Peticiones por nivel de concurrencia")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64, 256])
+    parser.add_argument('--base-port', type=int, default=8081)
+    args = parser.parse_args()
+
+    env = dict(os.environ, DB_DYNAMONAME=args.table, DYNAMODB_ENDPOINT_URL=args.endpoint_url, CACHE_MAXSIZE='0')
+    env.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+    env.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+
+    results = {}
+    book_ids = None
+    for offset, (name, command) in enumerate(SERVERS.items()):
+        port = args.base_port + offset
+        process = start_server(command, port, env)
+        try:
+            if book_ids is None:
+                book_ids = seed(port, args.books)
+            results[name] = {
+                f'c={concurrency}': run_load(port, book_ids, concurrency, args.requests)
+                for concurrency in args.concurrency
+            }
+        finally:
+            process.terminate()
+            process.wait()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
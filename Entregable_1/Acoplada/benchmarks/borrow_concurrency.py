@@ -0,0 +1,246 @@
+"""Comprobación de concurrencia de préstamos y devoluciones contra DynamoDB Local o PostgreSQL, sin desplegar nada.
+
+    python benchmarks/borrow_concurrency.py                                   # arranca DynamoDB Local con docker
+    python benchmarks/borrow_concurrency.py --endpoint-url http://localhost:8000 [--stock 10] [--clients 50]
+    python benchmarks/borrow_concurrency.py --backend postgres                # arranca postgres:16 con docker
+    DB_HOST=localhost DB_PASSWORD=... python benchmarks/borrow_concurrency.py --backend postgres
+
+Usa DynamoDBDatabase o PostgresDatabase directamente (sin servidor HTTP) sobre
+una tabla (DynamoDB) o una base de datos (PostgreSQL, con DB_HOST, DB_PORT,
+DB_USER y DB_PASSWORD si ya hay uno arrancado) temporal que se borra al
+terminar. En cada ronda:
+
+1. Crea un libro con --stock copias y lanza --clients borrow_book a la vez: salen
+   exactamente min(stock, clients) préstamos y el resto recibe OutOfStockError.
+2. Lanza a la vez la devolución de todas las copias prestadas y otros tantos
+   préstamos: el stock final es el de antes más las devoluciones menos los
+   préstamos que hayan salido.
+3. Devuelve a la vez todo lo prestado: el libro vuelve a --stock copias.
+
+Tras cada fase se lee el libro: el stock tiene que ser el esperado y status
+"borrowed" si y solo si el stock es 0. En DynamoDB el último préstamo son dos
+escrituras condicionales (stock > 1 y después stock = 1, que pasa a borrowed;
+ver BORROW_STEPS), así que con poco stock y muchos clientes es donde más se
+cruzan. Al final de la ronda la versión del catálogo tiene que haber crecido
+exactamente una vez por escritura hecha: los incrementos concurrentes en sus
+shards no se pierden.
+
+moto no serializa las escrituras condicionales concurrentes y puede vender una
+copia de más: hay que usar DynamoDB Local (o DynamoDB). Sale con 1 si falla
+alguna comprobación. Necesita requirements.txt instalado.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from functools import partial
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+sys.path.insert(0, APP_DIR)
+
+from db.db import OutOfStockError, UnprocessedError  # noqa: E402
+from models.book import Book  # noqa: E402
+
+LOCAL_IMAGE = 'amazon/dynamodb-local'
+POSTGRES_IMAGE = 'postgres:16'
+POSTGRES_PASSWORD = 'postgres'
+DEFAULT_PORTS = {'dynamodb': 8000, 'postgres': 5432}
+
+
+def start_container(args, ready, name):
+    """Arranca la imagen con docker y espera a que ready() sea cierto. Devuelve el id del contenedor."""
+    container = subprocess.run(['docker', 'run', '--rm', '-d', *args], capture_output=True, text=True, check=True
+                               ).stdout.strip()
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if ready():
+            return container
+        time.sleep(0.2)
+    subprocess.run(['docker', 'stop', container], capture_output=True)
+    raise RuntimeError(f"{name} no arrancó")
+
+
+def start_dynamodb_local(port):
+    """DynamoDB Local en memoria."""
+    def ready():
+        try:
+            urllib.request.urlopen(f'http://localhost:{port}', timeout=1)
+        except urllib.error.HTTPError:
+            # Responde (con un 400 a la petición vacía): ya acepta llamadas
+            return True
+        except OSError:
+            return False
+        return True
+
+    return start_container(['-p', f'{port}:8000', LOCAL_IMAGE], ready, "DynamoDB Local")
+
+
+def admin_connection():
+    """Conexión en autocommit a la base por defecto, para crear y borrar la de la prueba."""
+    import psycopg2
+    connection = psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'), port=int(os.getenv('DB_PORT', '5432')),
+        dbname='postgres', user=os.getenv('DB_USER', 'postgres'), password=os.getenv('DB_PASSWORD', ''),
+        connect_timeout=1,
+    )
+    connection.autocommit = True
+    return connection
+
+
+def start_postgres(port):
+    os.environ['DB_PORT'] = str(port)
+    os.environ['DB_PASSWORD'] = POSTGRES_PASSWORD
+
+    def ready():
+        try:
+            admin_connection().close()
+        except Exception:
+            return False
+        return True
+
+    return start_container(['-p', f'{port}:5432', '-e', f'POSTGRES_PASSWORD={POSTGRES_PASSWORD}', POSTGRES_IMAGE],
+                           ready, "PostgreSQL")
+
+
+def open_dynamodb(endpoint_url, port):
+    """(base de datos, limpieza, contenedor o None) sobre una tabla nueva."""
+    from db.dynamodb_db import DynamoDBDatabase
+    container = None if endpoint_url else start_dynamodb_local(port)
+    os.environ['DYNAMODB_ENDPOINT_URL'] = endpoint_url or f'http://localhost:{port}'
+    os.environ['DB_DYNAMONAME'] = f'borrow-check-{uuid.uuid4().hex[:8]}'
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+    db = DynamoDBDatabase()
+    return db, db.table.delete, container
+
+
+def open_postgres(port, clients):
+    """(base de datos, limpieza, contenedor o None) sobre una base de datos nueva del servidor."""
+    from db.postgres_db import PostgresDatabase
+    container = None if os.getenv('DB_HOST') else start_postgres(port)
+    name = f'borrow_check_{uuid.uuid4().hex[:8]}'
+    with closing(admin_connection()) as connection, connection.cursor() as cursor:
+        cursor.execute(f'CREATE DATABASE {name}')
+    os.environ['DB_NAME'] = name
+    # Un cliente por conexión: con menos, los préstamos esperarían turno en el pool y no en el libro
+    os.environ['DB_POOL_MAX'] = str(max(int(os.getenv('DB_POOL_MAX', '10')), 2 * clients))
+    db = PostgresDatabase()
+
+    def drop():
+        db.pool.closeall()
+        with closing(admin_connection()) as connection, connection.cursor() as cursor:
+            cursor.execute(f'DROP DATABASE {name}')
+
+    return db, drop, container
+
+
+def burst(calls):
+    """Lanza las llamadas a la vez (todas esperan en una barrera). Devuelve el resultado o la excepción de cada una."""
+    if not calls:
+        return []
+    barrier = threading.Barrier(len(calls))
+
+    def worker(call):
+        barrier.wait()
+        try:
+            return call()
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        return list(pool.map(worker, calls))
+
+
+def unexpected(results, allowed=()):
+    return sorted({type(r).__name__ for r in results if not isinstance(r, (Book, *allowed))})
+
+
+def check_book(db, book_id, expected_stock, phase, errors):
+    book = db.get_book(book_id)
+    if book.stock != expected_stock:
+        errors.append(f"{phase}: stock {book.stock}, se esperaba {expected_stock}")
+    if (book.status == 'borrowed') != (book.stock == 0):
+        errors.append(f"{phase}: status {book.status} con stock {book.stock}")
+
+
+def run_round(db, stock, clients):
+    version = db.get_catalog_version()
+    book_id = db.create_book(Book(title='Prueba de concurrencia', genre=['fiction'], stock=stock)).book_id
+    borrow = partial(db.borrow_book, book_id)
+    give_back = partial(db.return_book, book_id)
+    errors = []
+    try:
+        # 1. Solo préstamos: el stock solo baja, así que cada uno sale o recibe OutOfStockError
+        borrows = burst([borrow] * clients)
+        lent = sum(isinstance(r, Book) for r in borrows)
+        if lent != min(stock, clients):
+            errors.append(f"préstamos: {lent} con {stock} copias y {clients} clientes")
+        if unexpected(borrows, (OutOfStockError,)):
+            errors.append(f"préstamos: errores inesperados {unexpected(borrows, (OutOfStockError,))}")
+        check_book(db, book_id, stock - lent, 'préstamos', errors)
+
+        # 2. Devoluciones y préstamos cruzados; un préstamo puede rendirse (UnprocessedError) sin cambiar nada
+        mixed = burst([give_back] * lent + [borrow] * lent)
+        returned = sum(isinstance(r, Book) for r in mixed[:lent])
+        relent = sum(isinstance(r, Book) for r in mixed[lent:])
+        if returned != lent or unexpected(mixed[:lent]):
+            errors.append(f"mixto: {returned} de {lent} devoluciones, errores {unexpected(mixed[:lent])}")
+        if unexpected(mixed[lent:], (OutOfStockError, UnprocessedError)):
+            errors.append(f"mixto: errores inesperados {unexpected(mixed[lent:], (OutOfStockError, UnprocessedError))}")
+        on_loan = lent - returned + relent
+        check_book(db, book_id, stock - on_loan, 'mixto', errors)
+
+        # 3. Se devuelve todo
+        returns = burst([give_back] * on_loan)
+        if unexpected(returns):
+            errors.append(f"devoluciones: errores inesperados {unexpected(returns)}")
+        check_book(db, book_id, stock, 'devoluciones', errors)
+    finally:
+        db.delete_book(book_id)
+
+    # Alta, préstamos, devoluciones y borrado: un incremento de la versión por escritura
+    writes = 2 + lent + returned + relent + sum(isinstance(r, Book) for r in returns)
+    if db.get_catalog_version() - version != writes:
+        errors.append(f"versión: creció {db.get_catalog_version() - version} con {writes} escrituras")
+    return {'lent': lent, 'rejected': clients - lent, 'relent': relent, 'errors': errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=DEFAULT_PORTS, default='dynamodb')
+    parser.add_argument('--endpoint-url', help="DynamoDB Local ya arrancado (por defecto se arranca uno con docker)")
+    parser.add_argument('--port', type=int, help="Puerto del contenedor arrancado con docker (8000 o 5432)")
+    parser.add_argument('--stock', type=int, default=10, help="Copias del libro de prueba")
+    parser.add_argument('--clients', type=int, default=50, help="Préstamos simultáneos")
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    port = args.port or DEFAULT_PORTS[args.backend]
+    if args.backend == 'postgres':
+        db, cleanup, container = open_postgres(port, args.clients)
+    else:
+        db, cleanup, container = open_dynamodb(args.endpoint_url, port)
+    try:
+        db.initialize()
+        results = [run_round(db, args.stock, args.clients) for _ in range(args.rounds)]
+    finally:
+        try:
+            cleanup()
+        finally:
+            if container:
+                subprocess.run(['docker', 'stop', container], capture_output=True)
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    return 1 if any(result['errors'] for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -30,10 +30,42 @@ aws cloudformation deploy \
     --region $REGION
 
 echo "Desplegando DynamoDB stack..."
-aws cloudformation deploy \
-    --template-file db_dynamodb.yml \
+# DynamoDB solo crea un índice secundario por actualización (IndexStage en db_dynamodb.yml): una
+# tabla que ya existe los recibe de uno en uno, desde los que ya tiene y esperando a que cada uno
+# esté activo; una tabla nueva se crea con todos
+DYNAMO_TABLE=$(aws cloudformation describe-stacks \
     --stack-name dynamo-stack \
-    --region $REGION
+    --region $REGION \
+    --query "Stacks[0].Outputs[?OutputKey=='TableName'].OutputValue" \
+    --output text 2>/dev/null)
+if [ -n "$DYNAMO_TABLE" ]; then
+    CURRENT_STAGE=$(aws dynamodb describe-table \
+        --table-name $DYNAMO_TABLE \
+        --region $REGION \
+        --query "length(Table.GlobalSecondaryIndexes || \`[]\`)" \
+        --output text)
+    INDEX_STAGES=$(seq $(( CURRENT_STAGE > 1 ? CURRENT_STAGE : 1 )) 4)
+else
+    INDEX_STAGES=4
+fi
+for stage in $INDEX_STAGES; do
+    echo "Índices secundarios: etapa $stage de 4..."
+    aws cloudformation deploy \
+        --template-file db_dynamodb.yml \
+        --stack-name dynamo-stack \
+        --region $REGION \
+        --parameter-overrides IndexStage=$stage \
+        --no-fail-on-empty-changeset
+    if [ -n "$DYNAMO_TABLE" ]; then
+        while [ -n "$(aws dynamodb describe-table \
+            --table-name $DYNAMO_TABLE \
+            --region $REGION \
+            --query "Table.GlobalSecondaryIndexes[?IndexStatus!='ACTIVE'].IndexName" \
+            --output text)" ]; do
+            sleep 15
+        done
+    fi
+done
 
 echo "Haciendo login en ECR..."
 aws ecr get-login-password --region $REGION | docker login --username AWS --password-stdin $ECR_URL
@@ -55,4 +87,20 @@ aws cloudformation deploy \
     --capabilities CAPABILITY_NAMED_IAM \
     --parameter-overrides VpcId=$VPC_ID SubnetIds=$SUBNET_IDS
 
+# Los libros escritos antes de los índices secundarios (o con otro CatalogShards) no aparecen en
+# los listados ordenados ni en GET /books/changes hasta rellenar sus atributos; se puede relanzar.
+# Tabla y CatalogShards salen del stack desplegado, los mismos que recibe la aplicación
+stack_parameter() {
+    aws cloudformation describe-stacks \
+        --stack-name book-stack \
+        --region $REGION \
+        --query "Stacks[0].Parameters[?ParameterKey=='$1'].ParameterValue" \
+        --output text
+}
+TABLE_NAME=$(stack_parameter DBDynamoName)
+CATALOG_SHARDS=$(stack_parameter CatalogShards)
+
+echo "Rellenando los atributos de los índices secundarios ($TABLE_NAME, $CATALOG_SHARDS particiones)..."
+(cd app && CATALOG_SHARDS=$CATALOG_SHARDS python bulk.py --table "$TABLE_NAME" reindex)
+
 echo "Proceso completado."
\ No newline at end of file
@@ -0,0 +1,67 @@
+import json
+from botocore.exceptions import ClientError
+from common.runtime import get_table, get_dynamodb
+from common.codec import dumps
+from common.schema import is_book_item, to_public
+from common.batch import batch_get
+from common.metrics import instrumented
+from common.resilience import OverloadedError, overloaded_response
+
+MAX_BATCH_SIZE = 1000
+
+@instrumented('POST /books:batchGet')
+def lambda_handler(event, context):
+    dynamodb = get_dynamodb()
+    table_name = get_table().name
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+        ids = body.get('ids')
+
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, str) and i for i in ids):
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'ids must be a non-empty list of book_id'})
+            }
+        if len(ids) > MAX_BATCH_SIZE:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': f'At most {MAX_BATCH_SIZE} ids per request'})
+            }
+
+        keys = [{'book_id': book_id} for book_id in dict.fromkeys(ids)]
+        items, pending = batch_get(dynamodb, table_name, keys)
+        found = {item['book_id']: item for item in items if is_book_item(item)}
+        unprocessed = {key['book_id'] for key in pending}
+
+        results = []
+        for book_id in ids:
+            if book_id in found:
+                results.append({'book_id': book_id, 'status': 200, 'book': to_public(found[book_id])})
+            elif book_id in unprocessed:
+                results.append({'book_id': book_id, 'status': 503, 'error': 'Not processed, retry'})
+            else:
+                results.append({'book_id': book_id, 'status': 404, 'error': 'Book not found'})
+
+        return {
+            'statusCode': 200,
+            'body': dumps({'results': results})
+        }
+
+    except json.JSONDecodeError:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Invalid JSON in request body'})
+        }
+    except OverloadedError as e:
+        return overloaded_response(e)
+    except ClientError as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
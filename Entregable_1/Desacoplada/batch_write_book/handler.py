@@ -0,0 +1,86 @@
+import json
+import uuid
+from datetime import datetime
+from botocore.exceptions import ClientError
+from common.runtime import get_table, get_dynamodb
+from common.codec import loads
+from common.schema import add_index_attributes, index_items
+from common.batch import batch_write
+from common.metrics import instrumented
+from common.resilience import OverloadedError, overloaded_response
+
+MAX_BATCH_SIZE = 1000
+
+@instrumented('POST /books:batchWrite')
+def lambda_handler(event, context):
+    dynamodb = get_dynamodb()
+    table_name = get_table().name
+
+    try:
+        body = loads(event.get('body') or '{}')
+        books = body.get('books')
+
+        if not isinstance(books, list) or not books:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'books must be a non-empty list'})
+            }
+        if len(books) > MAX_BATCH_SIZE:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': f'At most {MAX_BATCH_SIZE} books per request'})
+            }
+
+        results = [None] * len(books)
+        position = {}
+        requests = []
+        timestamp = datetime.utcnow().isoformat()
+
+        for i, book in enumerate(books):
+            if not isinstance(book, dict):
+                results[i] = {'status': 400, 'error': 'Each book must be a JSON object'}
+                continue
+
+            # Misma regla que post_book: al menos 3 atributos con valor
+            non_empty_fields = {
+                k: v for k, v in book.items()
+                if v not in (None, "", [], {}) and k not in ("book_id", "created_at", "updated_at", "version")
+            }
+            if len(non_empty_fields) < 3:
+                results[i] = {'status': 400, 'error': 'El libro debe tener al menos 3 atributos con valor.'}
+                continue
+
+            book = dict(book, book_id=str(uuid.uuid4()), created_at=timestamp, updated_at=timestamp, version=0)
+            position[book['book_id']] = i
+            results[i] = {'book_id': book['book_id'], 'status': 201}
+            requests.append({'PutRequest': {'Item': add_index_attributes(book)}})
+            requests.extend({'PutRequest': {'Item': item}} for item in index_items(book['book_id'], book))
+
+        for request in batch_write(dynamodb, table_name, requests):
+            item = request['PutRequest']['Item']
+            # Si falla una entrada de un índice se informa sobre su libro
+            book_id = item.get('target_id', item['book_id'])
+            results[position[book_id]] = {'book_id': book_id, 'status': 503, 'error': 'Not processed, retry'}
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'results': results})
+        }
+
+    except json.JSONDecodeError:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Invalid JSON in request body'})
+        }
+    except OverloadedError as e:
+        return overloaded_response(e)
+    except ClientError as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
@@ -0,0 +1,124 @@
+"""Compara el coste de arranque y de invocación en caliente de las lambdas.
+
+    python benchmarks/runtime_bench.py [--iterations 200]
+
+- Arranque en frío: importa el handler en un proceso nuevo, con boto3 importado
+  al cargar el módulo (como antes) o de forma diferida (common.runtime).
+- En caliente: invoca get_book reconstruyendo el cliente en cada llamada (como
+  antes) o reutilizando el del contenedor. Usa DYNAMODB_ENDPOINT_URL (p. ej.
+  DynamoDB Local) si está definido y, si no, moto en memoria.
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+COLD_SNIPPET = """
+import importlib.util, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+if {eager}:
+    import boto3
+spec = importlib.util.spec_from_file_location('handler', {root!r} + '/get_book/handler.py')
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def cold_start(eager, runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, '-c', COLD_SNIPPET.format(root=ROOT, eager=eager)],
+            capture_output=True, text=True, check=True,
+        )
+        samples.append(float(out.stdout.strip()))
+    return samples
+
+
+def load_handler():
+    import importlib.util
+    spec = importlib.util.spec_from_file_location('get_book_handler', os.path.join(ROOT, 'get_book', 'handler.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def warm_latency(iterations, reuse_client):
+    from common import runtime
+
+    handler = load_handler()
+    table = runtime.get_table()
+    table.put_item(Item={'book_id': 'bench', 'title': 'Bench', 'stock': 1})
+    event = {'pathParameters': {'book_id': 'bench'}}
+
+    samples = []
+    for _ in range(iterations):
+        if not reuse_client:
+            # Equivale al boto3.resource(...) que cada handler hacía en cada invocación
+            runtime.reset()
+        start = time.perf_counter()
+        response = handler.lambda_handler(event, None)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response['statusCode'] == 200, response
+    return samples
+
+
+def create_table():
+    from common import runtime
+
+    runtime.get_dynamodb().create_table(
+        TableName=os.environ['DB_DYNAMONAME'],
+        KeySchema=[{'AttributeName': 'book_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'book_id', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST',
+    )
+
+
+def summary(samples):
+    ordered = sorted(samples)
+    return {
+        'mean_ms': round(statistics.mean(ordered), 3),
+        'p50_ms': round(ordered[len(ordered) // 2], 3),
+        'p95_ms': round(ordered[max(0, math.ceil(len(ordered) * 0.95) - 1)], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--cold-runs', type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DB_DYNAMONAME', 'books-bench')
+    results = {
+        'cold_import_eager_boto3': summary(cold_start(True, args.cold_runs)),
+        'cold_import_lazy_boto3': summary(cold_start(False, args.cold_runs)),
+    }
+
+    if os.getenv('DYNAMODB_ENDPOINT_URL'):
+        create_table()
+        results['warm_new_client_per_call'] = summary(warm_latency(args.iterations, reuse_client=False))
+        results['warm_reused_client'] = summary(warm_latency(args.iterations, reuse_client=True))
+    else:
+        from moto import mock_aws
+
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+        with mock_aws():
+            create_table()
+            results['warm_new_client_per_call'] = summary(warm_latency(args.iterations, reuse_client=False))
+            results['warm_reused_client'] = summary(warm_latency(args.iterations, reuse_client=True))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
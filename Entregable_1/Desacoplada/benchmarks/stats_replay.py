@@ -0,0 +1,256 @@
+"""Comprueba stats_stream en local: los update_item que genera y los contadores que resultan.
+
+    python benchmarks/stats_replay.py [--books 2000] [--events 20000] [--batch-size 500]
+
+Invoca stats_stream/handler.py con registros del stream de DynamoDB
+(NEW_AND_OLD_IMAGES) y una tabla falsa que guarda cada update_item y aplica su
+ADD sobre meta#catalog. No necesita DynamoDB.
+
+1. Casos fijos, comprobando los argumentos exactos de update_item: alta,
+   modificación, borrado por tombstone (MODIFY a tombstone y después el REMOVE
+   del TTL, que no cuenta), REMOVE de un libro, lotes solo de items auxiliares
+   (índices, shards de valoraciones, meta#catalog) que no escriben nada, y un
+   lote mixto que sale en un único update_item.
+2. Reentrega: el stream entrega al menos una vez y un lote reintentado después
+   de aplicarse cuenta dos veces (ver common/stats.py); se comprueba que es así.
+3. Un stream aleatorio de altas, modificaciones y borrados (con sus items
+   auxiliares) aplicado por lotes: los contadores tienen que coincidir con los
+   que da recalcularlos desde el estado final (lo que hace bulk.py rebuild-stats).
+   También mide el rendimiento de la reducción.
+
+Sale con 1 si falla alguna comprobación.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from boto3.dynamodb.types import TypeSerializer  # noqa: E402
+
+from common.changes import tombstone_put  # noqa: E402
+from common.ratings import RATING_ENTITY  # noqa: E402
+from common.schema import genre_items, term_items  # noqa: E402
+from common.stats import STAT_PREFIX, STATS_KEY, book_counters, merge, stats_response  # noqa: E402
+
+GENRES = ('fiction', 'non-fiction', 'fantasy', 'sci-fi', 'romance', 'mystery', 'thriller', 'biography', 'history')
+_serializer = TypeSerializer()
+
+
+class StatsTable:
+    """Tabla falsa para stats_stream: guarda los update_item y suma sus ADD en el item meta#catalog."""
+
+    def __init__(self):
+        self.calls = []
+        self.item = {}
+
+    def update_item(self, **kwargs):
+        self.calls.append(kwargs)
+        for name, value in added(kwargs).items():
+            self.item[name] = self.item.get(name, Decimal(0)) + value
+
+
+def added(call):
+    """{atributo: valor} de la cláusula ADD de un update_item."""
+    names, values = call['ExpressionAttributeNames'], call['ExpressionAttributeValues']
+    clause = call['UpdateExpression'].split(' SET ')[0]
+    return {names[name]: values[value] for name, value in re.findall(r'(#\w+) (:\w+)', clause)}
+
+
+def load_handler():
+    spec = importlib.util.spec_from_file_location('stats_stream_handler', os.path.join(ROOT, 'stats_stream', 'handler.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def invoke(handler, records):
+    """Un lote por el handler con una tabla falsa nueva. Devuelve la tabla."""
+    table = StatsTable()
+    handler.get_table = lambda: table
+    handler.lambda_handler({'Records': records}, None)
+    return table
+
+
+def stream_record(event_name, old=None, new=None):
+    images = {}
+    if old is not None:
+        images['OldImage'] = {k: _serializer.serialize(v) for k, v in old.items()}
+    if new is not None:
+        images['NewImage'] = {k: _serializer.serialize(v) for k, v in new.items()}
+    return {'eventName': event_name, 'dynamodb': images}
+
+
+def tombstone(book_id):
+    return tombstone_put(book_id, datetime.utcnow())['Item']
+
+
+def stat_counters(counters):
+    return {STAT_PREFIX + name: Decimal(value) for name, value in counters.items()}
+
+
+def check_call(errors, case, table, expected):
+    """expected: contadores que debe sumar el único update_item del lote, o None si no debe haber ninguno."""
+    if expected is None:
+        if table.calls:
+            errors.append(f"{case}: se esperaba ningún update_item y hubo {len(table.calls)}")
+        return
+    if len(table.calls) != 1:
+        errors.append(f"{case}: se esperaba un update_item y hubo {len(table.calls)}")
+        return
+    call = table.calls[0]
+    if call['Key'] != STATS_KEY:
+        errors.append(f"{case}: Key {call['Key']}")
+    if not call['UpdateExpression'].startswith('ADD ') or not call['UpdateExpression'].endswith(' SET #entity = :meta'):
+        errors.append(f"{case}: UpdateExpression {call['UpdateExpression']!r}")
+    if call['ExpressionAttributeNames'].get('#entity') != 'entity' or call['ExpressionAttributeValues'].get(':meta') != 'meta':
+        errors.append(f"{case}: meta#catalog sin marcar como item auxiliar")
+    if added(call) != stat_counters(expected):
+        errors.append(f"{case}: ADD {added(call)}, se esperaba {stat_counters(expected)}")
+
+
+def check_cases(handler):
+    errors = []
+    book = {'book_id': 'b1', 'title': 'Uno', 'genre': ['fantasy', 'fantasy', 'sci-fi'], 'status': 'available',
+            'stock': 3, 'average_rating': Decimal('4.5')}
+    counters = {'books': 1, 'stock': 3, 'rating_sum': Decimal('4.5'), 'status:available': 1,
+                'genre:fantasy': 1, 'genre:sci-fi': 1}
+    negative = {name: -value for name, value in counters.items()}
+    borrowed = {**book, 'stock': 0, 'status': 'borrowed'}
+    auxiliary = [
+        *genre_items('b1', book['genre']),
+        *term_items('b1', {'uno': 1}),
+        {'book_id': 'rating#b1#0', 'entity': RATING_ENTITY, 'rating_sum': Decimal(4), 'rating_count': 1},
+    ]
+
+    check_call(errors, 'alta', invoke(handler, [stream_record('INSERT', new=book)]), counters)
+    check_call(errors, 'modificación', invoke(handler, [stream_record('MODIFY', old=book, new=borrowed)]),
+               {'stock': -3, 'status:available': -1, 'status:borrowed': 1})
+    check_call(errors, 'modificación sin cambios en los contadores',
+               invoke(handler, [stream_record('MODIFY', old=book, new={**book, 'title': 'Otro'})]), None)
+    check_call(errors, 'borrado (tombstone)',
+               invoke(handler, [stream_record('MODIFY', old=book, new=tombstone('b1'))]), negative)
+    check_call(errors, 'caducidad del tombstone (REMOVE del TTL)',
+               invoke(handler, [stream_record('REMOVE', old=tombstone('b1'))]), None)
+    check_call(errors, 'REMOVE de un libro', invoke(handler, [stream_record('REMOVE', old=book)]), negative)
+    # Por separado: en un mismo lote las altas y las bajas se anularían aunque contaran
+    check_call(errors, 'alta de items auxiliares', invoke(handler, [
+        *(stream_record('INSERT', new=item) for item in auxiliary),
+        stream_record('MODIFY', old={**STATS_KEY, 'entity': 'meta'}, new={**STATS_KEY, 'entity': 'meta', 'stat:books': 1}),
+    ]), None)
+    check_call(errors, 'baja de items auxiliares',
+               invoke(handler, [stream_record('REMOVE', old=item) for item in auxiliary]), None)
+    check_call(errors, 'lote mixto', invoke(handler, [
+        stream_record('INSERT', new=book),
+        *(stream_record('INSERT', new=item) for item in auxiliary),
+        stream_record('INSERT', new={**book, 'book_id': 'b2', 'genre': ['history']}),
+        stream_record('MODIFY', old=book, new=borrowed),
+    ]), {'books': 2, 'stock': 3, 'rating_sum': Decimal(9), 'status:available': 1, 'status:borrowed': 1,
+         'genre:fantasy': 1, 'genre:sci-fi': 1, 'genre:history': 1})
+
+    # Al menos una vez: el mismo lote entregado dos veces se suma dos veces (lo corrige rebuild-stats)
+    table = StatsTable()
+    handler.get_table = lambda: table
+    for _ in range(2):
+        handler.lambda_handler({'Records': [stream_record('INSERT', new=book)]}, None)
+    if table.item != stat_counters({name: 2 * value for name, value in counters.items()}):
+        errors.append(f"reentrega: {table.item}")
+    return errors
+
+
+def random_book(rng, book_id):
+    return {
+        'book_id': book_id,
+        'title': f'Libro {book_id}',
+        'genre': rng.sample(GENRES, rng.randint(1, 3)),
+        'status': rng.choice(('available', 'available', 'borrowed')),
+        'stock': rng.randint(0, 20),
+        'average_rating': Decimal(rng.randint(0, 50)) / 10,
+    }
+
+
+def generate(rng, books, events):
+    """Registros del stream y estado final de la tabla (solo libros)."""
+    state = {}
+    tombstones = []
+    records = []
+    next_id = 0
+    for _ in range(events):
+        roll = rng.random()
+        if not state or len(state) < books and roll < 0.4:
+            book = random_book(rng, f'b{next_id}')
+            next_id += 1
+            state[book['book_id']] = book
+            records.append(stream_record('INSERT', new=book))
+        elif roll < 0.85:
+            book_id = rng.choice(list(state))
+            old = state[book_id]
+            new = {**old, **{k: v for k, v in random_book(rng, book_id).items() if rng.random() < 0.5}}
+            state[book_id] = new
+            records.append(stream_record('MODIFY', old=old, new=new))
+        else:
+            # delete_book deja un tombstone que el TTL borra más tarde
+            book_id = rng.choice(list(state))
+            tombstones.append(tombstone(book_id))
+            records.append(stream_record('MODIFY', old=state.pop(book_id), new=tombstones[-1]))
+        if tombstones and rng.random() < 0.1:
+            records.append(stream_record('REMOVE', old=tombstones.pop(0)))
+        # Cada escritura de un libro arrastra las de sus items auxiliares
+        records.extend(stream_record('INSERT', new=item) for item in genre_items(f'b{next_id}', ['fantasy']))
+    return records, state
+
+
+def replay(handler, records, batch_size):
+    """Aplica los registros por lotes de batch_size, como stats_stream (un update_item por lote)."""
+    table = StatsTable()
+    handler.get_table = lambda: table
+    for start in range(0, len(records), batch_size):
+        handler.lambda_handler({'Records': records[start:start + batch_size]}, None)
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--books', type=int, default=2000, help="Libros vivos como máximo")
+    parser.add_argument('--events', type=int, default=20000, help="Escrituras de libros a generar")
+    parser.add_argument('--batch-size', type=int, default=500, help="Registros por invocación (BatchSize)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    handler = load_handler()
+    errors = check_cases(handler)
+
+    records, state = generate(random.Random(args.seed), args.books, args.events)
+    start = time.perf_counter()
+    table = replay(handler, records, args.batch_size)
+    elapsed = time.perf_counter() - start
+
+    batches = -(-len(records) // args.batch_size)
+    if len(table.calls) > batches:
+        errors.append(f"replay: {len(table.calls)} update_item para {batches} lotes")
+    incremental = stats_response(table.item)
+    rebuilt = stats_response(stat_counters(merge(book_counters(book) for book in state.values())))
+    if incremental != rebuilt:
+        errors.append(f"replay: {incremental} frente a {rebuilt} recalculado")
+
+    print(json.dumps({
+        'records': len(records),
+        'final_books': len(state),
+        'update_items': len(table.calls),
+        'records_per_s': round(len(records) / elapsed),
+        'stats': incremental,
+        'errors': errors,
+    }, indent=2, ensure_ascii=False))
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import json
+from datetime import datetime
+from botocore.exceptions import ClientError
+from common.runtime import get_table
+from common.codec import dumps
+from common.schema import BORROW_STEPS, STOCK_ATTEMPTS, is_book_item, stock_update, to_public
+from common.metrics import instrumented
+from common.resilience import OverloadedError, overloaded_response
+from common.http_cache import cache_headers, item_etag
+
+@instrumented('POST /books/{book_id}/borrow')
+def lambda_handler(event, context):
+    table = get_table()
+    
+    try:
+        # Obtener book_id de los path parameters
+        book_id = event.get('pathParameters', {}).get('book_id')
+        
+        if not book_id:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'book_id is required'})
+            }
+        
+        updated_at = datetime.utcnow().isoformat()
+        for _ in range(STOCK_ATTEMPTS):
+            # stock - 1 con ADD: dos préstamos a la vez nunca venden la misma copia
+            for stock_condition, status in BORROW_STEPS:
+                try:
+                    response = table.update_item(**stock_update(book_id, -1, updated_at, stock_condition, status))
+                except ClientError as e:
+                    if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                        raise
+                    continue
+                item = response['Attributes']
+                return {
+                    'statusCode': 200,
+                    'headers': cache_headers(item_etag(item)),
+                    'body': dumps(to_public(item))
+                }
+            
+            # Solo en el camino de error: no existe, no quedan copias o el stock cambió entre medias
+            current = table.get_item(Key={'book_id': book_id}, ConsistentRead=True).get('Item')
+            if current is None or not is_book_item(current):
+                return {
+                    'statusCode': 404,
+                    'body': json.dumps({'error': 'Book not found'})
+                }
+            if int(current.get('stock', 0)) < 1:
+                return {
+                    'statusCode': 409,
+                    'body': json.dumps({'error': 'Out of stock', 'book_id': book_id})
+                }
+        
+        return {
+            'statusCode': 503,
+            'body': json.dumps({'error': 'Stock changed concurrently, retry'})
+        }
+        
+    except OverloadedError as e:
+        return overloaded_response(e)
+    except ClientError as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
@@ -0,0 +1,95 @@
+import json
+from datetime import datetime
+from botocore.exceptions import ClientError
+from common.runtime import get_table
+from common.codec import dumps
+from common.convert import encode_cursor
+from common.changes import (
+    SinceExpiredError, change_bucket, changes_query, changes_state, collect_changes, next_bucket, parse_since,
+)
+from common.metrics import instrumented
+from common.resilience import OverloadedError, overloaded_response
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+
+def parse_limit(value):
+    if value is None:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be greater than 0')
+    return min(limit, MAX_LIMIT)
+
+def changes_response(books, deleted, next_cursor, next_since):
+    return {
+        'statusCode': 200,
+        'body': dumps({
+            'books': books,
+            'deleted': deleted,
+            'next_cursor': next_cursor,
+            'next_since': next_since
+        })
+    }
+
+@instrumented('GET /books/changes')
+def lambda_handler(event, context):
+    table = get_table()
+
+    try:
+        params = event.get('queryStringParameters') or {}
+        try:
+            since = parse_since(params.get('since'), datetime.utcnow())
+            limit = parse_limit(params.get('limit'))
+            state = changes_state(since, params.get('cursor'))
+        except SinceExpiredError as e:
+            return {
+                'statusCode': 410,
+                'body': json.dumps({'error': str(e)})
+            }
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': str(e)})
+            }
+
+        # Sin since: solo el punto de partida, que el cliente guarda antes de cargar el catálogo
+        if state['since'] is None:
+            return changes_response([], [], None, state['next_since'])
+
+        # changes-index día a día, desde el de since hasta hoy, hasta llenar la página
+        books, deleted = [], []
+        bucket = state.get('bucket') or change_bucket(state['since'])
+        last_bucket = change_bucket(datetime.utcnow().isoformat())
+        start_key = state.get('key')
+        while True:
+            remaining = limit - len(books) - len(deleted)
+            if not remaining:
+                next_cursor = encode_cursor({**state, 'bucket': bucket, 'key': start_key})
+                return changes_response(books, deleted, next_cursor, None)
+            query_kwargs = changes_query(bucket, state['since'], remaining)
+            if start_key:
+                query_kwargs['ExclusiveStartKey'] = start_key
+            response = table.query(**query_kwargs)
+            collect_changes(response.get('Items', []), books, deleted)
+            start_key = response.get('LastEvaluatedKey')
+            if start_key is None:
+                if bucket >= last_bucket:
+                    return changes_response(books, deleted, None, state['next_since'])
+                bucket = next_bucket(bucket)
+
+    except OverloadedError as e:
+        return overloaded_response(e)
+    except ClientError as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
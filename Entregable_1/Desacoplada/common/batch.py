@@ -0,0 +1,50 @@
+"""BatchGetItem/BatchWriteItem con troceado y reintento de lo no procesado."""
+import random
+import time
+
+# Límites de DynamoDB por llamada
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+MAX_RETRIES = 5
+
+
+def _backoff(attempt):
+    time.sleep(random.uniform(0, min(2.0, 0.05 * 2 ** attempt)))
+
+
+def batch_get(dynamodb, table_name, keys, projection=None):
+    """Lee las claves (en lotes de 100) reintentando las UnprocessedKeys con backoff exponencial.
+
+    projection son los kwargs de schema.projection() para leer solo algunos atributos.
+    Devuelve (items leídos, claves que siguen sin procesar).
+    """
+    items, unprocessed = [], []
+    for start in range(0, len(keys), BATCH_GET_LIMIT):
+        pending = keys[start:start + BATCH_GET_LIMIT]
+        for attempt in range(MAX_RETRIES + 1):
+            response = dynamodb.batch_get_item(RequestItems={table_name: {'Keys': pending, **(projection or {})}})
+            items.extend(response.get('Responses', {}).get(table_name, []))
+            pending = response.get('UnprocessedKeys', {}).get(table_name, {}).get('Keys', [])
+            if not pending or attempt == MAX_RETRIES:
+                break
+            _backoff(attempt)
+        unprocessed.extend(pending)
+    return items, unprocessed
+
+
+def batch_write(dynamodb, table_name, requests):
+    """Escribe las peticiones (en lotes de 25) reintentando los UnprocessedItems con backoff exponencial.
+
+    Devuelve las peticiones que siguen sin procesar.
+    """
+    unprocessed = []
+    for start in range(0, len(requests), BATCH_WRITE_LIMIT):
+        pending = requests[start:start + BATCH_WRITE_LIMIT]
+        for attempt in range(MAX_RETRIES + 1):
+            response = dynamodb.batch_write_item(RequestItems={table_name: pending})
+            pending = response.get('UnprocessedItems', {}).get(table_name, [])
+            if not pending or attempt == MAX_RETRIES:
+                break
+            _backoff(attempt)
+        unprocessed.extend(pending)
+    return unprocessed
@@ -0,0 +1,95 @@
+"""Sincronización incremental del catálogo (GET /books/changes?since=...).
+
+Igual que la versión acoplada (db/changes.py): cada libro lleva change_bucket
+(el día de su updated_at) y changes-index lo ordena por updated_at dentro de cada
+día. delete_book no elimina el item: lo reemplaza por un tombstone que DynamoDB
+borra al pasar expires_at (TTL), y un alta con ese book_id lo sobrescribe.
+
+Con un since anterior a TOMBSTONE_RETENTION_DAYS se responde 410 (hay que
+recargar el catálogo). next_since, el since de la siguiente sincronización, se
+queda CHANGES_LAG segundos por detrás de la primera página, porque el índice se
+actualiza con retardo: algunos cambios llegan dos veces, ninguno se pierde. Sin
+since ni cursor solo se devuelve next_since, el punto de partida de una copia
+recién cargada.
+"""
+import os
+from datetime import date, datetime, timedelta, timezone
+
+from common.convert import decode_cursor
+from common.schema import ENTITY_ATTRIBUTE, TTL_ATTRIBUTE, change_bucket, is_book_item, to_public
+
+CHANGES_INDEX = 'changes-index'
+TOMBSTONE_RETENTION_DAYS = int(os.getenv('TOMBSTONE_RETENTION_DAYS', '7'))
+CHANGES_LAG = float(os.getenv('CHANGES_LAG', '5'))
+TOMBSTONE_ENTITY = 'tombstone'
+
+
+class SinceExpiredError(ValueError):
+    """since es anterior a los borrados que se conservan (410)."""
+
+
+def next_bucket(bucket):
+    return (date.fromisoformat(bucket) + timedelta(days=1)).isoformat()
+
+
+def parse_since(value, now):
+    """since de la query en el formato de updated_at (ISO 8601 en UTC, sin zona). Lanza ValueError."""
+    if value is None:
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError('since must be an ISO 8601 timestamp (next_since from a previous response)')
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    if moment < now - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        raise SinceExpiredError(f'Deletes are kept for {TOMBSTONE_RETENTION_DAYS} days: reload the full catalog')
+    return moment.isoformat()
+
+
+def changes_state(since, cursor):
+    """Estado de la sincronización: el del cursor o, en la primera página, uno nuevo desde since."""
+    if cursor:
+        state = decode_cursor(cursor)
+        if not isinstance(state.get('since'), str) or not isinstance(state.get('next_since'), str):
+            raise ValueError('Invalid cursor')
+        return state
+    lagged = (datetime.utcnow() - timedelta(seconds=CHANGES_LAG)).isoformat()
+    return {'since': since, 'next_since': max(since, lagged) if since else lagged}
+
+
+def changes_query(bucket, since, limit):
+    """Argumentos de query sobre changes-index: cambios de un día con updated_at >= since."""
+    return {
+        'IndexName': CHANGES_INDEX,
+        'KeyConditionExpression': '#bucket = :bucket AND #updated_at >= :since',
+        'ExpressionAttributeNames': {'#bucket': 'change_bucket', '#updated_at': 'updated_at'},
+        'ExpressionAttributeValues': {':bucket': bucket, ':since': since},
+        'Limit': limit,
+    }
+
+
+def collect_changes(items, books, deleted):
+    for item in items:
+        if item.get(ENTITY_ATTRIBUTE) == TOMBSTONE_ENTITY:
+            deleted.append({'book_id': item['book_id'], 'deleted_at': item['updated_at']})
+        elif is_book_item(item):
+            books.append(to_public(item))
+
+
+def tombstone_put(book_id, deleted_at):
+    """Argumentos de put_item que borran un libro dejando su tombstone; nunca sobre un item auxiliar."""
+    updated_at = deleted_at.isoformat()
+    expires_at = deleted_at.replace(tzinfo=timezone.utc) + timedelta(days=TOMBSTONE_RETENTION_DAYS)
+    return {
+        'Item': {
+            'book_id': book_id,
+            ENTITY_ATTRIBUTE: TOMBSTONE_ENTITY,
+            'updated_at': updated_at,
+            'change_bucket': change_bucket(updated_at),
+            TTL_ATTRIBUTE: int(expires_at.timestamp()),
+        },
+        'ConditionExpression': 'attribute_exists(book_id) AND attribute_not_exists(#entity)',
+        'ExpressionAttributeNames': {'#entity': ENTITY_ATTRIBUTE},
+        'ReturnValues': 'ALL_OLD',  # El libro borrado: sus índices auxiliares y shards
+    }
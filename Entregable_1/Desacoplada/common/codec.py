@@ -0,0 +1,37 @@
+"""Serialización JSON de las lambdas en una sola pasada.
+
+- dumps: items de DynamoDB (con Decimal) -> JSON, sin copiar antes todo el árbol
+  con decimal_to_float. Los Decimal enteros salen como int y el resto como float.
+- loads: cuerpo de la petición -> dict listo para DynamoDB (los floats se leen
+  directamente como Decimal), sin recorrerlo después con convert_to_decimal.
+
+Usa orjson si está instalado en la imagen y, si no, la librería estándar.
+"""
+import json
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende de la imagen
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    def dumps(obj) -> str:
+        return orjson.dumps(obj, default=_default).decode('utf-8')
+else:
+    _encoder = json.JSONEncoder(default=_default, separators=(',', ':'))
+
+    def dumps(obj) -> str:
+        return _encoder.encode(obj)
+
+
+def loads(body):
+    """Como json.loads (lanza json.JSONDecodeError), pero con los floats ya como Decimal."""
+    return json.loads(body, parse_float=Decimal)
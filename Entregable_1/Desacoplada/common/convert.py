@@ -0,0 +1,46 @@
+"""Conversiones entre los tipos de DynamoDB y JSON compartidas por las lambdas."""
+import base64
+import json
+from decimal import Decimal
+
+
+def decimal_to_float(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    elif isinstance(obj, dict):
+        return {k: decimal_to_float(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [decimal_to_float(i) for i in obj]
+    return obj
+
+
+def convert_to_decimal(obj):
+    if isinstance(obj, float):
+        return Decimal(str(obj))
+    elif isinstance(obj, list):
+        return [convert_to_decimal(i) for i in obj]
+    elif isinstance(obj, dict):
+        return {k: convert_to_decimal(v) for k, v in obj.items()}
+    else:
+        return obj
+
+
+# Cursor opaco a partir del LastEvaluatedKey de DynamoDB
+def encode_cursor(last_key):
+    if not last_key:
+        return None
+    raw = json.dumps(last_key, default=lambda o: {'__decimal__': str(o)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        key = json.loads(raw, object_hook=lambda d: Decimal(d['__decimal__']) if '__decimal__' in d else d)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(key, dict):
+        raise ValueError('Invalid cursor')
+    return key
@@ -0,0 +1,80 @@
+"""ETag y GET condicional para las lambdas de lectura.
+
+Mismo criterio que la versión acoplada: un libro se identifica por su versión
+y (book_id, updated_at), y una página por los de sus libros más next_cursor. Con
+If-None-Match coincidente se responde 304 sin serializar el cuerpo.
+
+La compresión no se hace aquí: API Gateway comprime las respuestas de más de
+MinimumCompressionSize bytes si el cliente manda Accept-Encoding.
+"""
+import hashlib
+
+
+def _etag(*parts):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b'\0')
+    return f'"{digest.hexdigest()}"'
+
+
+# Con fields la representación es otra: los campos pedidos entran en el ETag
+def item_etag(item, fields=None):
+    # La versión va delante para que PUT pueda comprobar If-Match sin leer el libro
+    digest = _etag(item.get('book_id'), item.get('updated_at'), *(fields or ()))
+    return f'"{item.get("version") or 0}.{digest[1:]}'
+
+
+def page_etag(items, next_cursor, fields=None):
+    return _etag(next_cursor, *(fields or ()),
+                 *(f"{item.get('book_id')}:{item.get('updated_at')}" for item in items))
+
+
+def _opaque_tag(tag):
+    # Comparación débil: API Gateway marca como W/ los ETag de las respuestas que comprime
+    tag = tag.strip()
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def header(event, name):
+    # API Gateway no normaliza las mayúsculas de las cabeceras
+    name = name.lower()
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def etag_matches(event, etag):
+    if_none_match = header(event, 'If-None-Match')
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return _opaque_tag(etag) in {_opaque_tag(tag) for tag in if_none_match.split(',')}
+
+
+def if_match_version(event):
+    """Versión que exige If-Match (el ETag de GET o la versión a secas), o None sin condición."""
+    if_match = header(event, 'If-Match')
+    if not if_match or if_match.strip() == '*':
+        return None
+    tag = if_match.split(',')[0].strip()
+    if tag.startswith('W/'):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"').split('.')[0])
+    except ValueError:
+        raise ValueError('If-Match must be the book ETag or its version')
+
+
+def cache_headers(etag):
+    return {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+
+def not_modified(etag):
+    return {
+        'statusCode': 304,
+        'headers': cache_headers(etag),
+        'body': ''
+    }
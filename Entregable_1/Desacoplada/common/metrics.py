@@ -0,0 +1,121 @@
+"""Métricas por invocación de las lambdas, emitidas como una línea JSON en el log.
+
+Cada línea sigue el formato EMF de CloudWatch (Embedded Metric Format), así que
+CloudWatch crea las métricas por ruta sin llamadas extra a la API, y además se
+puede consultar tal cual con Logs Insights. Incluye cuánto de la duración se
+pasó en DynamoDB y la capacidad consumida, operación a operación.
+
+METRICS_NAMESPACE cambia el espacio de nombres; METRICS_LOG=false las desactiva.
+"""
+import functools
+import json
+import os
+import time
+
+from common.profiling import profiled
+from common.resilience import DYNAMODB as RESILIENCE
+
+# Operaciones de DynamoDB que aceptan ReturnConsumedCapacity
+CAPACITY_OPERATIONS = (
+    'GetItem', 'PutItem', 'UpdateItem', 'DeleteItem', 'Query', 'Scan',
+    'BatchGetItem', 'BatchWriteItem', 'TransactGetItems', 'TransactWriteItems', 'ExecuteStatement',
+)
+
+# Llamadas a DynamoDB de la invocación en curso (una lambda atiende una invocación a la vez)
+_calls = None
+_cold_start = True
+
+
+def _request_capacity(params, model, **kwargs):
+    if model.name in CAPACITY_OPERATIONS:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+
+def _start_call(context, **kwargs):
+    context['metrics_start'] = time.perf_counter()
+
+
+def _end_call(http_response, parsed, model, context, **kwargs):
+    start = context.get('metrics_start')
+    if start is None or _calls is None:
+        return
+    capacity = parsed.get('ConsumedCapacity') or []
+    entries = capacity if isinstance(capacity, list) else [capacity]
+    _calls.append({
+        'operation': model.name,
+        'ms': round((time.perf_counter() - start) * 1000, 3),
+        'capacity': sum(entry.get('CapacityUnits', 0) for entry in entries),
+        'error': parsed.get('Error', {}).get('Code'),
+        'retries': parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0),
+    })
+
+
+def instrument_dynamodb(client):
+    """Registra los hooks de medición en el cliente de botocore (resource.meta.client)."""
+    events = client.meta.events
+    events.register('provide-client-params.dynamodb', _request_capacity, unique_id='metrics-capacity')
+    events.register('before-call.dynamodb', _start_call, unique_id='metrics-start')
+    events.register('after-call.dynamodb', _end_call, unique_id='metrics-end')
+    return client
+
+
+def _emit(route, status, duration_ms, calls, context):
+    global _cold_start
+    dynamodb_ms = round(sum(call['ms'] for call in calls), 3)
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': os.getenv('METRICS_NAMESPACE', 'BooksApi'),
+                'Dimensions': [['route']],
+                'Metrics': [
+                    {'Name': 'duration_ms', 'Unit': 'Milliseconds'},
+                    {'Name': 'dynamodb_ms', 'Unit': 'Milliseconds'},
+                    {'Name': 'consumed_capacity', 'Unit': 'Count'},
+                    {'Name': 'dynamodb_retries', 'Unit': 'Count'},
+                ],
+            }],
+        },
+        'route': route,
+        'status': status,
+        'duration_ms': duration_ms,
+        'dynamodb_ms': dynamodb_ms,
+        'code_ms': round(duration_ms - dynamodb_ms, 3),
+        'dynamodb_calls': len(calls),
+        'consumed_capacity': sum(call['capacity'] for call in calls),
+        'dynamodb_retries': sum(call['retries'] for call in calls),
+        # Acumulados del contenedor (common/resilience.py)
+        'resilience': RESILIENCE.snapshot(),
+        'cold_start': _cold_start,
+        'request_id': getattr(context, 'aws_request_id', None),
+        'calls': calls,
+    }
+    _cold_start = False
+    print(json.dumps(record))
+
+
+def instrumented(route):
+    """Decorador para lambda_handler: mide la invocación y escribe su línea de métricas.
+
+    También la perfila cuando lo pide common/profiling.py.
+    """
+    def decorator(handler):
+        handler = profiled(route)(handler)
+
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            global _calls
+            if os.getenv('METRICS_LOG', 'true').lower() not in ('1', 'true', 'yes'):
+                return handler(event, context)
+            _calls = []
+            start = time.perf_counter()
+            status = 500
+            try:
+                response = handler(event, context)
+                status = response.get('statusCode', 200) if isinstance(response, dict) else 200
+                return response
+            finally:
+                calls, _calls = _calls, None
+                _emit(route, status, round((time.perf_counter() - start) * 1000, 3), calls, context)
+        return wrapper
+    return decorator
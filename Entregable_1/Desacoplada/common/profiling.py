@@ -0,0 +1,309 @@
+"""Perfiles de invocaciones bajo demanda, como profiling.py en la app acoplada.
+
+Se perfila (con cProfile) una de cada tantas invocaciones, según PROFILE_SAMPLE_RATE
+(0 por defecto: ninguna), y las que traen la cabecera X-Profile-Token firmada con
+PROFILE_SECRET (python -m common.profiling [segundos] genera una). Apagado solo
+cuesta mirar esa cabecera; lo monta instrumented (common/metrics.py) en todas las
+lambdas.
+
+Cada perfil reparte la duración entre la E/S de DynamoDB (boto3/botocore), las
+conversiones a y desde Decimal, la serialización JSON y el resto del código (las
+lambdas no usan pydantic, así que validation queda a cero). Por defecto va al log
+de CloudWatch como una línea JSON con el perfil speedscope; con PROFILE_DIR (/tmp
+en Lambda) se guarda en formato speedscope o pstats según PROFILE_FORMAT. La
+respuesta lleva X-Profile-Id para encontrarlo.
+
+Las pilas y el reparto se reconstruyen del grafo llamador → llamado de cProfile,
+igual que en la app acoplada.
+"""
+import cProfile
+import functools
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Optional
+
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_SECRET = os.getenv('PROFILE_SECRET', '')
+PROFILE_DIR = os.getenv('PROFILE_DIR', '')
+PROFILE_FORMAT = os.getenv('PROFILE_FORMAT', 'speedscope')
+
+TOKEN_HEADER = 'X-Profile-Token'
+# Un token firmado caduca como mucho en una hora: no sirve para perfilar indefinidamente
+MAX_TOKEN_TTL = 3600
+# Las llamadas por debajo de esta fracción de la petición no se siguen expandiendo:
+# quedan como hoja, con todo su tiempo, para no perderlas en el reparto
+MIN_NODE_FRACTION = 0.001
+MAX_STACK_DEPTH = 200
+
+# Categorías de cada función según su fichero (o, en las de C, su nombre). Se miran
+# en este orden: boto3/dynamodb/types.py son las conversiones Decimal de boto3 y
+# common/convert.py, las de las lambdas
+CATEGORIES = (
+    ('decimal', ('/boto3/dynamodb/types.py', '/_pydecimal.py', '/common/convert.py'), ('decimal.Decimal',)),
+    ('db_io', ('/boto3/', '/botocore/', '/urllib3/', '/http/client.py', '/socket.py', '/ssl.py'),
+     ('_socket', '_ssl')),
+    ('validation', ('/pydantic/', '/pydantic_core/'), ('pydantic_core',)),
+    ('serialization', ('/json/', '/common/codec.py'), ('orjson', '_json')),
+)
+CATEGORY_NAMES = tuple(name for name, _, _ in CATEGORIES) + ('other',)
+
+_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# ACTIVACIÓN
+# ---------------------------------------------------------------------------
+
+def _signature(secret: str, expires: int) -> str:
+    return hmac.new(secret.encode(), str(expires).encode(), hashlib.sha256).hexdigest()
+
+
+def profile_token(secret: str, ttl: int = 300, now: Optional[float] = None) -> str:
+    """Valor de X-Profile-Token válido durante ttl segundos: '<caducidad>.<HMAC-SHA256>'."""
+    expires = int((now if now is not None else time.time()) + min(ttl, MAX_TOKEN_TTL))
+    return f'{expires}.{_signature(secret, expires)}'
+
+
+def valid_token(token: str, secret: str = None, now: Optional[float] = None) -> bool:
+    secret = PROFILE_SECRET if secret is None else secret
+    expires, _, signature = token.partition('.')
+    if not secret or not expires.isdigit():
+        return False
+    now = now if now is not None else time.time()
+    if not now <= int(expires) <= now + MAX_TOKEN_TTL:
+        return False
+    return hmac.compare_digest(signature, _signature(secret, int(expires)))
+
+
+def should_profile(token: Optional[str]) -> bool:
+    if token is not None and valid_token(token):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def begin() -> Optional[cProfile.Profile]:
+    """Empieza a perfilar si no hay otro perfil en curso; None si lo hay."""
+    if not _lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Otro perfilador (un depurador, por ejemplo) ya está activo
+        _lock.release()
+        return None
+    return profiler
+
+
+def finish(profiler: cProfile.Profile, name: str, duration: float, profile_id: str) -> Optional[dict]:
+    """Para el perfil, lo escribe (PROFILE_DIR o log) y devuelve su resumen.
+
+    Un fallo al procesarlo se escribe en el log: nunca llega a la petición perfilada.
+    """
+    try:
+        profiler.disable()
+    finally:
+        _lock.release()
+    try:
+        return _report(profiler, name, duration, profile_id)
+    except Exception as e:
+        print(f"Perfil {profile_id} descartado: {type(e).__name__}: {e}")
+        return None
+
+
+def _report(profiler: cProfile.Profile, name: str, duration: float, profile_id: str) -> dict:
+    stats = _stats(profiler)
+    samples = list(_samples(stats))
+    record = {
+        'profile_id': profile_id,
+        'name': name,
+        'duration_ms': round(duration * 1000, 3),
+        'categories_ms': _categories(samples, duration),
+    }
+    if PROFILE_DIR:
+        record['path'] = _write(profiler, samples, name, profile_id)
+    else:
+        record['speedscope'] = speedscope(samples, name)
+    print(json.dumps({'profile': record}))
+    record.pop('speedscope', None)
+    return record
+
+
+def new_profile_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+# ---------------------------------------------------------------------------
+# PILAS Y REPARTO
+# ---------------------------------------------------------------------------
+
+def _stats(profiler: cProfile.Profile) -> dict:
+    """Grafo de llamadas: graph = {función: [tiempo acumulado, {llamada: tiempo de esas llamadas}]}
+    y roots, las funciones sin llamador dentro del perfil."""
+    profiler.create_stats()
+    graph = {func: [ct, {}] for func, (_, _, _, ct, _) in profiler.stats.items()}
+    for func, (_, _, _, _, callers) in profiler.stats.items():
+        for caller, edge in callers.items():
+            if caller in graph:
+                graph[caller][1][func] = edge[3]
+    roots = [func for func, (_, _, _, _, callers) in profiler.stats.items()
+             if not any(caller in graph for caller in callers)]
+    return {'graph': graph, 'roots': roots}
+
+
+def _samples(stats: dict):
+    """(pila, milisegundos propios) reconstruidos de arriba abajo desde las raíces."""
+    graph = stats['graph']
+    total = sum(graph[root][0] for root in stats['roots'])
+    threshold = total * MIN_NODE_FRACTION
+    pending = [((root,), graph[root][0]) for root in stats['roots']]
+    while pending:
+        stack, weight = pending.pop()
+        func = stack[-1]
+        cumulative, callees = graph[func]
+        children = []
+        if len(stack) < MAX_STACK_DEPTH and cumulative > 0:
+            # Las llamadas recursivas ya están contadas en el tiempo de la función
+            children = [(callee, edge) for callee, edge in callees.items() if callee not in stack]
+            scale = weight / cumulative
+            spent = sum(edge for _, edge in children) * scale
+            if spent > weight:
+                scale *= weight / spent
+            children = [(callee, edge * scale) for callee, edge in children]
+        own = weight - sum(share for _, share in children)
+        if own > 0:
+            yield stack, own * 1000
+        for callee, share in children:
+            if share >= threshold:
+                pending.append((stack + (callee,), share))
+            elif share > 0:
+                yield stack + (callee,), share * 1000
+
+
+def classify(func) -> Optional[str]:
+    filename, _, name = func
+    path = filename.replace('\\', '/')
+    for category, paths, names in CATEGORIES:
+        if filename == '~':
+            if any(fragment in name for fragment in names):
+                return category
+        elif any(fragment in path for fragment in paths):
+            return category
+    return None
+
+
+def _categories(samples, duration: float) -> dict:
+    """Milisegundos por categoría: cuenta la función categorizada más externa de la pila,
+    salvo las conversiones Decimal, que cuentan aparte aunque estén dentro de otra."""
+    totals = dict.fromkeys(CATEGORY_NAMES, 0.0)
+    known = {}
+    for stack, weight in samples:
+        category = None
+        for func in stack:
+            found = known[func] if func in known else known.setdefault(func, classify(func))
+            if found == 'decimal' or (found and category is None):
+                category = found
+        totals[category or 'other'] += weight
+    # Lo que cProfile no ve (lo que rodea al handler) va a other
+    totals['other'] += max(duration * 1000 - sum(totals.values()), 0)
+    return {name: round(value, 3) for name, value in totals.items()}
+
+
+# ---------------------------------------------------------------------------
+# SALIDA
+# ---------------------------------------------------------------------------
+
+def _frame_name(func) -> dict:
+    filename, line, name = func
+    if filename == '~':
+        return {'name': name}
+    return {'name': name, 'file': filename, 'line': line}
+
+
+def speedscope(samples, name: str) -> dict:
+    """Perfil en el formato de speedscope (https://www.speedscope.app/file-format-schema.json)."""
+    frames, index = [], {}
+    stacks, weights = [], []
+    for stack, weight in samples:
+        for func in stack:
+            if func not in index:
+                index[func] = len(frames)
+                frames.append(_frame_name(func))
+        stacks.append([index[func] for func in stack])
+        weights.append(round(weight, 4))
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': round(sum(weights), 4),
+            'samples': stacks,
+            'weights': weights,
+        }],
+        'name': name,
+        'exporter': 'books-api profiling',
+    }
+
+
+def _write(profiler: cProfile.Profile, samples, name: str, profile_id: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    if PROFILE_FORMAT == 'pstats':
+        path = os.path.join(PROFILE_DIR, f'{profile_id}.prof')
+        profiler.dump_stats(path)
+    else:
+        path = os.path.join(PROFILE_DIR, f'{profile_id}.speedscope.json')
+        with open(path, 'w') as f:
+            json.dump(speedscope(samples, name), f)
+    return path
+
+
+# ---------------------------------------------------------------------------
+# LAMBDA
+# ---------------------------------------------------------------------------
+
+def _header(event, name):
+    headers = event.get('headers') if isinstance(event, dict) else None
+    for key, value in (headers or {}).items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+
+def profiled(route):
+    """Decorador para lambda_handler: perfila la invocación si toca (lo aplica instrumented)."""
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            if not should_profile(_header(event, TOKEN_HEADER)):
+                return handler(event, context)
+            profiler = begin()
+            if profiler is None:
+                return handler(event, context)
+            profile_id = getattr(context, 'aws_request_id', None) or new_profile_id()
+            started = time.perf_counter()
+            response = None
+            try:
+                response = handler(event, context)
+                return response
+            finally:
+                finish(profiler, route, time.perf_counter() - started, profile_id)
+                if isinstance(response, dict):
+                    response['headers'] = {**(response.get('headers') or {}), 'X-Profile-Id': profile_id}
+        return wrapper
+    return decorator
+
+
+if __name__ == '__main__':
+    if not PROFILE_SECRET:
+        sys.exit('Defina PROFILE_SECRET, el mismo que usa el servidor')
+    print(profile_token(PROFILE_SECRET, int(sys.argv[1]) if len(sys.argv) > 1 else 300))
@@ -0,0 +1,121 @@
+"""Valoraciones de los usuarios (POST /books/{id}/ratings) con contadores repartidos en shards.
+
+Igual que la versión acoplada (db/ratings.py): rate_book suma cada valoración a
+uno de RATING_SHARDS items "rating#<book_id>#<n>" con un ADD, sin leer ni
+escribir el libro, y el roll-up escribe la media en average_rating (y el total
+en rating_count) solo si hay valoraciones nuevas desde el anterior.
+
+Aquí el roll-up lo hace ratings_rollup, que recibe del stream de la tabla solo
+las escrituras de los shards y recalcula una vez por libro y lote: con la
+ventana de agrupación del mapeo, un título que recibe miles de valoraciones por
+minuto se escribe unas pocas veces por minuto.
+
+RATING_SHARDS debe ser el mismo en rate_book, ratings_rollup y delete_book, y
+solo puede crecer.
+"""
+import os
+import random
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+
+from botocore.exceptions import ClientError
+
+from common.batch import batch_get
+from common.schema import ENTITY_ATTRIBUTE, change_bucket
+
+RATING_SHARDS = int(os.getenv('RATING_SHARDS', '10'))
+MIN_RATING = Decimal(0)
+MAX_RATING = Decimal(5)
+AVERAGE_PRECISION = Decimal('0.01')
+RATING_ENTITY = 'rating'
+
+
+def rating_shard_key(book_id, shard):
+    return {'book_id': f'rating#{book_id}#{shard}'}
+
+
+def rating_shard_keys(book_id):
+    return [rating_shard_key(book_id, shard) for shard in range(RATING_SHARDS)]
+
+
+def parse_rating(data):
+    """Valoración de un cuerpo {"rating": 4.5} ya leído con codec.loads. Lanza ValueError."""
+    value = data.get('rating') if isinstance(data, dict) else None
+    if isinstance(value, bool) or not isinstance(value, (int, Decimal)):
+        raise ValueError('Body must be {"rating": <number>}')
+    rating = Decimal(value)
+    if not rating.is_finite():
+        # NaN o Infinity: compararlos lanza InvalidOperation (un 500) en lugar de rechazarlos
+        raise ValueError('rating must be a finite number')
+    if not MIN_RATING <= rating <= MAX_RATING:
+        raise ValueError(f'rating must be between {MIN_RATING} and {MAX_RATING}')
+    return rating
+
+
+def rating_update(book_id, rating):
+    """Argumentos de update_item que suman una valoración a un shard al azar (lo crea si no existe)."""
+    return {
+        'Key': rating_shard_key(book_id, random.randrange(RATING_SHARDS)),
+        'UpdateExpression': 'ADD #sum :rating, #count :one SET #entity = :entity, #target = :book_id',
+        'ExpressionAttributeNames': {
+            '#sum': 'rating_sum', '#count': 'rating_count', '#entity': ENTITY_ATTRIBUTE, '#target': 'target_id',
+        },
+        'ExpressionAttributeValues': {':rating': rating, ':one': 1, ':entity': RATING_ENTITY, ':book_id': book_id},
+    }
+
+
+def rollup_update(book_id, average, count, updated_at):
+    """Argumentos de update_item que escriben la media en el libro si hay valoraciones nuevas."""
+    return {
+        'Key': {'book_id': book_id},
+        'UpdateExpression': 'SET #rating = :average, #count = :count, #updated_at = :now, #bucket = :bucket '
+                            'ADD #version :one',
+        'ConditionExpression': 'attribute_exists(book_id) AND attribute_not_exists(#entity) '
+                               'AND (attribute_not_exists(#count) OR #count < :count)',
+        'ExpressionAttributeNames': {
+            '#rating': 'average_rating', '#count': 'rating_count', '#updated_at': 'updated_at',
+            '#bucket': 'change_bucket', '#version': 'version', '#entity': ENTITY_ATTRIBUTE,
+        },
+        'ExpressionAttributeValues': {
+            ':average': average, ':count': count, ':now': updated_at, ':bucket': change_bucket(updated_at), ':one': 1,
+        },
+    }
+
+
+def rated_book_ids(records):
+    """Libros con valoraciones nuevas en un lote del stream (solo llegan escrituras de shards)."""
+    book_ids = []
+    for record in records:
+        image = record.get('dynamodb', {}).get('NewImage') or {}
+        if image.get(ENTITY_ATTRIBUTE, {}).get('S') == RATING_ENTITY and 'target_id' in image:
+            book_ids.append(image['target_id']['S'])
+    return list(dict.fromkeys(book_ids))
+
+
+def rollup(dynamodb, table, book_id):
+    """Recalcula la media de un libro. True si la escribió; False si no había nada nuevo o no existe."""
+    shards, unprocessed = batch_get(dynamodb, table.name, rating_shard_keys(book_id), {
+        'ConsistentRead': True, 'ProjectionExpression': 'rating_sum, rating_count',
+    })
+    if unprocessed:
+        # Con un shard sin leer la media saldría mal: se reintenta el lote
+        raise RuntimeError(f'Rating shards of {book_id} not read')
+    count = sum(int(shard.get('rating_count', 0)) for shard in shards)
+    if not count:
+        return False
+    total = sum((Decimal(shard.get('rating_sum', 0)) for shard in shards), Decimal(0))
+    average = (total / count).quantize(AVERAGE_PRECISION, rounding=ROUND_HALF_UP)
+    try:
+        table.update_item(**rollup_update(book_id, average, count, datetime.utcnow().isoformat()))
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return False
+    return True
+
+
+def shard_delete_requests(book_id, old_item):
+    """Borrado de los shards de un libro borrado; solo si llegó a tener valoraciones (rating_count)."""
+    if 'rating_count' not in old_item:
+        return []
+    return [{'DeleteRequest': {'Key': key}} for key in rating_shard_keys(book_id)]
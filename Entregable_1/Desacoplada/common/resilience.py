@@ -0,0 +1,293 @@
+"""Protección frente a la limitación (throttling) de DynamoDB bajo picos de carga.
+
+Misma capa que la versión acoplada (app/resilience.py), instalada en el cliente
+compartido de common/runtime.py y con estado por contenedor:
+
+- Reintentos de botocore en modo "standard" (backoff exponencial con jitter y
+  cuota de reintentos), como mucho DDB_MAX_ATTEMPTS.
+- Un token bucket por operación que solo limita después de un throttle: baja
+  el ritmo a la mitad y lo recupera con los éxitos. DDB_RATE_LIMITS fija techos
+  fijos ("Scan=20,*=500"); una llamada espera como mucho DDB_LIMIT_MAX_WAIT s.
+- Un circuit breaker que tras DDB_BREAKER_THRESHOLD fallos seguidos falla al
+  momento durante DDB_BREAKER_RESET segundos y luego deja pasar una prueba.
+
+Los handlers responden a OverloadedError con overloaded_response (503 con
+Retry-After). Los contadores van en la línea de métricas de cada invocación.
+"""
+import json
+import math
+import os
+import threading
+import time
+
+# Errores de DynamoDB que indican sobrecarga (del lado de la tabla o de la cuenta)
+THROTTLE_CODES = frozenset({
+    'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded',
+})
+
+
+class OverloadedError(Exception):
+    """No se ha llamado (o no se ha podido completar) la llamada a DynamoDB por sobrecarga."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    def retry_after_header(self):
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class CircuitOpenError(OverloadedError):
+    pass
+
+
+class RateLimitedError(OverloadedError):
+    pass
+
+
+class ThrottledError(OverloadedError):
+    pass
+
+
+def parse_rate_limits(value):
+    """"Scan=20,Query=200,*=500" -> {'Scan': 20.0, 'Query': 200.0, '*': 500.0} (llamadas por segundo)."""
+    limits = {}
+    for entry in (value or '').split(','):
+        if not entry.strip():
+            continue
+        operation, _, rate = entry.partition('=')
+        try:
+            limits[operation.strip()] = float(rate)
+        except ValueError:
+            raise ValueError(f"Invalid DDB_RATE_LIMITS entry: {entry!r}") from None
+    return limits
+
+
+class AdaptiveLimiter:
+    """Token bucket de una operación cuyo ritmo baja con cada throttle y se recupera con los éxitos."""
+
+    MIN_RATE = 1.0
+    DECREASE = 0.5
+    # Entre dos bajadas: los throttles de las llamadas que ya estaban en vuelo no cuentan dos veces
+    DECREASE_COOLDOWN = 1.0
+    # Crecimiento del ritmo por segundo mientras no hay throttles
+    RECOVERY = 0.1
+    # Tokens que se pueden acumular, en segundos de ritmo
+    BURST = 1.0
+
+    def __init__(self, ceiling=None):
+        self.ceiling = ceiling
+        self.rate = ceiling
+        self.tokens = self._capacity()
+        self._updated = None
+        self._recover_to = None
+        self._last_decrease = None
+        self._last_increase = None
+        self._window_start = None
+        self._window_count = 0
+        self.measured = None
+        self._lock = threading.Lock()
+
+    def _capacity(self):
+        return max(1.0, self.rate * self.BURST) if self.rate else 0.0
+
+    def _refill(self, now):
+        if self._updated is not None:
+            self.tokens = min(self._capacity(), self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _count(self, now):
+        # Ritmo real de la última ventana de un segundo: de ahí parte la primera bajada
+        if self._window_start is None:
+            self._window_start = now
+        elif now - self._window_start >= 1.0:
+            self.measured = self._window_count / (now - self._window_start)
+            self._window_start, self._window_count = now, 0
+        self._window_count += 1
+
+    def reserve(self, now, max_wait):
+        """Segundos que debe esperar la llamada antes de salir. Lanza RateLimitedError si son más de max_wait."""
+        with self._lock:
+            self._count(now)
+            if self.rate is None:
+                return 0.0
+            self._refill(now)
+            wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+            if wait > max_wait:
+                raise RateLimitedError('DynamoDB rate limit reached', wait)
+            # Los tokens negativos son las llamadas que ya esperan turno
+            self.tokens -= 1
+            return wait
+
+    def on_throttle(self, now):
+        with self._lock:
+            if self._last_decrease is not None and now - self._last_decrease < self.DECREASE_COOLDOWN:
+                return
+            base = self.rate or self.measured or self.MIN_RATE
+            if self.rate is None or self._recover_to is None:
+                self._recover_to = self.ceiling or base
+            self.rate = max(self.MIN_RATE, base * self.DECREASE)
+            self.tokens = min(self.tokens, 0.0)
+            self._updated = now
+            self._last_decrease = self._last_increase = now
+
+    def on_success(self, now):
+        with self._lock:
+            if self._recover_to is None:
+                return
+            self._refill(now)
+            self.rate *= (1 + self.RECOVERY) ** (now - self._last_increase)
+            self._last_increase = now
+            if self.rate >= self._recover_to:
+                # Recuperado: vuelve al techo configurado (o a no limitar)
+                self.rate, self._recover_to = self.ceiling, None
+                self.tokens = min(self.tokens, self._capacity())
+
+
+class CircuitBreaker:
+    """closed -> open tras `threshold` fallos seguidos; open -> half_open pasados `reset_timeout` segundos."""
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_at = None
+        self._lock = threading.Lock()
+
+    def before(self, now):
+        """Deja pasar la llamada (True si es la de prueba) o lanza CircuitOpenError."""
+        with self._lock:
+            if self.state == 'closed':
+                return False
+            if self.state == 'open':
+                remaining = self.reset_timeout - (now - self._opened_at)
+                if remaining > 0:
+                    raise CircuitOpenError('DynamoDB temporarily unavailable', remaining)
+                self.state = 'half_open'
+            elif self._probe_at is not None and now - self._probe_at < self.reset_timeout:
+                # Ya hay una llamada de prueba en vuelo
+                raise CircuitOpenError('DynamoDB temporarily unavailable', self.reset_timeout - (now - self._probe_at))
+            self._probe_at = now
+            return True
+
+    def cancel_probe(self):
+        with self._lock:
+            self._probe_at = None
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self._probe_at = None
+            self.state = 'closed'
+
+    def failure(self, now):
+        with self._lock:
+            self.failures += 1
+            self._probe_at = None
+            if self.state == 'half_open' or self.failures >= self.threshold:
+                self._opened_at = now
+                self.state = 'open'
+
+
+class Resilience:
+    """Limitadores por operación y un circuit breaker para el cliente del contenedor."""
+
+    def __init__(self, limits=None, max_wait=0.5, threshold=5, reset_timeout=10.0, clock=time.monotonic):
+        self.limits = limits or {}
+        self.max_wait = max_wait
+        self.clock = clock
+        self.breaker = CircuitBreaker(threshold, reset_timeout)
+        self.counters = {'retries': 0, 'throttled': 0, 'delayed': 0, 'rate_limited': 0, 'circuit_rejected': 0}
+        self._limiters = {}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            limits=parse_rate_limits(os.getenv('DDB_RATE_LIMITS')),
+            max_wait=float(os.getenv('DDB_LIMIT_MAX_WAIT', '0.5')),
+            threshold=int(os.getenv('DDB_BREAKER_THRESHOLD', '5')),
+            reset_timeout=float(os.getenv('DDB_BREAKER_RESET', '10')),
+        )
+
+    def limiter(self, operation):
+        limiter = self._limiters.get(operation)
+        if limiter is None:
+            limiter = self._limiters[operation] = AdaptiveLimiter(self.limits.get(operation, self.limits.get('*')))
+        return limiter
+
+    def snapshot(self):
+        """Contadores acumulados del contenedor y estado del circuit breaker."""
+        return {**self.counters, 'circuit': self.breaker.state}
+
+    # -- hooks ---------------------------------------------------------------
+
+    def _before_call(self, model, context, **kwargs):
+        now = self.clock()
+        try:
+            context['resilience_probe'] = self.breaker.before(now)
+        except CircuitOpenError:
+            self.counters['circuit_rejected'] += 1
+            raise
+        try:
+            wait = self.limiter(model.name).reserve(now, self.max_wait)
+        except RateLimitedError:
+            if context.pop('resilience_probe'):
+                self.breaker.cancel_probe()
+            self.counters['rate_limited'] += 1
+            raise
+        context['resilience_operation'] = model.name
+        if wait > 0:
+            self.counters['delayed'] += 1
+            time.sleep(wait)
+
+    def _needs_retry(self, response, operation, **kwargs):
+        # Se ve cada intento, también los que botocore reintenta con éxito; no decide nada (devuelve None)
+        if response is not None and response[1].get('Error', {}).get('Code') in THROTTLE_CODES:
+            self.counters['throttled'] += 1
+            self.limiter(operation.name).on_throttle(self.clock())
+
+    def _after_call(self, http_response, parsed, model, context, **kwargs):
+        if 'resilience_operation' not in context:
+            return
+        self.counters['retries'] += parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+        code = parsed.get('Error', {}).get('Code')
+        now = self.clock()
+        if code in THROTTLE_CODES or http_response.status_code >= 500:
+            self.breaker.failure(now)
+        else:
+            self.breaker.success()
+            self.limiter(model.name).on_success(now)
+        if code in THROTTLE_CODES:
+            raise ThrottledError('DynamoDB is throttling requests', self.breaker.reset_timeout
+                                 if self.breaker.state == 'open' else 1.0)
+
+    def _after_call_error(self, exception, context, **kwargs):
+        # Errores de conexión o timeouts ya sin reintentos
+        if 'resilience_operation' in context:
+            self.breaker.failure(self.clock())
+
+    def install(self, client):
+        """Registra los hooks en el cliente de botocore, después de los de common/metrics.py."""
+        events = client.meta.events
+        events.register('before-call.dynamodb', self._before_call, unique_id='resilience-before')
+        events.register('needs-retry.dynamodb', self._needs_retry, unique_id='resilience-retry')
+        events.register('after-call.dynamodb', self._after_call, unique_id='resilience-after')
+        events.register('after-call-error.dynamodb', self._after_call_error, unique_id='resilience-error')
+        return client
+
+
+DYNAMODB = Resilience.from_env()
+
+
+def install_dynamodb(client):
+    return DYNAMODB.install(client)
+
+
+def overloaded_response(e):
+    return {
+        'statusCode': 503,
+        'headers': {'Retry-After': e.retry_after_header()},
+        'body': json.dumps({'error': 'Service overloaded, retry later', 'details': str(e)})
+    }
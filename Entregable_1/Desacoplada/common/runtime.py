@@ -0,0 +1,60 @@
+"""Cliente DynamoDB compartido por todas las lambdas.
+
+El cliente se crea una sola vez por contenedor y se reutiliza en las invocaciones
+en caliente. boto3 se importa de forma diferida para que las peticiones que se
+rechazan antes de tocar la base de datos no paguen su carga en el arranque en frío.
+"""
+import os
+
+from common.metrics import instrument_dynamodb
+from common.resilience import install_dynamodb
+
+_resource = None
+_tables = {}
+
+
+def _env_bool(name, default):
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+
+def get_dynamodb():
+    global _resource
+    if _resource is None:
+        import boto3
+        from botocore.config import Config
+
+        config = Config(
+            max_pool_connections=int(os.getenv('DDB_MAX_POOL_CONNECTIONS', '10')),
+            connect_timeout=float(os.getenv('DDB_CONNECT_TIMEOUT', '2')),
+            read_timeout=float(os.getenv('DDB_READ_TIMEOUT', '5')),
+            tcp_keepalive=_env_bool('DDB_TCP_KEEPALIVE', 'true'),
+            retries={
+                'max_attempts': int(os.getenv('DDB_MAX_ATTEMPTS', '3')),
+                'mode': 'standard',
+            },
+        )
+        _resource = boto3.resource(
+            'dynamodb',
+            region_name=os.getenv('AWS_REGION', 'us-east-1'),
+            endpoint_url=os.getenv('DYNAMODB_ENDPOINT_URL') or None,
+            config=config,
+        )
+        instrument_dynamodb(_resource.meta.client)
+        # Limitador y circuit breaker (common/resilience.py), después de las métricas
+        install_dynamodb(_resource.meta.client)
+    return _resource
+
+
+def get_table(table_name=None):
+    table_name = table_name or os.getenv('DB_DYNAMONAME', 'books-table')
+    table = _tables.get(table_name)
+    if table is None:
+        table = _tables[table_name] = get_dynamodb().Table(table_name)
+    return table
+
+
+def reset():
+    """Descarta el cliente cacheado (tests y benchmarks)."""
+    global _resource
+    _resource = None
+    _tables.clear()
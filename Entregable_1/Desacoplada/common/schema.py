@@ -0,0 +1,340 @@
+"""Atributos e items auxiliares que alimentan los índices secundarios de la tabla."""
+import heapq
+import os
+import zlib
+from decimal import Decimal
+
+from common.convert import decode_cursor, encode_cursor
+
+from common.search import term_weights
+
+# Índice por valoración: average_rating ordenado dentro de cada partición "catalog". Los libros se
+# reparten por hash de book_id entre CATALOG_SHARDS particiones ("books#<n>") y sort=rating mezcla
+# las N consultas: una sola partición admite unas 1000 escrituras/s y al saturarse frena también las
+# escrituras de la tabla. Debe ser el mismo en post_book, put_book, batch_write_book y gets_book;
+# cambiarlo exige `python bulk.py reindex` (versión acoplada) sobre la tabla
+RATING_INDEX = 'rating-index'
+CATALOG_PARTITION = 'books'
+CATALOG_SHARDS = int(os.getenv('CATALOG_SHARDS', '8'))
+
+# Índice por género: por cada género de un libro se escribe un item auxiliar
+# ("genre#<género>#<book_id>") con genre_key/target_id, indexado por genre-index
+GENRE_INDEX = 'genre-index'
+
+# Índice de búsqueda: por cada término de title/description un item auxiliar
+# ("term#<término>#<book_id>") con term_key/target_id y su peso, indexado por term-index
+TERM_INDEX = 'term-index'
+
+# Los items auxiliares llevan "entity" y no son libros
+ENTITY_ATTRIBUTE = 'entity'
+BOOK_FILTER = 'attribute_not_exists(#entity)'
+BOOK_FILTER_NAMES = {'#entity': ENTITY_ATTRIBUTE}
+
+# Sincronización incremental (ver common/changes.py): día de updated_at, indexado por changes-index
+CHANGE_BUCKET_LENGTH = len('YYYY-MM-DD')
+# Atributo TTL de la tabla; solo lo llevan los tombstones de los libros borrados
+TTL_ATTRIBUTE = 'expires_at'
+
+INDEX_ATTRIBUTES = ('catalog', 'change_bucket')
+
+# Campos de un libro que reemplaza PUT; los que falten en el cuerpo se borran
+BOOK_FIELDS = ('title', 'description', 'genre', 'status', 'stock', 'average_rating')
+# Atributos que el cliente no puede escribir en una actualización
+PROTECTED_ATTRIBUTES = ('book_id', 'created_at', 'version', 'rating_count', ENTITY_ATTRIBUTE, TTL_ATTRIBUTE)
+
+# Campos que admite fields= en las lecturas; book_id se devuelve siempre
+PUBLIC_FIELDS = ('book_id',) + BOOK_FIELDS + ('created_at', 'updated_at', 'version')
+# Lo que necesitan siempre el ETag y el filtro de items auxiliares aunque no se pida
+PROJECTION_KEYS = ('book_id', 'updated_at', 'version', ENTITY_ATTRIBUTE)
+
+
+def change_bucket(updated_at):
+    return updated_at[:CHANGE_BUCKET_LENGTH]
+
+
+def catalog_partition(book_id):
+    return f'{CATALOG_PARTITION}#{zlib.crc32(book_id.encode("utf-8")) % CATALOG_SHARDS}'
+
+
+def catalog_partitions():
+    return [f'{CATALOG_PARTITION}#{shard}' for shard in range(CATALOG_SHARDS)]
+
+
+def rating_cursor_state(cursor):
+    """Clave de inicio de cada partición de rating-index; las ya agotadas no aparecen."""
+    if not cursor:
+        return {partition: None for partition in catalog_partitions()}
+    state = decode_cursor(cursor).get('catalog')
+    partitions = catalog_partitions()
+    # El cursor llega del cliente: solo particiones existentes y claves con la forma de rating-index
+    if not isinstance(state, dict) or not all(
+        partition in partitions and (key is None or is_rating_index_key(key, partition))
+        for partition, key in state.items()
+    ):
+        raise ValueError('Invalid cursor')
+    return state
+
+
+def is_rating_index_key(key, partition):
+    """Si key es una clave de inicio de rating-index de esa partición."""
+    return (
+        isinstance(key, dict) and set(key) == {'book_id', 'catalog', 'average_rating'}
+        and key['catalog'] == partition and isinstance(key['book_id'], str)
+        and isinstance(key['average_rating'], (int, Decimal)) and not isinstance(key['average_rating'], bool)
+    )
+
+
+def merge_rating_pages(pages, limit, descending):
+    """Mezcla las páginas de cada partición de rating-index: {partición: (inicio, items, LastEvaluatedKey)}.
+
+    Cada página trae hasta limit items ordenados, así que los limit primeros del total están
+    entre ellos. Devuelve esos items y el cursor con el último consumido de cada partición.
+    """
+    streams = [[(item['average_rating'], partition, item) for item in items]
+               for partition, (_, items, _) in pages.items()]
+    taken = list(heapq.merge(*streams, key=lambda entry: entry[0], reverse=descending))[:limit]
+    consumed, last = {}, {}
+    for _, partition, item in taken:
+        consumed[partition] = consumed.get(partition, 0) + 1
+        last[partition] = item
+    state = {}
+    for partition, (start_key, items, last_key) in pages.items():
+        if consumed.get(partition, 0) < len(items):
+            state[partition] = (
+                {'book_id': last[partition]['book_id'], 'catalog': partition,
+                 'average_rating': last[partition]['average_rating']}
+                if partition in last else start_key
+            )
+        elif last_key:
+            state[partition] = last_key
+    return [item for _, _, item in taken], encode_cursor({'catalog': state}) if state else None
+
+
+def catalog_cursor_state(cursor):
+    """(partición de rating-index, clave de inicio) por la que va el listado sin orden."""
+    if not cursor:
+        return 0, None
+    state = decode_cursor(cursor)
+    if not isinstance(state.get('partition'), int) or not isinstance(state.get('key'), (dict, type(None))):
+        raise ValueError('Invalid cursor')
+    return state['partition'], state['key']
+
+
+def catalog_cursor(position, start_key):
+    if position >= CATALOG_SHARDS:
+        return None
+    return encode_cursor({'partition': position, 'key': start_key})
+
+
+def add_index_attributes(item, book_id=None):
+    item['catalog'] = catalog_partition(book_id or item['book_id'])
+    item['change_bucket'] = change_bucket(item['updated_at'])
+    # Igual que el modelo Book de la versión acoplada: sin valoración cuenta como 0
+    item.setdefault('average_rating', Decimal('0'))
+    # Un libro con TTL desaparecería de la tabla
+    item.pop(TTL_ATTRIBUTE, None)
+    return item
+
+
+def replace_update(book_id, body, expected_version=None):
+    """Argumentos de update_item para PUT: reemplaza los campos del libro en un solo viaje.
+
+    Conserva created_at sin leer el libro, incrementa version, falla si el libro
+    no existe (no lo crea) y, con expected_version (If-Match), si ya no está en
+    esa versión. Los libros anteriores a version cuentan como versión 0.
+
+    average_rating no se borra nunca (es la clave de orden de rating-index) y la
+    del cliente solo se escribe en libros sin valoraciones: en los demás es del
+    roll-up y quien llama repite la actualización sin ella.
+    """
+    updates = {k: v for k, v in body.items() if k not in PROTECTED_ATTRIBUTES}
+    names = {'#version': 'version', '#entity': ENTITY_ATTRIBUTE}
+    values = {':zero': 0, ':one': 1}
+    assignments = ['#version = if_not_exists(#version, :zero) + :one']
+    for i, (key, value) in enumerate(updates.items()):
+        names[f'#a{i}'] = key
+        values[f':v{i}'] = value
+        assignments.append(f'#a{i} = :v{i}')
+    removed = [field for field in BOOK_FIELDS if field not in updates and field != 'average_rating']
+    for i, field in enumerate(removed):
+        names[f'#r{i}'] = field
+    expression = 'SET ' + ', '.join(assignments)
+    if removed:
+        expression += ' REMOVE ' + ', '.join(f'#r{i}' for i in range(len(removed)))
+
+    condition = 'attribute_exists(book_id) AND attribute_not_exists(#entity)'
+    if 'average_rating' in updates:
+        names['#rating_count'] = 'rating_count'
+        condition += ' AND attribute_not_exists(#rating_count)'
+    if expected_version is not None:
+        values[':expected'] = expected_version
+        if expected_version == 0:
+            condition += ' AND (attribute_not_exists(#version) OR #version = :expected)'
+        else:
+            condition += ' AND #version = :expected'
+    return {
+        'Key': {'book_id': book_id},
+        'UpdateExpression': expression,
+        'ConditionExpression': condition,
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values,
+        'ReturnValues': 'ALL_OLD',  # Los géneros anteriores, para corregir el índice
+    }
+
+
+# Préstamo (POST /books/{id}/borrow): primero "quedan más copias" (status no cambia) y luego
+# "es la última" (pasa a borrowed en la misma escritura); si no, una lectura decide
+BORROW_STEPS = (('>', None), ('=', 'borrowed'))
+# Vueltas a BORROW_STEPS si entre las condiciones y la lectura el stock cambia cada vez
+STOCK_ATTEMPTS = 3
+
+
+def stock_update(book_id, delta, updated_at, stock_condition=None, status=None):
+    """Argumentos de update_item de un préstamo o devolución: ADD delta a stock sin leer el libro.
+
+    stock_condition compara el stock actual con 1 ('>' o '=') antes de sumar; status
+    se escribe en la misma operación. Incrementa version y falla si el libro no existe.
+    """
+    names = {
+        '#stock': 'stock', '#version': 'version', '#updated_at': 'updated_at', '#bucket': 'change_bucket',
+        '#entity': ENTITY_ATTRIBUTE,
+    }
+    values = {':delta': delta, ':one': 1, ':now': updated_at, ':bucket': change_bucket(updated_at)}
+    expression = 'ADD #stock :delta, #version :one SET #updated_at = :now, #bucket = :bucket'
+    if status is not None:
+        names['#status'] = 'status'
+        values[':status'] = status
+        expression += ', #status = :status'
+    condition = 'attribute_exists(book_id) AND attribute_not_exists(#entity)'
+    if stock_condition is not None:
+        condition += f' AND #stock {stock_condition} :one'
+    return {
+        'Key': {'book_id': book_id},
+        'UpdateExpression': expression,
+        'ConditionExpression': condition,
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values,
+        'ReturnValues': 'ALL_NEW',  # El libro resultante es la respuesta; las estadísticas salen del stream
+    }
+
+
+def parse_fields(value):
+    """fields=title,stock -> ('title', 'stock'); None si no se pide una lectura parcial."""
+    if value is None:
+        return None
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    if not fields:
+        raise ValueError('fields cannot be empty')
+    unknown = [field for field in fields if field not in PUBLIC_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(PUBLIC_FIELDS)}")
+    return fields
+
+
+def projection(fields, *extra, names=None):
+    """ProjectionExpression (con nombres de atributo sustituidos) para leer solo esos campos.
+
+    Devuelve kwargs para get_item/query/scan/batch_get_item; vacío si fields es None.
+    names son los ExpressionAttributeNames que ya usa la llamada y se conservan.
+    """
+    if not fields:
+        return {'ExpressionAttributeNames': names} if names else {}
+    attributes = dict.fromkeys((*PROJECTION_KEYS, *fields, *extra))
+    placeholders = {f'#p{i}': attribute for i, attribute in enumerate(attributes)}
+    return {
+        'ProjectionExpression': ', '.join(placeholders),
+        'ExpressionAttributeNames': {**(names or {}), **placeholders},
+    }
+
+
+def to_public(item, fields=None):
+    """Quita del item los atributos internos antes de devolverlo al cliente.
+
+    Con fields se queda con book_id y esos campos, en ese orden (null si no existen).
+    """
+    if fields:
+        return {'book_id': item['book_id'], **{field: item.get(field) for field in fields}}
+    return {k: v for k, v in item.items() if k not in INDEX_ATTRIBUTES}
+
+
+def is_book_item(item):
+    return ENTITY_ATTRIBUTE not in item
+
+
+def book_genres(item):
+    genres = item.get('genre')
+    if not isinstance(genres, list):
+        return []
+    return [genre for genre in genres if isinstance(genre, str) and genre]
+
+
+def genre_item_key(book_id, genre):
+    return {'book_id': f'genre#{genre}#{book_id}'}
+
+
+def genre_items(book_id, genres):
+    """Items auxiliares que apuntan a un libro desde cada uno de sus géneros."""
+    return [
+        {**genre_item_key(book_id, genre), ENTITY_ATTRIBUTE: 'genre', 'genre_key': genre, 'target_id': book_id}
+        for genre in dict.fromkeys(genres)
+    ]
+
+
+def genre_index_requests(book_id, old_genres, new_genres):
+    """Peticiones de BatchWriteItem que llevan el índice por género de old_genres a new_genres."""
+    requests = [
+        {'DeleteRequest': {'Key': genre_item_key(book_id, genre)}}
+        for genre in set(old_genres) - set(new_genres)
+    ]
+    requests += [
+        {'PutRequest': {'Item': item}}
+        for item in genre_items(book_id, [genre for genre in new_genres if genre not in old_genres])
+    ]
+    return requests
+
+
+def book_terms(item):
+    return term_weights(item.get('title'), item.get('description'))
+
+
+def term_item_key(book_id, term):
+    return {'book_id': f'term#{term}#{book_id}'}
+
+
+def term_items(book_id, weights):
+    """Items auxiliares que apuntan a un libro desde cada término de su título y descripción."""
+    return [
+        {**term_item_key(book_id, term), ENTITY_ATTRIBUTE: 'term', 'term_key': term, 'target_id': book_id,
+         'weight': weight}
+        for term, weight in weights.items()
+    ]
+
+
+def term_index_requests(book_id, old_terms, new_terms):
+    """Peticiones de BatchWriteItem que llevan el índice de búsqueda de old_terms a new_terms."""
+    requests = [
+        {'DeleteRequest': {'Key': term_item_key(book_id, term)}}
+        for term in old_terms if term not in new_terms
+    ]
+    requests += [
+        {'PutRequest': {'Item': item}}
+        for item in term_items(book_id, {t: w for t, w in new_terms.items() if old_terms.get(t) != w})
+    ]
+    return requests
+
+
+def index_items(book_id, item):
+    """Items auxiliares de un libro nuevo: sus géneros y sus términos."""
+    return [*genre_items(book_id, book_genres(item)), *term_items(book_id, book_terms(item))]
+
+
+def index_requests(book_id, old_item, new_item):
+    """Peticiones que llevan los índices auxiliares (género y búsqueda) del item old_item al new_item.
+
+    Cualquiera de los dos puede ser None (alta o borrado).
+    """
+    old_item, new_item = old_item or {}, new_item or {}
+    return (
+        genre_index_requests(book_id, book_genres(old_item), book_genres(new_item))
+        + term_index_requests(book_id, book_terms(old_item), book_terms(new_item))
+    )
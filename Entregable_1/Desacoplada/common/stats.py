@@ -0,0 +1,120 @@
+"""Estadísticas del catálogo mantenidas por incrementos (GET /books/stats).
+
+Mismos contadores que la versión acoplada (db/stats.py), en atributos "stat:..."
+del item meta#catalog. Aquí no los suma cada lambda de escritura: stats_stream
+recibe del stream de la tabla la imagen anterior y la nueva de cada libro
+escrito y aplica las diferencias, así que las escrituras no pagan nada extra y
+leer el resumen es un solo get_item.
+
+El stream entrega cada registro al menos una vez. stats_stream suma cada lote
+en un solo update_item, así que un lote nunca queda aplicado a medias, pero si
+se reintenta después de aplicarse se cuenta dos veces y los contadores se
+desvían. Se recalculan con el scan de Acoplada/app/bulk.py (rebuild-stats
+--table ...), que escribe en ese mismo item. benchmarks/stats_replay.py
+comprueba ambas cosas.
+"""
+from decimal import Decimal
+
+from boto3.dynamodb.types import TypeDeserializer
+
+from common.schema import ENTITY_ATTRIBUTE, is_book_item
+
+STAT_PREFIX = 'stat:'
+STATS_KEY = {'book_id': 'meta#catalog'}
+RATING_PRECISION = Decimal('0.01')
+
+_deserializer = TypeDeserializer()
+
+
+def _number(value):
+    try:
+        return Decimal(str(value)) if value is not None else Decimal(0)
+    except ArithmeticError:
+        return Decimal(0)
+
+
+def book_counters(item):
+    """Lo que aporta un libro a cada contador (vacío si no hay libro)."""
+    if item is None:
+        return {}
+    counters = {
+        'books': Decimal(1),
+        'stock': _number(item.get('stock')),
+        'rating_sum': _number(item.get('average_rating')),
+    }
+    counters[f"status:{item.get('status') or 'available'}"] = Decimal(1)
+    genres = item.get('genre')
+    for genre in dict.fromkeys(genres if isinstance(genres, list) else []):
+        counters[f'genre:{genre}'] = Decimal(1)
+    return counters
+
+
+def stats_delta(old, new):
+    """Cambio en los contadores al pasar del item old al new (None: alta o borrado). Sin ceros."""
+    delta = dict(book_counters(new))
+    for name, value in book_counters(old).items():
+        delta[name] = delta.get(name, Decimal(0)) - value
+    return {name: value for name, value in delta.items() if value}
+
+
+def merge(deltas):
+    total = {}
+    for delta in deltas:
+        for name, value in delta.items():
+            total[name] = total.get(name, Decimal(0)) + value
+    return {name: value for name, value in total.items() if value}
+
+
+def _image(record, name):
+    image = record.get('dynamodb', {}).get(name)
+    if not image:
+        return None
+    item = {key: _deserializer.deserialize(value) for key, value in image.items()}
+    return item if is_book_item(item) else None
+
+
+def record_delta(record):
+    """Diferencia que aporta un registro del stream (INSERT, MODIFY o REMOVE).
+
+    Los items auxiliares (índices, meta#catalog) llevan "entity" y no cuentan.
+    """
+    old, new = _image(record, 'OldImage'), _image(record, 'NewImage')
+    if old is None and new is None:
+        return {}
+    return stats_delta(old, new)
+
+
+def add_update(delta):
+    """Argumentos de update_item que suman delta a los contadores de meta#catalog."""
+    names = {f'#s{i}': STAT_PREFIX + name for i, name in enumerate(delta)}
+    values = {f':s{i}': value for i, value in enumerate(delta.values())}
+    return {
+        'Key': STATS_KEY,
+        'UpdateExpression': 'ADD ' + ', '.join(f'#s{i} :s{i}' for i in range(len(delta))) + ' SET #entity = :meta',
+        'ExpressionAttributeNames': {'#entity': ENTITY_ATTRIBUTE, **names},
+        'ExpressionAttributeValues': {':meta': 'meta', **values},
+    }
+
+
+def stats_response(item):
+    """Cuerpo de GET /books/stats a partir de los contadores del item meta#catalog."""
+    counters = {
+        name[len(STAT_PREFIX):]: _number(value)
+        for name, value in (item or {}).items() if name.startswith(STAT_PREFIX)
+    }
+    books = int(counters.get('books', 0))
+    average = counters.get('rating_sum', Decimal(0)) / books if books else Decimal(0)
+
+    def group(prefix):
+        return {
+            name[len(prefix):]: int(value)
+            for name, value in sorted(counters.items()) if name.startswith(prefix) and value
+        }
+
+    return {
+        'books': books,
+        'stock': int(counters.get('stock', 0)),
+        'status': group('status:'),
+        'genres': group('genre:'),
+        'average_rating': str(average.quantize(RATING_PRECISION)),
+    }
@@ -1,12 +1,17 @@
 import json
-import boto3
-import os
+from datetime import datetime
 from botocore.exceptions import ClientError
+from common.runtime import get_table, get_dynamodb
+from common.schema import index_requests
+from common.changes import tombstone_put
+from common.batch import batch_write
+from common.ratings import shard_delete_requests
+from common.metrics import instrumented
+from common.resilience import OverloadedError, overloaded_response
 
+@instrumented('DELETE /books/{book_id}')
 def lambda_handler(event, context):
-    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-    table_name = os.getenv('DB_DYNAMONAME', 'books-table')
-    table = dynamodb.Table(table_name)
+    table = get_table()
     
     try:
         # Obtener book_id de los path parameters
@@ -18,17 +23,29 @@ def lambda_handler(event, context):
                 'body': json.dumps({'error': 'book_id is required'})
             }
         
-        # Eliminar el libro
-        response = table.delete_item(
-            Key={'book_id': book_id},
-            ReturnValues='ALL_OLD'
-        )
+        # Reemplazar el libro por su tombstone (nunca un item auxiliar de los índices):
+        # GET /books/changes ve el borrado hasta que caduca su TTL
+        try:
+            response = table.put_item(**tombstone_put(book_id, datetime.utcnow()))
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            response = {}
         
         if 'Attributes' not in response:
             return {
                 'statusCode': 404,
                 'body': json.dumps({'error': 'Book not found'})
             }
+
+        # Quitar sus entradas de los índices por género y de búsqueda, y sus shards de valoraciones
+        requests = index_requests(book_id, response['Attributes'], None)
+        requests += shard_delete_requests(book_id, response['Attributes'])
+        if requests and batch_write(get_dynamodb(), table.name, requests):
+            return {
+                'statusCode': 503,
+                'body': json.dumps({'error': 'Indexes not updated, retry'})
+            }
         
         return {
             'statusCode': 200,
@@ -38,6 +55,8 @@ def lambda_handler(event, context):
             })
         }
         
+    except OverloadedError as e:
+        return overloaded_response(e)
     except ClientError as e:
         return {
             'statusCode': 500,
@@ -1,23 +1,15 @@
 import json
-import boto3
-import os
-from decimal import Decimal
 from botocore.exceptions import ClientError
+from common.runtime import get_table
+from common.codec import dumps
+from common.schema import is_book_item, parse_fields, projection, to_public
+from common.metrics import instrumented
+from common.resilience import OverloadedError, overloaded_response
+from common.http_cache import cache_headers, etag_matches, item_etag, not_modified
 
-# Helper para convertir Decimal a float
-def decimal_to_float(obj):
-    if isinstance(obj, Decimal):
-        return float(obj)
-    elif isinstance(obj, dict):
-        return {k: decimal_to_float(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [decimal_to_float(i) for i in obj]
-    return obj
-
+@instrumented('GET /books/{book_id}')
 def lambda_handler(event, context):
-    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-    table_name = os.getenv('DB_DYNAMONAME', 'books-table')
-    table = dynamodb.Table(table_name)
+    table = get_table()
     
     try:
         # Obtener book_id de los path parameters
@@ -29,22 +21,36 @@ def lambda_handler(event, context):
                 'body': json.dumps({'error': 'book_id is required'})
             }
         
-        # Obtener el libro
-        response = table.get_item(Key={'book_id': book_id})
+        try:
+            fields = parse_fields((event.get('queryStringParameters') or {}).get('fields'))
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': str(e)})
+            }
+        
+        # Obtener el libro (solo los atributos pedidos si llega fields)
+        response = table.get_item(Key={'book_id': book_id}, **projection(fields))
         
-        if 'Item' not in response:
+        if 'Item' not in response or not is_book_item(response['Item']):
             return {
                 'statusCode': 404,
                 'body': json.dumps({'error': 'Book not found'})
             }
         
-        book = decimal_to_float(response['Item'])
+        book = to_public(response['Item'], fields)
+        etag = item_etag(response['Item'], fields)
+        if etag_matches(event, etag):
+            return not_modified(etag)
         
         return {
             'statusCode': 200,
-            'body': json.dumps(book)
+            'headers': cache_headers(etag),
+            'body': dumps(book)
         }
         
+    except OverloadedError as e:
+        return overloaded_response(e)
     except ClientError as e:
         return {
             'statusCode': 500,
@@ -1,43 +1,139 @@
 import json
-import boto3
-import os
-from decimal import Decimal
 from botocore.exceptions import ClientError
+from common.runtime import get_table, get_dynamodb
+from common.codec import dumps
+from common.convert import encode_cursor, decode_cursor
+from common.schema import (
+    GENRE_INDEX, RATING_INDEX, book_genres, catalog_cursor, catalog_cursor_state, catalog_partitions,
+    merge_rating_pages, parse_fields, projection, rating_cursor_state, to_public
+)
+from common.batch import batch_get
+from common.metrics import instrumented
+from common.resilience import OverloadedError, overloaded_response
+from common.http_cache import cache_headers, etag_matches, not_modified, page_etag
 
-def decimal_to_float(obj):
-    if isinstance(obj, Decimal):
-        return float(obj)
-    elif isinstance(obj, dict):
-        return {k: decimal_to_float(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [decimal_to_float(i) for i in obj]
-    return obj
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
 
+def parse_limit(value):
+    if value is None:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be greater than 0')
+    return min(limit, MAX_LIMIT)
+
+@instrumented('GET /books')
 def lambda_handler(event, context):
-    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-    table_name = os.getenv('DB_DYNAMONAME', 'books-table')
-    table = dynamodb.Table(table_name)
-    
+    table = get_table()
+
     try:
-        # Obtener todos los libros
-        response = table.scan()
-        books = [decimal_to_float(item) for item in response.get('Items', [])]
-        
-        # Ordenar por average_rating (si existe)
-        books_sorted = sorted(
-            books, 
-            key=lambda x: x.get('average_rating', 0), 
-            reverse=True
-        )
-        
+        params = event.get('queryStringParameters') or {}
+        try:
+            limit = parse_limit(params.get('limit'))
+            sort = params.get('sort')
+            order = params.get('order', 'desc')
+            genre = params.get('genre')
+            fields = parse_fields(params.get('fields'))
+            if sort not in (None, 'rating'):
+                raise ValueError('Only sort=rating is supported')
+            if genre is not None and sort is not None:
+                raise ValueError('genre cannot be combined with sort')
+            if order not in ('asc', 'desc'):
+                raise ValueError("order must be 'asc' or 'desc'")
+            # sort=rating lleva en el cursor la posición en cada partición de rating-index y
+            # el listado sin orden la partición por la que va
+            rating_state = rating_cursor_state(params.get('cursor')) if sort == 'rating' else None
+            catalog_state = catalog_cursor_state(params.get('cursor')) if sort is None and genre is None else None
+            start_key = decode_cursor(params.get('cursor')) if genre is not None else None
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': str(e)})
+            }
+
+        # Una sola página por invocación: API Gateway (proxy) no admite respuestas en streaming,
+        # así que el cliente sigue next_cursor para recorrer el catálogo completo
+        if sort == 'rating':
+            # Query sobre el índice ordenado: lee solo los N primeros de cada partición, no toda la tabla
+            pages = {}
+            for partition, partition_key in rating_state.items():
+                query_kwargs = {'Limit': limit}
+                if partition_key:
+                    query_kwargs['ExclusiveStartKey'] = partition_key
+                response = table.query(
+                    IndexName=RATING_INDEX,
+                    KeyConditionExpression='#catalog = :catalog',
+                    ExpressionAttributeValues={':catalog': partition},
+                    ScanIndexForward=order == 'asc',
+                    **projection(fields, 'catalog', 'average_rating', names={'#catalog': 'catalog'}),
+                    **query_kwargs
+                )
+                pages[partition] = (partition_key, response.get('Items', []), response.get('LastEvaluatedKey'))
+            items, next_cursor = merge_rating_pages(pages, limit, order == 'desc')
+        elif genre is not None:
+            # Entradas del índice por género y después los libros con un BatchGetItem
+            request_kwargs = {'Limit': limit}
+            if start_key:
+                request_kwargs['ExclusiveStartKey'] = start_key
+            response = table.query(
+                IndexName=GENRE_INDEX,
+                KeyConditionExpression='genre_key = :genre',
+                ExpressionAttributeValues={':genre': genre},
+                **request_kwargs
+            )
+            book_ids = [item['target_id'] for item in response.get('Items', [])]
+            found, _ = batch_get(get_dynamodb(), table.name, [{'book_id': book_id} for book_id in book_ids],
+                                 projection(fields, 'genre'))
+            by_id = {item['book_id']: item for item in found}
+            # Se descartan entradas que apunten a libros borrados o que ya no tengan ese género
+            items = [
+                by_id[book_id] for book_id in book_ids
+                if book_id in by_id and genre in book_genres(by_id[book_id])
+            ]
+            next_cursor = encode_cursor(response.get('LastEvaluatedKey'))
+        else:
+            # Las particiones de rating-index una tras otra: solo tienen libros, así que cada consulta
+            # devuelve lo que se le pide (un Scan leía también los items auxiliares y dejaba páginas vacías)
+            partitions = catalog_partitions()
+            position, partition_key = catalog_state
+            items = []
+            while position < len(partitions) and len(items) < limit:
+                query_kwargs = {'Limit': limit - len(items)}
+                if partition_key:
+                    query_kwargs['ExclusiveStartKey'] = partition_key
+                response = table.query(
+                    IndexName=RATING_INDEX,
+                    KeyConditionExpression='#catalog = :catalog',
+                    ExpressionAttributeValues={':catalog': partitions[position]},
+                    **projection(fields, names={'#catalog': 'catalog'}),
+                    **query_kwargs
+                )
+                items.extend(response.get('Items', []))
+                partition_key = response.get('LastEvaluatedKey')
+                if partition_key is None:
+                    position += 1
+            next_cursor = catalog_cursor(position, partition_key)
+        books = [to_public(item, fields) for item in items]
+        etag = page_etag(items, next_cursor, fields)
+        if etag_matches(event, etag):
+            return not_modified(etag)
+
         return {
             'statusCode': 200,
-            'body': json.dumps({
-                'count': len(books_sorted),
-                'books': books_sorted
+            'headers': cache_headers(etag),
+            'body': dumps({
+                'count': len(books),
+                'books': books,
+                'next_cursor': next_cursor
             })
         }
-        
+
+    except OverloadedError as e:
+        return overloaded_response(e)
     except ClientError as e:
         return {
             'statusCode': 500,
@@ -47,4 +143,4 @@ def lambda_handler(event, context):
         return {
             'statusCode': 500,
             'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+        }
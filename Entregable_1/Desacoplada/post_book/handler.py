@@ -1,34 +1,26 @@
 import json
-import boto3
-import os
-from decimal import Decimal
 from datetime import datetime
 import uuid
 from botocore.exceptions import ClientError
+from common.runtime import get_table, get_dynamodb
+from common.codec import loads
+from common.schema import add_index_attributes, index_items
+from common.batch import batch_write
+from common.metrics import instrumented
+from common.resilience import OverloadedError, overloaded_response
 
-def convert_to_decimal(obj):
-    if isinstance(obj, float):
-        return Decimal(str(obj))
-    elif isinstance(obj, list):
-        return [convert_to_decimal(i) for i in obj]
-    elif isinstance(obj, dict):
-        return {k: convert_to_decimal(v) for k, v in obj.items()}
-    else:
-        return obj
-
+@instrumented('POST /books')
 def lambda_handler(event, context):
-    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-    table_name = os.getenv('DB_DYNAMONAME', 'books-table')
-    table = dynamodb.Table(table_name)
+    table = get_table()
     
     try:
         # Parsear el body
-        body = json.loads(event.get('body', '{}'))
+        body = loads(event.get('body', '{}'))
         
         # Validar que tenga al menos 3 atributos válidos
         non_empty_fields = {
             k: v for k, v in body.items()
-            if v not in (None, "", [], {}) and k not in ("book_id", "created_at", "updated_at")
+            if v not in (None, "", [], {}) and k not in ("book_id", "created_at", "updated_at", "version")
         }
         
         if len(non_empty_fields) < 3:
@@ -46,12 +38,18 @@ def lambda_handler(event, context):
         body['book_id'] = book_id
         body['created_at'] = timestamp
         body['updated_at'] = timestamp
+        body['version'] = 0
         
-        # Convertir floats a Decimal para DynamoDB
-        item_dict = convert_to_decimal(body)
+        # loads ya deja los floats como Decimal para DynamoDB
+        item_dict = add_index_attributes(body)
         
-        # Guardar en DynamoDB
-        table.put_item(Item=item_dict)
+        # Guardar el libro y sus entradas de los índices por género y de búsqueda (BatchWriteItem de 25)
+        requests = [{'PutRequest': {'Item': item}} for item in [item_dict, *index_items(book_id, body)]]
+        if batch_write(get_dynamodb(), table.name, requests):
+            return {
+                'statusCode': 503,
+                'body': json.dumps({'error': 'Not processed, retry'})
+            }
         
         return {
             'statusCode': 201,
@@ -66,6 +64,8 @@ def lambda_handler(event, context):
             'statusCode': 400,
             'body': json.dumps({'error': 'Invalid JSON in request body'})
         }
+    except OverloadedError as e:
+        return overloaded_response(e)
     except ClientError as e:
         return {
             'statusCode': 500,
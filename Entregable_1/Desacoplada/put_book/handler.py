@@ -1,24 +1,17 @@
 import json
-import boto3
-import os
-from decimal import Decimal
 from datetime import datetime
 from botocore.exceptions import ClientError
+from common.runtime import get_table, get_dynamodb
+from common.codec import loads
+from common.schema import add_index_attributes, index_requests, is_book_item, replace_update
+from common.batch import batch_write
+from common.metrics import instrumented
+from common.resilience import OverloadedError, overloaded_response
+from common.http_cache import cache_headers, if_match_version, item_etag
 
-def convert_to_decimal(obj):
-    if isinstance(obj, float):
-        return Decimal(str(obj))
-    elif isinstance(obj, list):
-        return [convert_to_decimal(i) for i in obj]
-    elif isinstance(obj, dict):
-        return {k: convert_to_decimal(v) for k, v in obj.items()}
-    else:
-        return obj
-
+@instrumented('PUT /books/{book_id}')
 def lambda_handler(event, context):
-    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-    table_name = os.getenv('DB_DYNAMONAME', 'BooksLambdaTable')
-    table = dynamodb.Table(table_name)
+    table = get_table()
     
     try:
         # Obtener book_id de los path parameters
@@ -30,36 +23,73 @@ def lambda_handler(event, context):
                 'body': json.dumps({'error': 'book_id is required'})
             }
         
-        # Verificar que el libro existe
-        existing = table.get_item(Key={'book_id': book_id})
-        if 'Item' not in existing:
+        # If-Match opcional: solo se actualiza si el libro sigue en esa versión
+        try:
+            expected_version = if_match_version(event)
+        except ValueError as e:
             return {
-                'statusCode': 404,
-                'body': json.dumps({'error': 'Book not found'})
+                'statusCode': 400,
+                'body': json.dumps({'error': str(e)})
             }
         
         # Parsear el body
-        body = json.loads(event.get('body', '{}'))
+        body = loads(event.get('body', '{}'))
         
-        # Actualizar timestamp y mantener book_id
-        body['book_id'] = book_id
+        # Actualizar timestamp; created_at lo conserva update_item sin leer el libro antes
         body['updated_at'] = datetime.utcnow().isoformat()
         
-        # Mantener created_at si existe
-        if 'created_at' in existing['Item']:
-            body['created_at'] = existing['Item']['created_at']
+        # loads ya deja los floats como Decimal
+        rating_sent = 'average_rating' in body
+        item_dict = add_index_attributes(body, book_id)
+        if not rating_sent:
+            # Sin average_rating en el cuerpo se conserva la del libro, no el 0 por defecto
+            item_dict.pop('average_rating')
         
-        # Convertir floats a Decimal
-        item_dict = convert_to_decimal(body)
-        
-        # Actualizar en DynamoDB
-        table.put_item(Item=item_dict)
+        # Un solo viaje: la condición comprueba que existe y, con If-Match, su versión
+        try:
+            try:
+                response = table.update_item(**replace_update(book_id, item_dict, expected_version))
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException' or 'average_rating' not in item_dict:
+                    raise
+                # Puede ser un libro con valoraciones: su media es del roll-up y se conserva
+                del item_dict['average_rating']
+                response = table.update_item(**replace_update(book_id, item_dict, expected_version))
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            # Solo en el camino de error se lee el libro, para distinguir 404 de 409
+            current = table.get_item(Key={'book_id': book_id}).get('Item') if expected_version is not None else None
+            if current is None or not is_book_item(current):
+                return {
+                    'statusCode': 404,
+                    'body': json.dumps({'error': 'Book not found'})
+                }
+            return {
+                'statusCode': 409,
+                'body': json.dumps({
+                    'error': 'Version conflict',
+                    'current_version': int(current.get('version', 0))
+                })
+            }
+        existing = response.get('Attributes', {})
+        version = int(existing.get('version', 0)) + 1
+
+        # Llevar los índices por género y de búsqueda del libro anterior al nuevo
+        requests = index_requests(book_id, existing, body)
+        if requests and batch_write(get_dynamodb(), table.name, requests):
+            return {
+                'statusCode': 503,
+                'body': json.dumps({'error': 'Indexes not updated, retry'})
+            }
         
         return {
             'statusCode': 200,
+            'headers': cache_headers(item_etag({'book_id': book_id, 'updated_at': body['updated_at'], 'version': version})),
             'body': json.dumps({
                 'message': 'Book updated successfully',
-                'book_id': book_id
+                'book_id': book_id,
+                'version': version
             })
         }
         
@@ -68,6 +98,8 @@ def lambda_handler(event, context):
             'statusCode': 400,
             'body': json.dumps({'error': 'Invalid JSON in request body'})
         }
+    except OverloadedError as e:
+        return overloaded_response(e)
     except ClientError as e:
         return {
             'statusCode': 500,
@@ -0,0 +1,50 @@
+import json
+from botocore.exceptions import ClientError
+from common.runtime import get_table
+from common.codec import loads
+from common.ratings import parse_rating, rating_update
+from common.metrics import instrumented
+from common.resilience import OverloadedError, overloaded_response
+
+@instrumented('POST /books/{book_id}/ratings')
+def lambda_handler(event, context):
+    table = get_table()
+    
+    try:
+        # Obtener book_id de los path parameters
+        book_id = event.get('pathParameters', {}).get('book_id')
+        
+        if not book_id:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'book_id is required'})
+            }
+        
+        try:
+            rating = parse_rating(loads(event.get('body') or '{}'))
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': str(e)})
+            }
+        
+        # Un ADD en un shard al azar: ni se lee ni se escribe el libro (ratings_rollup actualiza la media)
+        table.update_item(**rating_update(book_id, rating))
+        
+        return {
+            'statusCode': 202,
+            'body': json.dumps({'book_id': book_id, 'rating': float(rating)})
+        }
+        
+    except OverloadedError as e:
+        return overloaded_response(e)
+    except ClientError as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
@@ -0,0 +1,16 @@
+from common.runtime import get_dynamodb, get_table
+from common.ratings import rated_book_ids, rollup
+
+
+def lambda_handler(event, context):
+    """Recalcula la media de los libros valorados en un lote del stream (ver common/ratings.py).
+
+    El mapeo solo entrega escrituras de shards de valoraciones. Cada libro se
+    recalcula una vez por lote aunque traiga miles de valoraciones; si algo
+    falla, Lambda reintenta el lote y el roll-up vuelve a partir de los shards.
+    """
+    table = get_table()
+    dynamodb = get_dynamodb()
+    book_ids = rated_book_ids(event.get('Records', []))
+    updated = sum(1 for book_id in book_ids if rollup(dynamodb, table, book_id))
+    return {'books': len(book_ids), 'updated': updated}
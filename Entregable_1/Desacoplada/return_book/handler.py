@@ -0,0 +1,54 @@
+import json
+from datetime import datetime
+from botocore.exceptions import ClientError
+from common.runtime import get_table
+from common.codec import dumps
+from common.schema import stock_update, to_public
+from common.metrics import instrumented
+from common.resilience import OverloadedError, overloaded_response
+from common.http_cache import cache_headers, item_etag
+
+@instrumented('POST /books/{book_id}/return')
+def lambda_handler(event, context):
+    table = get_table()
+    
+    try:
+        # Obtener book_id de los path parameters
+        book_id = event.get('pathParameters', {}).get('book_id')
+        
+        if not book_id:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'book_id is required'})
+            }
+        
+        # stock + 1 con ADD y vuelve a estar disponible, en una sola escritura
+        try:
+            response = table.update_item(**stock_update(book_id, 1, datetime.utcnow().isoformat(), status='available'))
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return {
+                'statusCode': 404,
+                'body': json.dumps({'error': 'Book not found'})
+            }
+        
+        item = response['Attributes']
+        return {
+            'statusCode': 200,
+            'headers': cache_headers(item_etag(item)),
+            'body': dumps(to_public(item))
+        }
+        
+    except OverloadedError as e:
+        return overloaded_response(e)
+    except ClientError as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
@@ -0,0 +1,110 @@
+import json
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from common.runtime import get_table, get_dynamodb
+from common.codec import dumps
+from common.schema import TERM_INDEX, is_book_item, parse_fields, projection, to_public
+from common.search import matches, parse_query, rank
+from common.batch import batch_get
+from common.metrics import instrumented
+from common.resilience import OverloadedError, overloaded_response
+from common.http_cache import cache_headers, etag_matches, not_modified, page_etag
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+def parse_limit(value):
+    if value is None:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be greater than 0')
+    return min(limit, MAX_LIMIT)
+
+def term_postings(table, term):
+    """{book_id: peso} de un término, leído de term-index (el peso va proyectado en el índice)."""
+    query_kwargs = {
+        'IndexName': TERM_INDEX,
+        'KeyConditionExpression': Key('term_key').eq(term),
+        'ProjectionExpression': 'target_id, #weight',
+        'ExpressionAttributeNames': {'#weight': 'weight'},
+    }
+    postings = {}
+    while True:
+        response = table.query(**query_kwargs)
+        for item in response.get('Items', []):
+            postings[item['target_id']] = int(item['weight'])
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return postings
+        query_kwargs['ExclusiveStartKey'] = last_key
+
+@instrumented('GET /books/search')
+def lambda_handler(event, context):
+    table = get_table()
+
+    try:
+        params = event.get('queryStringParameters') or {}
+        try:
+            terms = parse_query(params.get('q'))
+            limit = parse_limit(params.get('limit'))
+            fields = parse_fields(params.get('fields'))
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': str(e)})
+            }
+
+        # Entradas de cada término; con uno vacío el AND ya no tiene resultados
+        postings = {}
+        for term in terms:
+            postings[term] = term_postings(table, term)
+            if not postings[term]:
+                break
+        ranked = [book_id for book_id, _ in rank(postings)]
+
+        items = []
+        # Se descartan entradas que apunten a libros borrados o cuyo texto ya no tenga los términos;
+        # se siguen leyendo candidatos mientras eso deje la página corta
+        for start in range(0, len(ranked), limit):
+            window = ranked[start:start + limit]
+            found, _ = batch_get(get_dynamodb(), table.name, [{'book_id': book_id} for book_id in window],
+                                 projection(fields, 'title', 'description'))
+            by_id = {item['book_id']: item for item in found if is_book_item(item)}
+            items.extend(
+                by_id[book_id] for book_id in window
+                if book_id in by_id and matches(terms, by_id[book_id].get('title'), by_id[book_id].get('description'))
+            )
+            if len(items) >= limit:
+                break
+        items = items[:limit]
+        books = [to_public(item, fields) for item in items]
+        etag = page_etag(items, None, fields)
+        if etag_matches(event, etag):
+            return not_modified(etag)
+
+        return {
+            'statusCode': 200,
+            'headers': cache_headers(etag),
+            'body': dumps({
+                'count': len(books),
+                'books': books,
+                'next_cursor': None
+            })
+        }
+
+    except OverloadedError as e:
+        return overloaded_response(e)
+    except ClientError as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
@@ -0,0 +1,31 @@
+import json
+from botocore.exceptions import ClientError
+from common.codec import dumps
+from common.runtime import get_table
+from common.stats import STATS_KEY, stats_response
+from common.metrics import instrumented
+from common.resilience import OverloadedError, overloaded_response
+
+@instrumented('GET /books/stats')
+def lambda_handler(event, context):
+    table = get_table()
+
+    try:
+        response = table.get_item(Key=STATS_KEY)
+        return {
+            'statusCode': 200,
+            'body': dumps(stats_response(response.get('Item')))
+        }
+
+    except OverloadedError as e:
+        return overloaded_response(e)
+    except ClientError as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
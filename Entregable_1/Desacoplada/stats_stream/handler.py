@@ -0,0 +1,18 @@
+from common.runtime import get_table
+from common.stats import add_update, merge, record_delta
+
+
+def lambda_handler(event, context):
+    """Aplica a meta#catalog los cambios de un lote del stream de la tabla (ver common/stats.py).
+
+    Todo el lote se suma en un único update_item: o se aplica entero o falla y
+    Lambda reintenta el lote, así que un fallo nunca deja contada solo una parte.
+    Lo que no evita es la entrega al menos una vez del stream: un lote que se
+    reintenta después de haberse aplicado se cuenta entero otra vez, y esa
+    desviación la corrige rebuild-stats (ver common/stats.py).
+    """
+    records = event.get('Records', [])
+    delta = merge(record_delta(record) for record in records)
+    if delta:
+        get_table().update_item(**add_update(delta))
+    return {'records': len(records), 'counters': len(delta)}
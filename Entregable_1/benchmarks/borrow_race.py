@@ -0,0 +1,119 @@
+"""Prueba de concurrencia de préstamos y devoluciones contra una API desplegada.
+
+    python benchmarks/borrow_race.py http://localhost:5000 [--stock 10] [--clients 50] [--rounds 3]
+    python benchmarks/borrow_race.py https://<api>.execute-api.us-east-1.amazonaws.com/prod
+
+Crea un libro con --stock copias y lanza --clients POST /books/<id>/borrow a la
+vez (todos esperan en una barrera y salen juntos). Comprueba que se prestan
+exactamente min(stock, clients) copias, que el resto recibe 409, que el stock
+final no es negativo y que status pasa a "borrowed" justo al llegar a 0. Después
+devuelve todas las copias a la vez y comprueba que el stock vuelve al inicial.
+Al final borra el libro.
+
+Sirve para cualquiera de los despliegues (Flask, ASGI o API Gateway + Lambda).
+Hay que correrla contra DynamoDB (o DynamoDB Local) o PostgreSQL: moto no
+serializa las escrituras condicionales concurrentes y puede vender una copia de más.
+Para comprobar la capa de DynamoDB sin desplegar nada, Acoplada/benchmarks/borrow_concurrency.py.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def call(method, url, body=None):
+    """(status, cuerpo JSON o None, segundos) sin lanzar por los códigos de error HTTP."""
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            status, payload = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, payload = e.code, e.read()
+    elapsed = time.perf_counter() - start
+    try:
+        return status, json.loads(payload) if payload else None, elapsed
+    except ValueError:
+        return status, None, elapsed
+
+
+def burst(url, clients):
+    """clients POST a url que salen a la vez. Devuelve [(status, cuerpo, segundos)]."""
+    barrier = threading.Barrier(clients)
+
+    def worker(_):
+        barrier.wait()
+        return call('POST', url)
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        return list(pool.map(worker, range(clients)))
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def run_round(base_url, stock, clients):
+    status, created, _ = call('POST', f'{base_url}/books', {
+        'title': 'Prueba de concurrencia', 'genre': ['fiction'], 'stock': stock,
+    })
+    if status != 201:
+        raise SystemExit(f"No se pudo crear el libro: {status} {created}")
+    book_url = f"{base_url}/books/{created['book_id']}"
+    errors = []
+    try:
+        borrows = burst(f'{book_url}/borrow', clients)
+        codes = [status for status, _, _ in borrows]
+        lent = codes.count(200)
+        _, after_borrow, _ = call('GET', book_url)
+        expected_lent = min(stock, clients)
+        if lent != expected_lent:
+            errors.append(f"{lent} préstamos con {stock} copias y {clients} clientes (se esperaban {expected_lent})")
+        if codes.count(409) != clients - lent:
+            errors.append(f"respuestas inesperadas a borrow: {sorted(set(codes))}")
+        if after_borrow['stock'] != stock - lent or after_borrow['stock'] < 0:
+            errors.append(f"stock {after_borrow['stock']} tras {lent} préstamos de {stock}")
+        if (after_borrow['status'] == 'borrowed') != (after_borrow['stock'] == 0):
+            errors.append(f"status {after_borrow['status']} con stock {after_borrow['stock']}")
+
+        returns = burst(f'{book_url}/return', lent) if lent else []
+        _, after_return, _ = call('GET', book_url)
+        if any(status != 200 for status, _, _ in returns):
+            errors.append(f"respuestas inesperadas a return: {sorted({status for status, _, _ in returns})}")
+        if after_return['stock'] != stock or after_return['status'] != 'available':
+            errors.append(f"tras devolver todo: stock {after_return['stock']}, status {after_return['status']}")
+    finally:
+        call('DELETE', book_url)
+
+    latencies = [elapsed for _, _, elapsed in borrows]
+    return {
+        'lent': lent,
+        'rejected': codes.count(409),
+        'final_stock': after_borrow['stock'],
+        'borrow_p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+        'borrow_p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base_url', help="URL base de la API (sin /books)")
+    parser.add_argument('--stock', type=int, default=10, help="Copias del libro de prueba")
+    parser.add_argument('--clients', type=int, default=50, help="Préstamos simultáneos")
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    results = [run_round(args.base_url.rstrip('/'), args.stock, args.clients) for _ in range(args.rounds)]
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    return 1 if any(result['errors'] for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Micro-benchmarks de serialización: funciones anteriores frente a los codecs.
+
+    python benchmarks/codec_bench.py [--sizes 1 50 1000] [--repeat 5]
+
+- lambda respuesta: json.dumps(decimal_to_float(items)) frente a common.codec.dumps
+- lambda escritura: convert_to_decimal(json.loads(body)) frente a common.codec.loads
+- flask listado: jsonify de [model_dump()] frente a codec.dump_page (bytes directos)
+
+Imprime microsegundos por llamada (mejor de --repeat) y la aceleración.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'Desacoplada'))
+sys.path.insert(0, os.path.join(ROOT, 'Acoplada', 'app'))
+
+from common import codec as lambda_codec  # noqa: E402
+from common.convert import convert_to_decimal, decimal_to_float  # noqa: E402
+
+import codec as flask_codec  # noqa: E402
+from flask import Flask  # noqa: E402
+from models.book import Book  # noqa: E402
+
+GENRES = ['fiction', 'fantasy', 'sci-fi', 'mystery']
+
+
+def dynamodb_items(n, rng):
+    """Items tal como los devuelve boto3: todos los números como Decimal."""
+    return [
+        {
+            'book_id': f'{i:08d}-bench',
+            'title': f'Libro {i}',
+            'description': 'Descripción de prueba ' * 4,
+            'genre': rng.sample(GENRES, 2),
+            'status': 'available',
+            'stock': Decimal(rng.randint(0, 50)),
+            'average_rating': Decimal(str(round(rng.uniform(0, 5), 1))),
+            'created_at': '2024-01-01T00:00:00',
+            'updated_at': '2024-01-01T00:00:00',
+        }
+        for i in range(n)
+    ]
+
+
+def best(fn, repeat):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 50, 1000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    app = Flask(__name__)
+    print(f"orjson: {'sí' if lambda_codec.orjson is not None else 'no (json estándar)'}")
+    print(f"{'caso':22} {'n':>6} {'antes µs':>12} {'después µs':>12} {'x':>7}")
+
+    for n in args.sizes:
+        items = dynamodb_items(n, rng)
+        page = {'count': n, 'books': items, 'next_cursor': None}
+        body = json.dumps({'books': decimal_to_float(items)})
+        books = [Book(**item) for item in items]
+
+        cases = [
+            ('lambda respuesta',
+             lambda: json.dumps({**page, 'books': [decimal_to_float(item) for item in items]}),
+             lambda: lambda_codec.dumps(page)),
+            ('lambda escritura',
+             lambda: convert_to_decimal(json.loads(body)),
+             lambda: lambda_codec.loads(body)),
+            ('flask listado',
+             lambda: app.json.dumps({'books': [b.model_dump() for b in books], 'next_cursor': None}),
+             lambda: flask_codec.dump_page(books, None)),
+        ]
+        for name, before, after in cases:
+            old, new = best(before, args.repeat), best(after, args.repeat)
+            print(f"{name:22} {n:>6} {old:>12.1f} {new:>12.1f} {old / new:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+"""Benchmark de carga en proceso: app Flask (Acoplada) y lambdas CRUD (Desacoplada).
+
+    python benchmarks/load_bench.py run [--target flask lambdas] [--sizes 100 1000 10000]
+                                        [--mix read-heavy balanced write-heavy] [--ops 2000]
+                                        [--latency-ms 0] [--save benchmarks/baselines/base.json]
+    python benchmarks/load_bench.py compare base.json nuevo.json [--tolerance 0.15]
+
+Todo corre contra moto en memoria: no hace falta cuenta de AWS ni red. Con
+--latency-ms cada llamada a DynamoDB espera además esa latencia (más hasta
+--jitter-ms aleatorios) para aproximar el coste de red real.
+
+Cada escenario (objetivo x mezcla x tamaño de catálogo) se ejecuta en un proceso
+aparte, así el pico de RSS que se informa es el suyo. La semilla fija la
+secuencia de operaciones para que dos ejecuciones sean comparables.
+"""
+import argparse
+import importlib.util
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ACOPLADA_APP = os.path.join(ROOT, 'Acoplada', 'app')
+DESACOPLADA = os.path.join(ROOT, 'Desacoplada')
+
+TABLE_NAME = 'books-bench'
+GENRES = ['fiction', 'non-fiction', 'fantasy', 'sci-fi', 'romance', 'mystery']
+
+# Pesos relativos de cada operación
+MIXES = {
+    'read-heavy': {'get': 80, 'list': 10, 'create': 5, 'update': 4, 'delete': 1},
+    'balanced': {'get': 50, 'list': 10, 'create': 20, 'update': 15, 'delete': 5},
+    'write-heavy': {'get': 20, 'list': 5, 'create': 40, 'update': 25, 'delete': 10},
+}
+
+
+# ---------------------------------------------------------------------------
+# ENTORNO SIMULADO
+# ---------------------------------------------------------------------------
+
+def inject_latency(latency_ms, jitter_ms, rng):
+    """Retrasa cada llamada de botocore (incluida la que atiende moto) latency_ms + [0, jitter_ms]."""
+    if latency_ms <= 0 and jitter_ms <= 0:
+        return
+    from botocore.client import BaseClient
+
+    original = BaseClient._make_api_call
+
+    def delayed(self, operation_name, api_params):
+        time.sleep((latency_ms + rng.uniform(0, jitter_ms)) / 1000)
+        return original(self, operation_name, api_params)
+
+    BaseClient._make_api_call = delayed
+
+
+def random_book(rng, i):
+    return {
+        'title': f'Libro {i}',
+        'description': 'Descripción de prueba ' * rng.randint(1, 5),
+        'genre': rng.sample(GENRES, rng.randint(1, 2)),
+        'stock': rng.randint(0, 50),
+        'average_rating': round(rng.uniform(0, 5), 1),
+    }
+
+
+def create_table_and_seed(size, rng):
+    """Crea la tabla con el esquema de Acoplada (índices incluidos) y la llena con `size` libros."""
+    import boto3
+    from db.dynamodb_db import ATTRIBUTE_DEFINITIONS, GLOBAL_SECONDARY_INDEXES, book_to_item, genre_items
+    from models.book import Book
+
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+    table = dynamodb.create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[{'AttributeName': 'book_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=ATTRIBUTE_DEFINITIONS,
+        GlobalSecondaryIndexes=GLOBAL_SECONDARY_INDEXES,
+        BillingMode='PAY_PER_REQUEST',
+    )
+    book_ids = []
+    with table.batch_writer() as batch:
+        for i in range(size):
+            book = Book(**random_book(rng, i))
+            book_ids.append(book.book_id)
+            for item in [book_to_item(book), *genre_items(book.book_id, book.genre)]:
+                batch.put_item(Item=item)
+    return book_ids
+
+
+# ---------------------------------------------------------------------------
+# OBJETIVOS
+# ---------------------------------------------------------------------------
+
+class FlaskTarget:
+    """La app de Acoplada a través del cliente de pruebas de Flask (sin servidor HTTP)."""
+
+    def __init__(self):
+        import main
+        self.client = main.app.test_client()
+
+    def get(self, book_id):
+        return self.client.get(f'/books/{book_id}').status_code, None
+
+    def list(self):
+        return self.client.get('/books?limit=50').status_code, None
+
+    def create(self, body):
+        response = self.client.post('/books', json=body)
+        return response.status_code, (response.get_json() or {}).get('book_id')
+
+    def update(self, book_id, body):
+        return self.client.put(f'/books/{book_id}', json=body).status_code, None
+
+    def delete(self, book_id):
+        return self.client.delete(f'/books/{book_id}').status_code, None
+
+
+class LambdaTarget:
+    """Los lambda_handler de Desacoplada invocados directamente con eventos de API Gateway."""
+
+    HANDLERS = ('get_book', 'gets_book', 'post_book', 'put_book', 'delete_book')
+
+    def __init__(self):
+        sys.path.insert(0, DESACOPLADA)
+        self.handlers = {}
+        for name in self.HANDLERS:
+            spec = importlib.util.spec_from_file_location(f'{name}_handler', os.path.join(DESACOPLADA, name, 'handler.py'))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            self.handlers[name] = module.lambda_handler
+
+    def _invoke(self, name, event):
+        response = self.handlers[name](event, None)
+        return response['statusCode'], response.get('body')
+
+    def get(self, book_id):
+        return self._invoke('get_book', {'pathParameters': {'book_id': book_id}})[0], None
+
+    def list(self):
+        return self._invoke('gets_book', {'queryStringParameters': {'limit': '50'}})[0], None
+
+    def create(self, body):
+        status, response_body = self._invoke('post_book', {'body': json.dumps(body)})
+        return status, json.loads(response_body).get('book_id') if status == 201 else None
+
+    def update(self, book_id, body):
+        return self._invoke('put_book', {'pathParameters': {'book_id': book_id}, 'body': json.dumps(body)})[0], None
+
+    def delete(self, book_id):
+        return self._invoke('delete_book', {'pathParameters': {'book_id': book_id}})[0], None
+
+
+TARGETS = {'flask': FlaskTarget, 'lambdas': LambdaTarget}
+
+
+# ---------------------------------------------------------------------------
+# ESCENARIO (proceso hijo)
+# ---------------------------------------------------------------------------
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {'count': 0}
+
+    def rank(p):
+        return round(ordered[max(0, math.ceil(len(ordered) * p) - 1)], 3)
+
+    return {
+        'count': len(ordered),
+        'mean': round(sum(ordered) / len(ordered), 3),
+        'p50': rank(0.50),
+        'p95': rank(0.95),
+        'p99': rank(0.99),
+    }
+
+
+def peak_rss_mb():
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KiB y macOS en bytes
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def run_scenario(spec):
+    from moto import mock_aws
+
+    os.environ.update({
+        'AWS_ACCESS_KEY_ID': 'bench', 'AWS_SECRET_ACCESS_KEY': 'bench', 'AWS_DEFAULT_REGION': 'us-east-1',
+        'DB_TYPE': 'dynamodb', 'DB_DYNAMONAME': TABLE_NAME, 'CACHE_MAXSIZE': str(spec['cache_maxsize']),
+    })
+    os.environ.pop('DYNAMODB_ENDPOINT_URL', None)
+    sys.path.insert(0, ACOPLADA_APP)
+    rng = random.Random(spec['seed'])
+
+    with mock_aws():
+        book_ids = create_table_and_seed(spec['size'], rng)
+        target = TARGETS[spec['target']]()
+        inject_latency(spec['latency_ms'], spec['jitter_ms'], rng)
+
+        weights = MIXES[spec['mix']]
+        operations = rng.choices(list(weights), weights=list(weights.values()), k=spec['warmup'] + spec['ops'])
+        samples = {op: [] for op in weights}
+        errors = 0
+        measured_start = None
+
+        for n, op in enumerate(operations):
+            if n == spec['warmup']:
+                measured_start = time.perf_counter()
+            if op in ('get', 'update', 'delete') and not book_ids:
+                op = 'create'
+            start = time.perf_counter()
+            if op == 'get':
+                status, _ = target.get(rng.choice(book_ids))
+            elif op == 'list':
+                status, _ = target.list()
+            elif op == 'create':
+                status, new_id = target.create(random_book(rng, n))
+                if new_id:
+                    book_ids.append(new_id)
+            elif op == 'update':
+                status, _ = target.update(rng.choice(book_ids), random_book(rng, n))
+            else:
+                status, _ = target.delete(book_ids.pop(rng.randrange(len(book_ids))))
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if n >= spec['warmup']:
+                samples[op].append(elapsed_ms)
+                if status >= 400:
+                    errors += 1
+
+        elapsed = time.perf_counter() - (measured_start or time.perf_counter())
+
+    all_samples = [sample for values in samples.values() for sample in values]
+    return {
+        **spec,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_ops_s': round(len(all_samples) / elapsed, 1) if elapsed else None,
+        'errors': errors,
+        'peak_rss_mb': peak_rss_mb(),
+        'latency_ms': {'all': percentiles(all_samples), **{op: percentiles(values) for op, values in samples.items()}},
+    }
+
+
+def scenario_key(result):
+    return f"{result['target']}/{result['mix']}/{result['size']}"
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def run(args):
+    results = []
+    for target in args.target:
+        for mix in args.mix:
+            for size in args.sizes:
+                spec = {
+                    'target': target, 'mix': mix, 'size': size, 'ops': args.ops, 'warmup': args.warmup,
+                    'seed': args.seed, 'latency_ms': args.latency_ms, 'jitter_ms': args.jitter_ms,
+                    'cache_maxsize': args.cache_maxsize,
+                }
+                completed = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '_scenario', json.dumps(spec)],
+                    capture_output=True, text=True,
+                )
+                if completed.returncode != 0:
+                    sys.stderr.write(completed.stderr)
+                    raise SystemExit(f"Falló el escenario {target}/{mix}/{size}")
+                result = json.loads(completed.stdout.strip().splitlines()[-1])
+                results.append(result)
+                overall = result['latency_ms']['all']
+                print(f"{scenario_key(result):32} {result['throughput_ops_s']:>9} ops/s  "
+                      f"p50 {overall['p50']:>8} ms  p95 {overall['p95']:>8} ms  p99 {overall['p99']:>8} ms  "
+                      f"rss {result['peak_rss_mb']:>7} MB  errores {result['errors']}", file=sys.stderr)
+
+    report = {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'scenarios': results,
+    }
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados guardados en {args.save}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+def compare(args):
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = {scenario_key(s): s for s in json.load(f)['scenarios']}
+    with open(args.candidate, encoding='utf-8') as f:
+        candidate = {scenario_key(s): s for s in json.load(f)['scenarios']}
+
+    regressions = 0
+    for key in sorted(baseline.keys() & candidate.keys()):
+        old, new = baseline[key], candidate[key]
+        checks = [
+            # (métrica, antes, después, True si más alto es peor)
+            ('p95_ms', old['latency_ms']['all']['p95'], new['latency_ms']['all']['p95'], True),
+            ('p99_ms', old['latency_ms']['all']['p99'], new['latency_ms']['all']['p99'], True),
+            ('ops_s', old['throughput_ops_s'], new['throughput_ops_s'], False),
+            ('rss_mb', old['peak_rss_mb'], new['peak_rss_mb'], True),
+        ]
+        for metric, before, after, higher_is_worse in checks:
+            change = (after - before) / before if before else 0.0
+            worse = change > args.tolerance if higher_is_worse else change < -args.tolerance
+            regressions += worse
+            print(f"{key:32} {metric:8} {before:>10} -> {after:>10} ({change:+.1%}){'  REGRESIÓN' if worse else ''}")
+    for key in sorted(baseline.keys() ^ candidate.keys()):
+        print(f"{key:32} solo en {'la base' if key in baseline else 'el candidato'}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['_scenario']:
+        print(json.dumps(run_scenario(json.loads(argv[1]))))
+        return 0
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = sub.add_parser('run', help="Ejecuta los escenarios y guarda los resultados")
+    run_parser.add_argument('--target', nargs='+', choices=list(TARGETS), default=list(TARGETS))
+    run_parser.add_argument('--mix', nargs='+', choices=list(MIXES), default=['read-heavy', 'balanced'])
+    run_parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000])
+    run_parser.add_argument('--ops', type=int, default=1000, help="Operaciones medidas por escenario")
+    run_parser.add_argument('--warmup', type=int, default=100, help="Operaciones previas que no se miden")
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--latency-ms', type=float, default=0.0, help="Latencia fija añadida a cada llamada")
+    run_parser.add_argument('--jitter-ms', type=float, default=0.0, help="Latencia aleatoria extra máxima")
+    run_parser.add_argument('--cache-maxsize', type=int, default=0, help="CACHE_MAXSIZE de la app Flask (0 = sin caché)")
+    run_parser.add_argument('--save', help="Fichero JSON donde guardar la línea base")
+
+    compare_parser = sub.add_parser('compare', help="Compara dos ejecuciones y falla si hay regresiones")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--tolerance', type=float, default=0.15, help="Empeoramiento relativo admitido")
+
+    args = parser.parse_args(argv)
+    return run(args) if args.command == 'run' else compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
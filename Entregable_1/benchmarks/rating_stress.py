@@ -0,0 +1,96 @@
+"""Prueba de carga de valoraciones sobre un único título contra una API desplegada.
+
+    python benchmarks/rating_stress.py http://localhost:5000 [--ratings 20000] [--clients 64] [--wait 60]
+    python benchmarks/rating_stress.py https://<api>.execute-api.us-east-1.amazonaws.com/prod
+
+Crea un libro y le manda --ratings POST /books/<id>/ratings desde --clients hilos
+(valoraciones al azar entre 0 y 5 con un decimal). Mide valoraciones por
+segundo, latencias y respuestas que no son 202 (503 si DynamoDB limita la
+clave). Después espera hasta --wait segundos a que el roll-up escriba la media y
+comprueba que coincide con la de las valoraciones aceptadas. Al final borra el
+libro.
+
+Para ver el efecto de los shards, desplegar con RatingShards=1 y con el valor
+por defecto y comparar: con uno solo todas las valoraciones caen en la misma
+clave de DynamoDB y el límite de escrituras por clave aparece como 503 y
+latencias altas mucho antes.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import ROUND_HALF_UP, Decimal
+
+from borrow_race import call, percentile
+
+
+def rate(book_url, rating):
+    status, _, elapsed = call('POST', f'{book_url}/ratings', {'rating': rating})
+    return status, rating, elapsed
+
+
+def wait_for_rollup(book_url, expected, timeout):
+    """El libro cuando su media llega a expected, o el último leído si se agota el tiempo."""
+    deadline = time.monotonic() + timeout
+    while True:
+        _, book, _ = call('GET', book_url)
+        if Decimal(str(book.get('average_rating'))) == expected or time.monotonic() >= deadline:
+            return book
+        time.sleep(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base_url', help="URL base de la API (sin /books)")
+    parser.add_argument('--ratings', type=int, default=20000, help="Valoraciones en total")
+    parser.add_argument('--clients', type=int, default=64, help="Hilos enviando a la vez")
+    parser.add_argument('--wait', type=float, default=60, help="Segundos máximos de espera al roll-up")
+    args = parser.parse_args()
+
+    base_url = args.base_url.rstrip('/')
+    status, created, _ = call('POST', f'{base_url}/books', {
+        'title': 'Prueba de valoraciones', 'genre': ['fiction'], 'stock': 1,
+    })
+    if status != 201:
+        raise SystemExit(f"No se pudo crear el libro: {status} {created}")
+    book_url = f"{base_url}/books/{created['book_id']}"
+    errors = []
+    try:
+        ratings = [round(random.uniform(0, 5), 1) for _ in range(args.ratings)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            results = list(pool.map(lambda rating: rate(book_url, rating), ratings))
+        elapsed = time.perf_counter() - start
+
+        accepted = [Decimal(str(rating)) for status, rating, _ in results if status == 202]
+        codes = {}
+        for status, _, _ in results:
+            codes[status] = codes.get(status, 0) + 1
+        if not accepted:
+            raise SystemExit(f"Ninguna valoración aceptada: {codes}")
+        expected = (sum(accepted, Decimal(0)) / len(accepted)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        book = wait_for_rollup(book_url, expected, args.wait)
+        if Decimal(str(book.get('average_rating'))) != expected:
+            errors.append(f"average_rating {book.get('average_rating')}, se esperaba {expected}")
+    finally:
+        call('DELETE', book_url)
+
+    latencies = [elapsed for _, _, elapsed in results]
+    print(json.dumps({
+        'ratings': args.ratings,
+        'accepted': len(accepted),
+        'status_codes': codes,
+        'ratings_per_s': round(args.ratings / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'average_rating': book.get('average_rating'),
+        'expected_average': str(expected),
+        'errors': errors,
+    }, indent=2, ensure_ascii=False))
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
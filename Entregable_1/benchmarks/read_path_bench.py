@@ -0,0 +1,112 @@
+"""Micro-benchmark de la lectura de libros: validar con el modelo frente a la lectura de confianza.
+
+    python benchmarks/read_path_bench.py [--sizes 1 50 1000] [--repeat 5]
+
+Por cada item tal como lo devuelve boto3 (números como Decimal, atributos de índice):
+
+- construir: Book(**item) (antes, y con STRICT_READS=true), Book.model_construct
+  y Book.from_trusted (la lectura por defecto)
+- listado: construir los libros y volcarlos con codec.dump_page
+
+Imprime microsegundos por libro (mejor de --repeat) y la memoria que retiene cada
+libro una vez descartados los items de DynamoDB.
+"""
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'Acoplada', 'app'))
+
+import codec  # noqa: E402
+from models.book import Book  # noqa: E402
+
+GENRES = ['fiction', 'fantasy', 'sci-fi', 'mystery']
+
+
+def dynamodb_items(n):
+    """Items tal como los devuelve boto3: todos los números como Decimal y el atributo del índice."""
+    return [
+        {
+            'book_id': f'{i:08d}-bench',
+            'title': f'Libro {i}',
+            'description': f'Descripción de prueba {i} ' * 4,
+            'genre': [GENRES[i % 4], GENRES[(i + 1) % 4]],
+            'status': 'available',
+            'stock': Decimal(i % 50),
+            'average_rating': Decimal(f'{i % 5}.5'),
+            'created_at': f'2024-01-01T00:00:{i % 60:02d}',
+            'updated_at': f'2024-01-01T00:00:{i % 60:02d}',
+            'version': Decimal(i % 3),
+            'catalog': 'books',
+        }
+        for i in range(n)
+    ]
+
+
+def construct(item):
+    # model_construct no convierte: los enteros se pasan a mano para que el volcado sea igual
+    fields = {name: item[name] for name in Book.model_fields if name in item}
+    fields['stock'], fields['version'] = int(fields['stock']), int(fields['version'])
+    return Book.model_construct(**fields)
+
+
+LOADERS = [
+    ('Book(**item)', lambda item: Book(**item)),
+    ('model_construct', construct),
+    ('from_trusted', Book.from_trusted),
+]
+
+
+def best(fn, repeat):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def bytes_per_book(load, n):
+    # Lo que sigue vivo de los items (cadenas, listas) cuenta para el libro que lo referencia
+    tracemalloc.start()
+    items = dynamodb_items(n)
+    books = [load(item) for item in items]
+    del items
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del books
+    return retained / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 50, 1000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    reference = codec.dump_page([Book(**item) for item in dynamodb_items(50)], None)
+    for name, load in LOADERS:
+        assert codec.dump_page([load(item) for item in dynamodb_items(50)], None) == reference, name
+
+    print(f"{'caso':18} {'lectura':16} {'n':>6} {'µs/libro':>10} {'x':>6}")
+    for n in args.sizes:
+        items = dynamodb_items(n)
+        for case, run in (
+            ('construir', lambda load: [load(item) for item in items]),
+            ('listado', lambda load: codec.dump_page([load(item) for item in items], None)),
+        ):
+            baseline = None
+            for name, load in LOADERS:
+                cost = best(lambda: run(load), args.repeat) / n
+                baseline = baseline or cost
+                print(f"{case:18} {name:16} {n:>6} {cost:>10.2f} {baseline / cost:>5.1f}x")
+
+    n = max(args.sizes)
+    print(f"\nmemoria retenida por libro (n={n})")
+    for name, load in LOADERS:
+        print(f"{name:16} {bytes_per_book(load, n):>8.0f} B")
+
+
+if __name__ == '__main__':
+    main()